@@ -0,0 +1,437 @@
+import os, sys
+
+# The benchmarks import the program the same way main.py does, from the project's root directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Data_Converters import BinaryByteConverters, ByteDataToDirectory, Compression, DirectoryToByteData
+from Image_Manipulation import PixelChannels
+from PIL import Image
+import numpy
+import argparse, concurrent.futures, contextlib, io, json, multiprocessing, platform, resource, shutil, tempfile, time
+import PIL
+import StegoAPI
+
+
+# Benchmark suite for hiding and extracting data. Synthetic photos and payloads are generated on the fly (nothing is
+# downloaded), every case is run end to end through StegoAPI and stage by stage, and the results are written as JSON.
+# Every measurement runs in a freshly started process, so that its peak memory usage is its own.
+#
+#     python Benchmarks/RunBenchmarks.py --output results.json
+#     python Benchmarks/RunBenchmarks.py --baseline results.json
+
+
+# Every case hides one payload in a set of photos. Payload kinds: 'random' (incompressible), 'text' (compressible)
+# and 'tree' (a folder of many small files). The payload fills 'fill' of the capacity of the photos.
+CASES = [
+    {"name": "random-rgb-1024x768x4", "payload": "random", "width": 1024, "height": 768, "mode": "RGB", "photos": 4, "fill": 0.9, "compression": "none"},
+    {"name": "random-rgba-1024x768x4", "payload": "random", "width": 1024, "height": 768, "mode": "RGBA", "photos": 4, "fill": 0.9, "compression": "none"},
+    {"name": "random-gray-1024x768x4", "payload": "random", "width": 1024, "height": 768, "mode": "L", "photos": 4, "fill": 0.9, "compression": "none"},
+    {"name": "random-rgb-256x256x16", "payload": "random", "width": 256, "height": 256, "mode": "RGB", "photos": 16, "fill": 0.9, "compression": "none"},
+    {"name": "random-rgb-2048x1536x2", "payload": "random", "width": 2048, "height": 1536, "mode": "RGB", "photos": 2, "fill": 0.9, "compression": "none"},
+    {"name": "text-rgb-1024x768x4-auto", "payload": "text", "width": 1024, "height": 768, "mode": "RGB", "photos": 4, "fill": 0.9, "compression": "auto"},
+    {"name": "tree-rgb-1024x768x4", "payload": "tree", "width": 1024, "height": 768, "mode": "RGB", "photos": 4, "fill": 0.9, "compression": "none"},
+]
+
+# A smaller set of cases that finishes within seconds
+QUICK_CASES = [
+    {"name": "random-rgb-256x256x4", "payload": "random", "width": 256, "height": 256, "mode": "RGB", "photos": 4, "fill": 0.9, "compression": "none"},
+    {"name": "text-rgba-256x256x2-auto", "payload": "text", "width": 256, "height": 256, "mode": "RGBA", "photos": 2, "fill": 0.9, "compression": "auto"},
+    {"name": "tree-gray-256x256x4", "payload": "tree", "width": 256, "height": 256, "mode": "L", "photos": 4, "fill": 0.9, "compression": "none"},
+]
+
+# Size of every file in a 'tree' payload
+TREE_FILE_SIZE = 2 ** 11
+
+# Number of files per folder in a 'tree' payload
+TREE_FOLDER_SIZE = 50
+
+# Extra room left in the photos for the archive entries and photo headers
+PAYLOAD_OVERHEAD = 2 ** 12
+
+# A throughput more than this fraction below the baseline counts as a regression
+DEFAULT_THRESHOLD = 0.1
+
+# Measurements shorter than this (in seconds) are too noisy to be compared with the baseline
+MIN_COMPARED_SECONDS = 0.01
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how fast data gets hidden in and extracted from photos.")
+    parser.add_argument("--output", help="file the results are written to as JSON (printed if not given)")
+    parser.add_argument("--baseline", help="results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown that counts as a regression (default: 0.1)")
+    parser.add_argument("--repeat", type=int, default=3, help="number of runs of every measurement, of which the fastest counts")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes used for hiding and extracting")
+    parser.add_argument("--png-profile", default="balanced", choices=sorted(PixelChannels.PNG_PROFILES), help="png profile used for hiding end to end")
+    parser.add_argument("--quick", action="store_true", help="only run a few small cases")
+    parser.add_argument("--case", action="append", help="only run the case with this name (can be given more than once)")
+    args = parser.parse_args()
+
+    cases = QUICK_CASES if args.quick else CASES
+    if args.case:
+        cases = [case for case in CASES + QUICK_CASES if case["name"] in args.case]
+
+    results = {"environment": getEnvironment(), "settings": {"repeat": args.repeat, "workers": args.workers, "png_profile": args.png_profile}, "cases": {}}
+
+    work_directory = tempfile.mkdtemp(prefix="stego-benchmarks-")
+    try:
+        for case in cases:
+            print("Running " + case["name"] + "...", file=sys.stderr)
+            results["cases"][case["name"]] = runCase(case, os.path.join(work_directory, case["name"]), args.repeat, args.workers, args.png_profile)
+    finally:
+        shutil.rmtree(work_directory, ignore_errors=True)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            output_file.write(report + "\n")
+    else:
+        print(report)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as baseline_file:
+            baseline = json.load(baseline_file)
+
+        regressions = compareWithBaseline(results, baseline, args.threshold)
+        sys.exit(1 if len(regressions) > 0 else 0)
+
+
+def getEnvironment():
+    """
+    :return: A dictionary describing the machine and library versions the benchmarks run with.
+    """
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": numpy.__version__,
+        "pillow": PIL.__version__,
+    }
+
+
+def runCase(case, case_directory, repeat, num_workers, png_profile="balanced"):
+    """
+    Generates the photos and payload of a case and measures hiding and extracting them.
+    :param case: The description of the case (see CASES).
+    :param case_directory: An empty folder to be used for all files of the case.
+    :param repeat: The number of runs of every measurement, of which the fastest counts.
+    :param num_workers: The number of worker processes used for hiding and extracting.
+    :param png_profile: The png profile used for hiding end to end. (The stages measure every profile.)
+    :return: A dictionary with the results of the case.
+    """
+    paths = {name: os.path.join(case_directory, name) for name in ("covers", "payload", "processed", "extracted")}
+    for path in paths.values():
+        os.makedirs(path)
+
+    createCovers(paths["covers"], case)
+    payload_size = createPayload(paths["payload"], case)
+
+    result = {"payload_bytes": payload_size, "photos": case["photos"], "width": case["width"], "height": case["height"],
+              "mode": case["mode"], "compression": case["compression"]}
+
+    result["hide"] = runMeasurement(measureHide, repeat, paths, case["compression"], num_workers, png_profile)
+    result["extract"] = runMeasurement(measureExtract, repeat, paths, num_workers)
+    result["stages"] = runMeasurement(measureStages, repeat, paths, case["compression"])
+
+    # Throughputs are based on the size of the original payload
+    for phase in ("hide", "extract"):
+        seconds = result[phase]["seconds"]
+        result[phase]["mb_per_s"] = getThroughput(payload_size, seconds)
+        result[phase]["per_photo_ms"] = round(seconds * 1000 / max(1, result[phase]["photos"]), 3)
+
+    for stage in result["stages"]["stages"].values():
+        stage["mb_per_s"] = getThroughput(stage["bytes"], stage["seconds"])
+
+    return result
+
+
+def runMeasurement(function, repeat, *args):
+    """
+    Runs a measurement several times, each time in a freshly started process.
+    :param function: The measurement to run, returning a dictionary that contains 'seconds'.
+    :param repeat: The number of runs, of which the fastest counts.
+    :param args: The arguments passed on to 'function'.
+    :return: The result of the fastest run, along with the peak memory usage of the largest run ('peak_rss_mb') and of
+    its worker processes ('workers_peak_rss_mb').
+    """
+    best = None
+    peak_rss_mb = workers_peak_rss_mb = 0
+
+    for i in range(max(1, repeat)):
+        # 'spawn' starts the process from scratch, so the memory of this process is not counted
+        with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            result = executor.submit(runInChildProcess, function, *args).result()
+
+        peak_rss_mb = max(peak_rss_mb, result.pop("peak_rss_mb"))
+        workers_peak_rss_mb = max(workers_peak_rss_mb, result.pop("workers_peak_rss_mb"))
+
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+
+    best["peak_rss_mb"] = peak_rss_mb
+    best["workers_peak_rss_mb"] = workers_peak_rss_mb
+    return best
+
+
+def runInChildProcess(function, *args):
+    """
+    Runs a measurement with the progress messages of the program silenced. (Runs in its own process.)
+    :return: The result of the measurement, along with the peak memory usage of the process.
+    """
+    resetPeakMemoryUsage()
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = function(*args)
+
+    result["peak_rss_mb"] = getPeakMemoryUsage()
+
+    # Worker processes (if any) are measured separately, since they run alongside this process
+    result["workers_peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+    return result
+
+
+def resetPeakMemoryUsage():
+    """
+    Resets the peak memory usage of this process, which a started process otherwise takes over from the process it
+    has been started from. (Only possible on Linux, elsewhere the peak includes the memory used at the start.)
+    """
+    try:
+        with open("/proc/self/clear_refs", 'w') as clear_refs:
+            clear_refs.write("5")
+    except OSError:
+        pass
+
+
+def getPeakMemoryUsage():
+    """
+    :return: The peak resident set size of this process in megabytes.
+    """
+    try:
+        with open("/proc/self/status", 'r') as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+
+    # ru_maxrss is in kilobytes on Linux, but in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measureHide(paths, compression, num_workers, png_profile):
+    """
+    Hides the payload of a case end to end.
+    :return: A dictionary containing the time taken and the number of processed photos.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = StegoAPI.hide(paths["payload"] + "/", paths["covers"], paths["processed"], num_workers, compression, png_profile=png_profile)
+
+    return {"seconds": time.perf_counter() - wall_start, "cpu_seconds": time.process_time() - cpu_start,
+            "photos": len(result.processed_photos), "hidden_bytes": result.num_bytes, "codec": result.codec,
+            "png_profile": result.png_profile, "output_bytes": sum(os.path.getsize(photo) for photo in result.processed_photos)}
+
+
+def measureExtract(paths, num_workers):
+    """
+    Extracts the data hidden by measureHide end to end.
+    :return: A dictionary containing the time taken and the number of photos read.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.process_time()
+    result = StegoAPI.extract(paths["processed"], paths["extracted"], num_workers)
+
+    return {"seconds": time.perf_counter() - wall_start, "cpu_seconds": time.process_time() - cpu_start,
+            "photos": result.num_photos, "hidden_bytes": result.num_bytes}
+
+
+def measureStages(paths, compression):
+    """
+    Times the individual stages that hiding and extracting are made of, one after another on the data of a case.
+    :return: A dictionary containing the total time taken and the time and bytes processed of every stage.
+    """
+    stages = {}
+
+    def timeStage(name, num_bytes, function, *args):
+        start = time.perf_counter()
+        value = function(*args)
+        stages[name] = {"seconds": time.perf_counter() - start, "bytes": num_bytes}
+        return value
+
+    # Walking the folder, reading every file and compressing the archive
+    if compression == "auto":
+        codec = timeStage("choose_codec", Compression.SAMPLE_SIZE, Compression.chooseCodec, DirectoryToByteData.getArchiveSample(paths["payload"] + "/"))
+    else:
+        codec = Compression.getCodec(compression)
+
+    archive_size = DirectoryToByteData.getArchiveSize(paths["payload"] + "/")
+    archive = timeStage("archive", archive_size, lambda: b"".join(DirectoryToByteData.getArchiveChunks(paths["payload"] + "/", codec)))
+
+    bits = timeStage("bytes_to_bits", len(archive), BinaryByteConverters.convertBytesToBinaryByteArray, archive)
+    bit_array = timeStage("bit_expansion", len(archive), bits.getBitArray)
+    timeStage("bits_to_bytes", len(archive), BinaryByteConverters.convertBinaryByteArrayToBytes, bits)
+
+    photo_paths = [os.path.join(paths["covers"], photo) for photo in sorted(os.listdir(paths["covers"]))]
+    pixel_bytes = 0
+    decoded = []
+
+    def decodePhotos():
+        for photo_path in photo_paths:
+            decoded.append(PixelChannels.readImageChannels(photo_path))
+
+    timeStage("decode", 0, decodePhotos)
+    pixel_bytes = sum(len(channels) for channels, width, height, mode in decoded)
+    stages["decode"]["bytes"] = pixel_bytes
+
+    def embedPayload():
+        bit_index = 0
+        for channels, width, height, mode in decoded:
+            length = min(len(channels), len(bit_array) - bit_index)
+            PixelChannels.storeBitsInChannels(channels, 0, bit_array[bit_index:bit_index + length])
+            bit_index += length
+
+    timeStage("embed", len(archive), embedPayload)
+
+    def readPayload():
+        for channels, width, height, mode in decoded:
+            PixelChannels.readBitsFromChannels(channels, 0, len(channels))
+
+    timeStage("read_payload", pixel_bytes // 8, readPayload)
+
+    # Every png profile encodes the same photos, so their speeds and output sizes can be compared
+    def encodePhotos(png_profile):
+        output_bytes = 0
+        for channels, width, height, mode in decoded:
+            image = PixelChannels.createImageFromChannelArray(channels, width, height, mode)
+            output_bytes += PixelChannels.saveImageAsPng(image, io.BytesIO(), png_profile)
+
+        return output_bytes
+
+    for png_profile in PixelChannels.PNG_PROFILES:
+        stage_name = "encode_" + png_profile
+        output_bytes = timeStage(stage_name, pixel_bytes, encodePhotos, png_profile)
+        stages[stage_name]["output_bytes"] = output_bytes
+
+    def recreateFiles():
+        shutil.rmtree(paths["extracted"])
+        os.makedirs(paths["extracted"])
+        ByteDataToDirectory.createDirectoryFromArchive(paths["extracted"], [archive])
+
+    timeStage("recreate_files", archive_size, recreateFiles)
+
+    for stage in stages.values():
+        stage["seconds"] = round(stage["seconds"], 6)
+
+    return {"seconds": sum(stage["seconds"] for stage in stages.values()), "stages": stages}
+
+
+def getThroughput(num_bytes, seconds):
+    """
+    :return: The throughput in megabytes (10^6 bytes) per second.
+    """
+    return round(num_bytes / 10 ** 6 / seconds, 3) if seconds > 0 else None
+
+
+def createCovers(folder_path, case):
+    """
+    Creates the photos of a case. They are smooth gradients with a little noise, so that they compress roughly
+    like real photos do.
+    :param folder_path: The folder the photos are saved in.
+    :param case: The description of the case (see CASES).
+    """
+    rng = numpy.random.default_rng(len(case["name"]))
+    num_channels = Image.getmodebands(case["mode"])
+    width, height = case["width"], case["height"]
+
+    for i in range(case["photos"]):
+        gradient = numpy.add.outer(numpy.arange(height), numpy.arange(width)) * 255 // (width + height) + i * 17
+        pixels = numpy.repeat(gradient[:, :, numpy.newaxis], num_channels, axis=2)
+        pixels = (pixels + rng.integers(0, 8, pixels.shape)) % 256
+        pixels = pixels.astype(numpy.uint8)
+
+        if num_channels == 1:
+            pixels = pixels[:, :, 0]
+
+        Image.fromarray(pixels, case["mode"]).save(os.path.join(folder_path, "photo_" + str(i) + ".png"))
+
+
+def createPayload(folder_path, case):
+    """
+    Creates the payload of a case, sized to fill the photos of the case.
+    :param folder_path: The folder the payload is created in.
+    :param case: The description of the case (see CASES).
+    :return: The total size of the payload's files in bytes.
+    """
+    rng = numpy.random.default_rng(len(case["name"]) + 1)
+    capacity = case["width"] * case["height"] * Image.getmodebands(case["mode"]) * case["photos"] // 8
+    size = max(1, int(capacity * case["fill"]) - PAYLOAD_OVERHEAD)
+
+    if case["payload"] == "random":
+        writeFile(os.path.join(folder_path, "random.bin"), rng.bytes(size))
+        return size
+
+    if case["payload"] == "text":
+        words = ["steganography", "pixel", "channel", "photo", "hidden", "data", "archive", "the", "and", "of"]
+        text = " ".join(words[i] for i in rng.integers(0, len(words), size // 5)).encode('utf-8')
+        writeFile(os.path.join(folder_path, "text.txt"), text[:size])
+        return len(text[:size])
+
+    # A tree of many small files needs room for an entry header per file
+    num_files = max(1, size // (TREE_FILE_SIZE + 64))
+    for i in range(num_files):
+        folder = os.path.join(folder_path, "folder_" + str(i // TREE_FOLDER_SIZE))
+        os.makedirs(folder, exist_ok=True)
+        writeFile(os.path.join(folder, "file_" + str(i) + ".bin"), rng.bytes(TREE_FILE_SIZE))
+
+    return num_files * TREE_FILE_SIZE
+
+
+def writeFile(file_path, data):
+    """
+    :param file_path: The path of the file to be created.
+    :param data: The data written to the file.
+    """
+    with open(file_path, 'wb') as file:
+        file.write(data)
+
+
+def compareWithBaseline(results, baseline, threshold):
+    """
+    Compares the throughputs of every case with an earlier run and prints the differences.
+    :param results: The results of this run.
+    :param baseline: The results of the earlier run.
+    :param threshold: The slowdown (as a fraction) that counts as a regression.
+    :return: A list of the names of all measurements that have regressed.
+    """
+    regressions = []
+
+    for case_name, case in results["cases"].items():
+        baseline_case = baseline.get("cases", {}).get(case_name)
+
+        if baseline_case is None:
+            print(case_name + ": not in baseline", file=sys.stderr)
+            continue
+
+        measurements = [(phase, case[phase], baseline_case.get(phase, {})) for phase in ("hide", "extract")]
+        for stage_name, stage in case["stages"]["stages"].items():
+            measurements.append(("stage " + stage_name, stage, baseline_case.get("stages", {}).get("stages", {}).get(stage_name, {})))
+
+        for name, measurement, baseline_measurement in measurements:
+            value, baseline_value = measurement.get("mb_per_s"), baseline_measurement.get("mb_per_s")
+
+            if not value or not baseline_value or min(measurement["seconds"], baseline_measurement["seconds"]) < MIN_COMPARED_SECONDS:
+                continue
+
+            change = value / baseline_value - 1
+            regressed = change < -threshold
+
+            if regressed:
+                regressions.append(case_name + " " + name)
+
+            print("%-32s %-22s %10.2f MB/s  (baseline %10.2f MB/s, %+6.1f%%)%s" % (case_name, name, value, baseline_value, change * 100, "  REGRESSION" if regressed else ""), file=sys.stderr)
+
+    return regressions
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,373 @@
+from Data_Converters import Compression
+from Data_Converters.StegoErrors import CorruptDataError
+import collections, itertools, struct
+
+
+# Layout of the archive that all hidden data is converted into:
+#
+#     preamble:  magic (4 bytes) | version (1 byte) | codec (1 byte) | bits per channel (1 byte) | reserved (1 byte)
+#     contents:  length of the records (8 bytes) | records
+#     record:    entry type (1 byte) | path length (2 bytes) | data length (8 bytes) | restart offset (8 bytes) |
+#                skip (8 bytes) | path (utf-8)
+#     entries:   entry type (1 byte) | path length (2 bytes) | data length (8 bytes) | mode (2 bytes) |
+#                modification time (8 bytes) | path (utf-8) | data
+#     end:       an entry of type END_ENTRY with an empty path and no data
+#
+# Paths are relative to the folder the data gets recreated in and always use '/' as separator. Folders are listed
+# before anything stored inside of them. All numbers are stored big endian. The entries (but not the preamble and
+# the table of contents) are compressed with the codec named in the preamble (see Compression). The preamble itself
+# is always stored using one bit per channel value, since it tells how many bits per channel value the rest of the
+# data uses.
+#
+# The table of contents lists every entry but the end, so that the contents can be listed and single entries can be
+# extracted without reading everything before them. Decompressing can start at a restart point (see
+# Compression.restartCompressor), which is placed at least every RESTART_INTERVAL bytes of entries. The restart
+# offset of a record is the position of the last restart point before its entry, counted in (compressed) bytes from
+# the start of the entries, and skip is the number of (decompressed) bytes from there to the entry's header.
+# Uncompressed entries each start at their own restart point.
+#
+# The mode holds the permission bits of a file or folder and the modification time is in nanoseconds since the
+# epoch. A mode of 0 means that neither is known (e.g. for data held in memory), and they are then left alone when
+# the data gets recreated.
+MAGIC = b"HDPA"
+VERSION = 1
+
+PREAMBLE_FORMAT = ">4sBBBx"
+PREAMBLE_LENGTH = struct.calcsize(PREAMBLE_FORMAT)
+
+ENTRY_HEADER_FORMAT = ">BHQHq"
+ENTRY_HEADER_LENGTH = struct.calcsize(ENTRY_HEADER_FORMAT)
+
+CONTENTS_LENGTH_FORMAT = ">Q"
+CONTENTS_LENGTH_LENGTH = struct.calcsize(CONTENTS_LENGTH_FORMAT)
+
+CONTENTS_RECORD_FORMAT = ">BHQQQ"
+CONTENTS_RECORD_LENGTH = struct.calcsize(CONTENTS_RECORD_FORMAT)
+
+END_ENTRY = 0
+FOLDER_ENTRY = 1
+FILE_ENTRY = 2
+
+# Largest number of (uncompressed) bytes of entries between two restart points of compressed entries
+RESTART_INTERVAL = 2 ** 20
+
+
+# A record of the table of contents: the type, path and data length of an entry, and where reading it can start
+ContentsRecord = collections.namedtuple("ContentsRecord", ["entry_type", "path", "size", "restart_offset", "skip"])
+
+# The header of an entry, as read by ArchiveReader.readEntry (mode and mtime_ns are 0 if unknown)
+ArchiveEntry = collections.namedtuple("ArchiveEntry", ["entry_type", "path", "size", "mode", "mtime_ns"])
+
+
+def createPreamble(codec=Compression.NONE, bits_per_channel=1):
+    """
+    Creates the bytes every archive starts with.
+    :param codec: The identifier of the codec the rest of the archive is compressed with.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing the rest
+    of the archive.
+    :return: The archive preamble in byte format.
+    """
+    return struct.pack(PREAMBLE_FORMAT, MAGIC, VERSION, codec, bits_per_channel)
+
+
+def isArchive(byte_data):
+    """
+    Checks whether the given data starts like an archive (as opposed to data from an older version of this program).
+    :param byte_data: The data (or at least its first few bytes) to be checked.
+    :return: True if the data starts with the archive magic number, otherwise False.
+    """
+    return bytes(byte_data[:len(MAGIC)]) == MAGIC
+
+
+def createEntryHeader(entry_type, relative_path, data_length, mode=0, mtime_ns=0):
+    """
+    Creates the header describing a single entry (file or folder) of the archive.
+    :param entry_type: FOLDER_ENTRY, FILE_ENTRY or END_ENTRY.
+    :param relative_path: The path of the entry, relative to the root of the archive, using '/' as separator.
+    :param data_length: The number of bytes of file data directly following the header (0 for folders).
+    :param mode: The permission bits of the file or folder, or 0 if unknown.
+    :param mtime_ns: The modification time of the file or folder, in nanoseconds since the epoch.
+    :return: The entry header (including the encoded path) in byte format.
+    """
+    b_path = relative_path.encode('utf-8')
+    return struct.pack(ENTRY_HEADER_FORMAT, entry_type, len(b_path), data_length, mode & 0o7777, mtime_ns) + b_path
+
+
+def getEntryHeaderLength(relative_path):
+    """
+    Gets the number of bytes that the header of an entry with the given path occupies.
+    :param relative_path: The path of the entry, relative to the root of the archive.
+    :return: The size of the entry header in bytes.
+    """
+    return ENTRY_HEADER_LENGTH + len(relative_path.encode('utf-8'))
+
+
+def createTableOfContents(records):
+    """
+    Creates the table of contents that follows the preamble.
+    :param records: The ContentsRecords of all entries, in the order they are stored in.
+    :return: The table of contents (including its length) in byte format.
+    """
+    contents = bytearray()
+
+    for record in records:
+        b_path = record.path.encode('utf-8')
+        contents += struct.pack(CONTENTS_RECORD_FORMAT, record.entry_type, len(b_path), record.size, record.restart_offset, record.skip) + b_path
+
+    return struct.pack(CONTENTS_LENGTH_FORMAT, len(contents)) + contents
+
+
+def getTableOfContentsLength(relative_paths):
+    """
+    Gets the number of bytes the table of contents of the given entries occupies.
+    :param relative_paths: The paths of all entries.
+    :return: The size of the table of contents (including its length) in bytes.
+    """
+    return CONTENTS_LENGTH_LENGTH + sum(CONTENTS_RECORD_LENGTH + len(path.encode('utf-8')) for path in relative_paths)
+
+
+def readTableOfContents(contents):
+    """
+    Reads the records of a table of contents.
+    :param contents: The records of the table of contents in byte format (without their length).
+    :return: A list of the ContentsRecords.
+    """
+    records = []
+    position = 0
+
+    while position < len(contents):
+        if position + CONTENTS_RECORD_LENGTH > len(contents):
+            raise CorruptDataError("Unable to extract data from the given image(s). The table of contents of the hidden data is damaged.")
+
+        entry_type, path_length, size, restart_offset, skip = struct.unpack_from(CONTENTS_RECORD_FORMAT, contents, position)
+        position += CONTENTS_RECORD_LENGTH
+
+        relative_path = bytes(contents[position:position + path_length]).decode('utf-8', errors='replace')
+        position += path_length
+        checkRelativePath(relative_path)
+
+        records.append(ContentsRecord(entry_type, relative_path, size, restart_offset, skip))
+
+    return records
+
+
+def storeEntries(entries, codec, output):
+    """
+    Writes all entries of an archive (everything following the table of contents) to a file object.
+    :param entries: The entries to be stored (see compressEntries).
+    :param codec: The identifier of the codec used for compressing the entries.
+    :param output: The binary file object the (compressed) entries are written to.
+    :return: A list of the ContentsRecords of all entries, for the table of contents.
+    """
+    records = []
+
+    for chunk in compressEntries(entries, codec, records):
+        output.write(chunk)
+
+    return records
+
+
+def compressEntries(entries, codec, records):
+    """
+    Produces all entries of an archive (everything following the table of contents), compressing them with the
+    given codec and placing restart points along the way.
+    :param entries: An iterable yielding a tuple for every file and folder, containing its entry type, its relative
+    path, its data length, an iterable yielding its data in consecutive chunks (empty for folders), its mode and its
+    modification time (see createEntryHeader).
+    :param codec: The identifier of the codec used for compressing the entries.
+    :param records: A list the ContentsRecord of every entry is appended to, for the table of contents. It is only
+    complete once the generator is exhausted.
+    :return: A generator yielding the (compressed) entries in consecutive chunks of bytes.
+    """
+    compressor = Compression.createCompressor(codec) if codec != Compression.NONE else None
+
+    position = 0
+    restart_offset = 0
+    bytes_since_restart = 0
+
+    for entry_type, relative_path, data_length, data_chunks, mode, mtime_ns in entries:
+        if compressor is None:
+            restart_offset = position
+        elif bytes_since_restart >= RESTART_INTERVAL:
+            compressed, compressor = Compression.restartCompressor(compressor, codec)
+            position += len(compressed)
+            yield compressed
+
+            restart_offset = position
+            bytes_since_restart = 0
+
+        records.append(ContentsRecord(entry_type, relative_path, data_length, restart_offset, bytes_since_restart))
+
+        header = createEntryHeader(entry_type, relative_path, data_length, mode, mtime_ns)
+        bytes_since_restart += len(header)
+
+        for data in itertools.chain([header], data_chunks):
+            stored = compressor.compress(data) if compressor is not None else data
+            position += len(stored)
+
+            if len(stored) > 0:
+                yield stored
+
+        bytes_since_restart += data_length
+
+    end = createEntryHeader(END_ENTRY, "", 0)
+    yield compressor.compress(end) + compressor.flush() if compressor is not None else end
+
+
+def checkRelativePath(relative_path):
+    """
+    Makes sure that a path read from an archive stays inside of the folder the data gets recreated in.
+    :param relative_path: The path of the entry, as stored in the archive.
+    """
+    parts = relative_path.split('/')
+
+    if relative_path == "" or relative_path.startswith('/') or '\\' in relative_path or any(part in ("", ".", "..") for part in parts):
+        raise CorruptDataError("Unable to extract data from the given image(s). Invalid path found in hidden data: '" + relative_path + "'")
+
+
+def readSingleFileArchive(chunks):
+    """
+    Reads the data of the one file stored in an archive, such as the archive created for data held in memory.
+    :param chunks: An iterable yielding the archive in consecutive chunks of byte data.
+    :return: The data of the file in byte format.
+    """
+    reader = ArchiveReader(chunks)
+    reader.readPreamble()
+
+    entry = reader.readEntry()
+    if entry is None or entry.entry_type != FILE_ENTRY:
+        raise CorruptDataError("The hidden data is not a single file and can only be extracted into a folder.")
+
+    data = b"".join(reader.readData(entry.size))
+
+    if reader.readEntry() is not None:
+        raise CorruptDataError("The hidden data is not a single file and can only be extracted into a folder.")
+
+    return data
+
+
+def skipBytes(chunks, num_bytes):
+    """
+    Leaves out the first bytes of a stream of chunks.
+    :param chunks: An iterable yielding data in consecutive chunks of bytes.
+    :param num_bytes: The number of bytes to leave out.
+    :return: A generator yielding the rest of the data in consecutive chunks.
+    """
+    for chunk in chunks:
+        if num_bytes >= len(chunk):
+            num_bytes -= len(chunk)
+            continue
+
+        yield chunk[num_bytes:] if num_bytes > 0 else chunk
+        num_bytes = 0
+
+
+class ArchiveReader:
+    """
+    Reads an archive incrementally from an iterable of byte chunks, so that only a small part of it ever needs to be
+    held in memory. Entries can also be read on their own, starting at any entry header (see readEntry).
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+
+        # Filled in by readPreamble: the codec, the table of contents and the position of the first byte of the
+        # entries within the archive
+        self.codec = Compression.NONE
+        self.table_of_contents = None
+        self.entries_offset = PREAMBLE_LENGTH
+
+    def fillBuffer(self, length):
+        """
+        Pulls chunks until at least 'length' bytes are buffered (or no chunks are left).
+        :param length: The number of bytes needed.
+        """
+        while len(self.buffer) < length:
+            chunk = next(self.chunks, None)
+
+            if chunk is None:
+                return
+
+            self.buffer += chunk
+
+    def read(self, length):
+        """
+        Reads exactly 'length' bytes from the archive.
+        :param length: The number of bytes to read.
+        :return: The bytes that have been read.
+        """
+        self.fillBuffer(length)
+
+        if len(self.buffer) < length:
+            raise CorruptDataError("Unable to extract data from the given image(s). The hidden data ends unexpectedly.")
+
+        data = bytes(self.buffer[:length])
+        del self.buffer[:length]
+
+        return data
+
+    def readPreamble(self):
+        """
+        Reads and checks the preamble at the start of the archive, along with the table of contents.
+        Everything read afterwards gets decompressed with the codec named in the preamble.
+        :return: The identifier of the codec the archive has been compressed with.
+        """
+        magic, version, codec, bits_per_channel = struct.unpack(PREAMBLE_FORMAT, self.read(PREAMBLE_LENGTH))
+
+        if magic != MAGIC or version != VERSION:
+            raise CorruptDataError("Unable to extract data from the given image(s). Unsupported hidden data format.")
+
+        self.codec = codec
+
+        contents_length = struct.unpack(CONTENTS_LENGTH_FORMAT, self.read(CONTENTS_LENGTH_LENGTH))[0]
+        self.table_of_contents = readTableOfContents(self.read(contents_length))
+        self.entries_offset = PREAMBLE_LENGTH + CONTENTS_LENGTH_LENGTH + contents_length
+
+        if codec != Compression.NONE:
+            compressed_chunks = itertools.chain([bytes(self.buffer)], self.chunks)
+            self.buffer = bytearray()
+            self.chunks = Compression.decompressChunks(compressed_chunks, codec)
+
+        return codec
+
+    def readEntry(self):
+        """
+        Reads the header of the next entry of the archive. For file entries, the file data must then be read with
+        readData before reading the next entry.
+        :return: The ArchiveEntry read, or None if the end of the archive has been reached.
+        """
+        entry_type, path_length, data_length, mode, mtime_ns = struct.unpack(ENTRY_HEADER_FORMAT, self.read(ENTRY_HEADER_LENGTH))
+
+        if entry_type == END_ENTRY:
+            return None
+
+        try:
+            relative_path = self.read(path_length).decode('utf-8')
+        except UnicodeDecodeError:
+            raise CorruptDataError("Unable to extract data from the given image(s). Invalid path found in hidden data.")
+
+        checkRelativePath(relative_path)
+
+        if entry_type not in (FOLDER_ENTRY, FILE_ENTRY) or (entry_type == FOLDER_ENTRY and data_length != 0):
+            raise CorruptDataError("Unable to extract data from the given image(s). Invalid entry found in hidden data: '" + relative_path + "'")
+
+        return ArchiveEntry(entry_type, relative_path, data_length, mode, mtime_ns)
+
+    def readData(self, length):
+        """
+        Reads the data of a file entry piece by piece.
+        :param length: The data length of the entry, as returned by readEntry.
+        :return: A generator yielding the data of the entry in consecutive chunks.
+        """
+        while length > 0:
+            self.fillBuffer(1)
+
+            if len(self.buffer) == 0:
+                raise CorruptDataError("Unable to extract data from the given image(s). The hidden data ends unexpectedly.")
+
+            piece = bytes(self.buffer[:length])
+            del self.buffer[:len(piece)]
+            length -= len(piece)
+
+            yield piece
@@ -1,58 +1,60 @@
-import pickle, sys
+from Data_Converters.BitStream import BitStream
+from Data_Converters.StegoErrors import CorruptDataError
+import io, pickle
 
 
-def convertBytesToBinaryByteArray(byte_data):
+class RestrictedUnpickler(pickle.Unpickler):
     """
-    Converts value of type 'bytes' to its binary representation, where the zeroes and ones are stored in a bytearray.
-    :param byte_data: Value of type 'bytes' that will be converted.
-    :return: Byte data converted to binary data stored in a bytearray.
+    Unpickler that refuses to load anything besides the built in types a directory dictionary is made of (dict and
+    bytes), so that data extracted from images can never run any code while being loaded.
     """
-    zeroes_ones = bytearray()
 
-    for byte in byte_data:
-        binary_representation = bin(byte)[2:].zfill(8)
-        zeroes_ones.extend(map(int, binary_representation))
+    def find_class(self, module, name):
+        raise pickle.UnpicklingError("Forbidden object in hidden data: " + module + "." + name)
 
-    return zeroes_ones
+
+def convertBytesToBinaryByteArray(byte_data):
+    """
+    Converts value of type 'bytes' to its binary representation. The bits stay packed (eight to a byte), so no
+    additional memory is needed for the conversion.
+    :param byte_data: Value of type 'bytes' that will be converted.
+    :return: Byte data converted to binary data stored in a BitStream.
+    """
+    return BitStream(byte_data)
 
 
 def convertBinaryByteArrayToBytes(binary_data):
     """
-    Converts a bytearray containing zeroes and ones to a variable of type bytes.
+    Converts a BitStream of zeroes and ones to a variable of type bytes.
     :param binary_data: The binary data that'll be converted to bytes.
     :return: The binary data in byte format.
     """
-    byte_string = "".join(map(str, binary_data))
-    byte_data = bytearray()
-
-    for i in range(0, len(byte_string), 8):
-        byte_value = int(byte_string[i:i+8], 2)
-        byte_data.append(byte_value)
+    return binary_data.toBytes()
 
-    return bytes(byte_data)
 
-
-def convertByteDataListToFullBinary(byte_data_list):
+def convertFullBinaryToByteDataList(binary_data):
     """
-    Converts a dictionary representation of an entire directory's contents, including all files in all/any subfolders
-    and their names into a full string of zeroes and ones.
-    :param byte_data_list: The dictionary representation of an entire directory's contents.
-    :return: The dictionary representation, represented as binary data stored in a bytearray.
+    Converts binary data stored in a BitStream into a dictionary representation of an entire directory's contents.
+    :param binary_data: The binary data that will end up getting converted.
+    :return: The dictionary representation of an entire directory's contents, which was created from 'binary_data'.
     """
-    return convertBytesToBinaryByteArray(pickle.dumps(byte_data_list))
+    return convertBytesToByteDataList(convertBinaryByteArrayToBytes(binary_data))
 
 
-def convertFullBinaryToByteDataList(binary_data):
+def convertBytesToByteDataList(byte_data):
     """
-    Converts binary data stored in a bytearray into a dictionary representation of an entire directory's contents.
-    :param binary_data: The binary data that will end up getting converted.
-    :return: The dictionary representation of an entire directory's contents, which was created from 'binary_data'.
+    Converts data of type 'bytes' into a dictionary representation of an entire directory's contents. (Data has been
+    stored this way by versions of this program from before the archive format was introduced.)
+    :param byte_data: The byte data that will end up getting converted.
+    :return: The dictionary representation of an entire directory's contents, which was created from 'byte_data'.
     """
-    byte_data_list = pickle.loads(convertBinaryByteArrayToBytes(binary_data))
+    try:
+        byte_data_list = RestrictedUnpickler(io.BytesIO(byte_data)).load()
+    except Exception:
+        raise CorruptDataError("Unable to extract data from the given image(s).")
 
     # Data being loaded must load up as a variable of type dictionary, containing all stored data
     if type(byte_data_list) != type(dict()):
-        print("Error - Unable to extract data from the given image(s)")
-        sys.exit(1)
+        raise CorruptDataError("Unable to extract data from the given image(s).")
 
-    return byte_data_list
\ No newline at end of file
+    return byte_data_list
@@ -0,0 +1,219 @@
+import numpy
+
+
+class BitStream:
+    """
+    A sequence of bits, packed eight to a byte (most significant bit first), together with its exact length in bits.
+    """
+
+    def __init__(self, data=b"", bit_length=None):
+        """
+        :param data: The packed bytes holding the bits. The data is not copied.
+        :param bit_length: The number of valid bits in 'data'. Defaults to every bit of every byte.
+        """
+        if bit_length is None:
+            bit_length = len(data) * 8
+
+        self.data = data
+        self.bit_length = bit_length
+
+    def __len__(self):
+        return self.bit_length
+
+    @classmethod
+    def fromBitArray(cls, bit_array):
+        """
+        Packs an array of zeroes and ones into a new bit stream.
+        :param bit_array: The zeroes and ones to be packed (any sequence accepted by numpy, e.g. a bytearray).
+        :return: The newly created bit stream.
+        """
+        bit_array = numpy.asarray(bit_array, dtype=numpy.uint8)
+        return cls(numpy.packbits(bit_array).tobytes(), len(bit_array))
+
+    def getBitArray(self, start=0, length=None):
+        """
+        Unpacks a range of bits from the stream. Only the bytes covering the requested range get unpacked.
+        :param start: The index of the first bit to unpack.
+        :param length: The number of bits to unpack. Defaults to every bit from 'start' to the end of the stream.
+        :return: The requested bits (zeroes and ones) as a uint8 numpy array.
+        """
+        if length is None:
+            length = self.bit_length - start
+
+        first_byte = start // 8
+        last_byte = (start + length + 7) // 8
+        packed = numpy.frombuffer(self.data, dtype=numpy.uint8, count=last_byte - first_byte, offset=first_byte)
+        skip = start % 8
+
+        return numpy.unpackbits(packed, count=skip + length)[skip:]
+
+    def toBytes(self):
+        """
+        Gets the packed bytes of the stream. The last byte is padded with zeroes if the length is not a multiple of 8.
+        :return: The bits of the stream as a value of type 'bytes'.
+        """
+        return bytes(self.data[:(self.bit_length + 7) // 8])
+
+
+class BitWriter:
+    """
+    Builds a bit stream by appending bits, storing them packed as they arrive.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.bit_length = 0
+
+    def __len__(self):
+        return self.bit_length
+
+    def writeBits(self, bit_array):
+        """
+        Appends zeroes and ones to the end of the stream.
+        :param bit_array: The bits to append (any sequence accepted by numpy, e.g. a uint8 numpy array).
+        """
+        bit_array = numpy.asarray(bit_array, dtype=numpy.uint8)
+        used = self.bit_length % 8
+        head_length = 0
+
+        # First fill up the remaining bits of a partially used last byte
+        if used != 0:
+            head_length = min(8 - used, len(bit_array))
+            head = numpy.zeros(8, dtype=numpy.uint8)
+            head[used:used + head_length] = bit_array[:head_length]
+            self.data[-1] |= int(numpy.packbits(head)[0])
+
+        self.data += numpy.packbits(bit_array[head_length:]).tobytes()
+        self.bit_length += len(bit_array)
+
+    def getBitStream(self):
+        """
+        :return: A bit stream containing every bit written so far. The data is not copied.
+        """
+        return BitStream(self.data, self.bit_length)
+
+
+class BitReader:
+    """
+    Reads consecutive runs of bits from a bit stream.
+    """
+
+    def __init__(self, bit_stream):
+        self.bit_stream = bit_stream
+        self.position = 0
+
+    def readBits(self, length):
+        """
+        Reads the next bits of the stream.
+        :param length: The number of bits to read.
+        :return: The bits that have been read, as a new bit stream.
+        """
+        if self.position + length > len(self.bit_stream):
+            raise EOFError("Not enough bits left in the stream")
+
+        bits = BitStream.fromBitArray(self.bit_stream.getBitArray(self.position, length))
+        self.position += length
+
+        return bits
+
+
+class ChunkedBitReader:
+    """
+    Reads consecutive runs of bits from a stream of data that arrives as an iterable of byte chunks. Only the chunks
+    needed for the bits being read are pulled, so the whole stream never has to be held in memory.
+    """
+
+    def __init__(self, chunks, bit_length=None):
+        """
+        :param chunks: An iterable yielding the data of the stream in consecutive chunks of bytes.
+        :param bit_length: The total number of bits in the stream, or None if it is not known in advance.
+        """
+        self.chunks = iter(chunks)
+        self.bit_length = bit_length
+        self.buffer = bytearray()
+        self.bit_offset = 0
+
+    def __len__(self):
+        return self.bit_length
+
+    def readBits(self, length):
+        """
+        Reads the next bits of the stream.
+        :param length: The number of bits to read.
+        :return: The bits that have been read, as a new bit stream.
+        """
+        if self.fillBuffer(length) < length:
+            raise EOFError("Not enough bits left in the stream")
+
+        return self.takeBits(length)
+
+    def readAvailableBits(self, length):
+        """
+        Reads the next bits of the stream, or all bits left if there are fewer.
+        :param length: The largest number of bits to read.
+        :return: The bits that have been read, as a new bit stream (shorter than 'length' only at the end).
+        """
+        return self.takeBits(min(length, self.fillBuffer(length)))
+
+    def skipToEnd(self):
+        """
+        Reads the rest of the stream without keeping any of it.
+        :return: The number of bits that have been skipped.
+        """
+        num_bits = len(self.buffer) * 8 - self.bit_offset
+
+        for chunk in self.chunks:
+            num_bits += len(chunk) * 8
+
+        self.buffer = bytearray()
+        self.bit_offset = 0
+
+        return num_bits
+
+    def fillBuffer(self, length):
+        """
+        Pulls chunks until the buffer holds at least 'length' unread bits or the stream ends.
+        :param length: The number of unread bits wanted.
+        :return: The number of unread bits in the buffer.
+        """
+        needed_bytes = (self.bit_offset + length + 7) // 8
+
+        while len(self.buffer) < needed_bytes:
+            chunk = next(self.chunks, None)
+
+            if chunk is None:
+                break
+
+            self.buffer += chunk
+
+        return len(self.buffer) * 8 - self.bit_offset
+
+    def takeBits(self, length):
+        """
+        Removes the next bits from the buffer, which must already hold them (see fillBuffer).
+        :param length: The number of bits to take.
+        :return: The bits, as a new bit stream.
+        """
+        needed_bytes = (self.bit_offset + length + 7) // 8
+        bits = BitStream(self.buffer, needed_bytes * 8).getBitArray(self.bit_offset, length)
+
+        consumed_bits = self.bit_offset + length
+        del self.buffer[:consumed_bits // 8]
+        self.bit_offset = consumed_bits % 8
+
+        return BitStream.fromBitArray(bits)
+
+    def isAtEnd(self):
+        """
+        Checks whether every bit of the stream has been read.
+        :return: True if no data is left in the stream, otherwise False.
+        """
+        if len(self.buffer) * 8 > self.bit_offset:
+            return False
+
+        for chunk in self.chunks:
+            if len(chunk) > 0:
+                self.buffer += chunk
+                return False
+
+        return True
@@ -1,5 +1,19 @@
-import os
-import sys
+from Data_Converters import ArchiveFormat
+from Data_Converters.StegoErrors import CorruptDataError, InvalidInputError
+import collections, concurrent.futures, os
+
+
+# Number of batches of files written at the same time while data is being recreated
+FILE_WRITING_THREADS = 8
+
+# Largest number of bytes of file data waiting to be written at any time
+WRITE_BUFFER_LIMIT = 32 * 2 ** 20
+
+# Files no larger than WRITE_BATCH_SIZE are collected in memory and written in batches (of up to WRITE_BATCH_SIZE
+# bytes and at most WRITE_BATCH_LENGTH files) by a pool of threads. Larger files are written piece by piece as their
+# data arrives.
+WRITE_BATCH_SIZE = 2 ** 20
+WRITE_BATCH_LENGTH = 64
 
 
 def writeByteDataToFile(destination_file, byte_data):
@@ -12,30 +26,301 @@ def writeByteDataToFile(destination_file, byte_data):
         destination.write(byte_data)
 
 
-def createDirectoryFromByteData(folder_path, byte_data_list):
+def writeFileBatch(batch, sync=False):
+    """
+    Writes a batch of files (see DirectoryWriter.writeFile). (This function runs on one of the threads of a
+    DirectoryWriter.)
+    :param batch: A list containing a tuple of the path, the data, the permission bits and the modification time of
+    every file.
+    :param sync: Whether the files are flushed to the disk (with fsync) once all of them have been written.
+    """
+    for file_path, byte_data, mode, mtime_ns in batch:
+        writeByteDataToFile(file_path, byte_data)
+        applyMetadata(file_path, mode, mtime_ns)
+
+    if sync:
+        for file_path, byte_data, mode, mtime_ns in batch:
+            syncPath(file_path)
+
+
+def applyMetadata(path, mode, mtime_ns):
+    """
+    Gives a recreated file or folder its original permission bits and modification time.
+    :param path: The path to the file or folder.
+    :param mode: The permission bits, or 0 if they are unknown (in which case nothing is changed).
+    :param mtime_ns: The modification time in nanoseconds since the epoch.
+    """
+    if mode == 0:
+        return
+
+    os.chmod(path, mode & 0o777)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def syncPath(path):
+    """
+    Flushes a file or folder that has been written to the disk.
+    :param path: The path to the file or folder.
+    """
+    try:
+        descriptor = os.open(path, os.O_RDONLY)
+    except OSError:
+        # e.g. folders can't be opened on some systems
+        return
+
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+
+class DirectoryWriter:
     """
-    Creates a directory inside 'folder_path', containing all the data in 'byte_data_list'.
+    Recreates files and folders inside a folder. Small files are collected into batches that a pool of threads
+    writes while the data of the next files is still being read, with at most 'buffer_limit' bytes of file data
+    waiting to be written at any time. Files get their permission bits and modification time as soon as they are
+    written, folders only once everything inside of them has been written (see close).
+    """
+
+    def __init__(self, folder_path, num_threads=FILE_WRITING_THREADS, buffer_limit=WRITE_BUFFER_LIMIT, sync=False):
+        # Specified path must lead to a folder
+        if not os.path.isdir(folder_path):
+            raise InvalidInputError("Specified directory for adding data leads to a file - not a folder.")
+
+        self.folder_path = folder_path
+        self.buffer_limit = buffer_limit
+        self.sync = sync
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, num_threads))
+
+        # The batches being written, as tuples of their future and their size, and the batch being collected
+        self.batches = collections.deque()
+        self.buffered_bytes = 0
+        self.batch = []
+        self.batch_size = 0
+
+        # Every folder that exists, and the permission bits and modification time of every recreated folder
+        self.folders = {folder_path}
+        self.folder_metadata = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def getPath(self, relative_path):
+        """
+        Gets the full path of an entry.
+        :param relative_path: The path of the entry relative to the folder, using '/' as separator ('' for the folder
+        itself).
+        :return: The full path of the entry.
+        """
+        if relative_path == "":
+            return self.folder_path
+
+        return os.path.join(self.folder_path, *relative_path.split('/'))
+
+    def makeFolders(self, path):
+        """
+        Creates a folder along with any folders holding it, unless it already exists.
+        :param path: The full path of the folder.
+        """
+        if path not in self.folders:
+            os.makedirs(path, exist_ok=True)
+            self.folders.add(path)
+
+    def createFolders(self, relative_paths):
+        """
+        Creates the skeleton of folders that files are written into, before any file is written.
+        :param relative_paths: The paths of the folders, relative to the folder.
+        """
+        for relative_path in relative_paths:
+            self.makeFolders(self.getPath(relative_path))
+
+    def createFolder(self, relative_path, mode=0, mtime_ns=0):
+        """
+        Recreates a folder (which may already exist).
+        :param relative_path: The path of the folder, relative to the folder everything is recreated in.
+        :param mode: The permission bits of the folder, or 0 if unknown.
+        :param mtime_ns: The modification time of the folder in nanoseconds since the epoch.
+        """
+        path = self.getPath(relative_path)
+        self.makeFolders(path)
+
+        if mode != 0:
+            self.folder_metadata[path] = (mode, mtime_ns)
+
+    def writeFile(self, relative_path, data_chunks, data_length, mode=0, mtime_ns=0):
+        """
+        Recreates a file. Small files are written later on, by the pool of threads.
+        :param relative_path: The path of the file, relative to the folder everything is recreated in.
+        :param data_chunks: An iterable yielding the data of the file in consecutive chunks. It is read completely
+        before this method returns.
+        :param data_length: The size of the file in bytes.
+        :param mode: The permission bits of the file, or 0 if unknown.
+        :param mtime_ns: The modification time of the file in nanoseconds since the epoch.
+        """
+        path = self.getPath(relative_path)
+
+        # The folders holding the file may have been left out
+        self.makeFolders(os.path.dirname(path))
+
+        if data_length > WRITE_BATCH_SIZE:
+            with open(path, 'wb') as destination:
+                for piece in data_chunks:
+                    destination.write(piece)
+
+            applyMetadata(path, mode, mtime_ns)
+
+            if self.sync:
+                syncPath(path)
+            return
+
+        byte_data = b"".join(data_chunks)
+        self.batch.append((path, byte_data, mode, mtime_ns))
+        self.batch_size += len(byte_data)
+
+        if self.batch_size >= WRITE_BATCH_SIZE or len(self.batch) >= WRITE_BATCH_LENGTH:
+            self.submitBatch()
+
+    def submitBatch(self):
+        """
+        Hands the collected batch of files over to the pool of threads, first waiting for earlier batches to be
+        written as long as too much data is waiting.
+        """
+        # Errors of batches that have been written are raised as early as possible
+        while len(self.batches) > 0 and (self.batches[0][0].done() or self.buffered_bytes + self.batch_size > self.buffer_limit):
+            self.waitForBatch()
+
+        if len(self.batch) == 0:
+            return
+
+        self.batches.append((self.executor.submit(writeFileBatch, self.batch, self.sync), self.batch_size))
+        self.buffered_bytes += self.batch_size
+        self.batch = []
+        self.batch_size = 0
+
+    def waitForBatch(self):
+        """
+        Waits until the oldest batch that is being written has been written.
+        """
+        future, batch_size = self.batches.popleft()
+        future.result()
+        self.buffered_bytes -= batch_size
+
+    def close(self):
+        """
+        Waits until every file has been written and gives the folders their permission bits and modification times
+        (the deepest folders first, since recreating anything inside a folder changes its modification time).
+        """
+        try:
+            self.submitBatch()
+
+            while len(self.batches) > 0:
+                self.waitForBatch()
+        finally:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+        for path in sorted(self.folder_metadata, reverse=True):
+            applyMetadata(path, *self.folder_metadata[path])
+
+        if self.sync:
+            for path in self.folders:
+                syncPath(path)
+
+
+def createDirectoryFromByteData(folder_path, byte_data_list, sync=False):
+    """
+    Creates a directory inside 'folder_path', containing all the data in 'byte_data_list'. All folders are created
+    first, and then the files are written (see DirectoryWriter).
     :param folder_path: The location where all the data will be recreated.
     :param byte_data_list: The dictionary representation of an entire directory's contents.
+    :param sync: Whether all recreated files and folders are flushed to the disk (with fsync).
+    """
+    byte_data_entries = list(getByteDataEntries(byte_data_list))
+
+    with DirectoryWriter(folder_path, sync=sync) as writer:
+        writer.createFolders([relative_path for relative_path, value in byte_data_entries if type(value) == dict])
+
+        for relative_path, value in byte_data_entries:
+            if type(value) != dict:
+                writer.writeFile(relative_path, [value], len(value))
+
+
+def getByteDataEntries(byte_data_list, relative_path=""):
+    """
+    Lists the contents of the dictionary representation of a directory. (Part of createDirectoryFromByteData)
+    :param byte_data_list: The dictionary representation of the directory's contents.
+    :param relative_path: The path of the directory, relative to the folder everything is recreated in.
+    :return: A generator yielding a tuple for every file and folder of its relative path and its value (the file
+    data, or the dictionary of the folder's contents). A folder with an empty name at the top stands for the
+    directory itself.
     """
-    # Specified path must lead to a folder
-    if not os.path.isdir(folder_path):
-        print("Error - Specified directory for adding data leads to a file - not a folder.")
-        sys.exit(1)
-    
     for key, value in byte_data_list.items():
+        # The dictionary comes from hidden data, so it is checked just like the entries of an archive
+        if type(key) != bytes or type(value) not in (bytes, dict):
+            raise CorruptDataError("Unable to extract data from the given image(s). Invalid entry found in hidden data.")
+
+        try:
+            name = key.decode('utf-8')
+        except UnicodeDecodeError:
+            raise CorruptDataError("Unable to extract data from the given image(s). Invalid path found in hidden data.")
+
+        if relative_path == "" and name == "" and type(value) == dict:
+            sub_dir_relative_path = ""
+        else:
+            sub_dir_relative_path = relative_path + "/" + name if relative_path != "" else name
+            ArchiveFormat.checkRelativePath(sub_dir_relative_path)
+
+        yield (sub_dir_relative_path, value)
+
         # Current dictionary value is recognized as a folder
         if type(value) == dict:
-            sub_dir_path = os.path.join(folder_path, key.decode('utf-8'))
-
-            # Otherwise, a FileExistsError exception would be thrown
-            if sub_dir_path != folder_path + "/":
-                os.mkdir(sub_dir_path)
-            
-            createDirectoryFromByteData(sub_dir_path, value)
-            continue
-        
-        file_path = os.path.join(folder_path, key.decode('utf-8'))
-        
-        # Creates a file at the specified path if one does not exist and then writes the byte data to it
-        writeByteDataToFile(file_path, value)
\ No newline at end of file
+            yield from getByteDataEntries(value, sub_dir_relative_path)
+
+
+def createDirectoryFromArchive(folder_path, chunks, sync=False):
+    """
+    Recreates all the data stored in an archive (see ArchiveFormat) inside 'folder_path'. The archive is read
+    incrementally, so every file gets written as soon as its data is available. The folders listed in the table of
+    contents are all created before any file is written.
+    :param folder_path: The location where all the data will be recreated.
+    :param chunks: An iterable yielding the archive in consecutive chunks of byte data.
+    :param sync: Whether all recreated files and folders are flushed to the disk (with fsync).
+    """
+    with DirectoryWriter(folder_path, sync=sync) as writer:
+        reader = ArchiveFormat.ArchiveReader(chunks)
+        reader.readPreamble()
+
+        writer.createFolders([record.path for record in reader.table_of_contents if record.entry_type == ArchiveFormat.FOLDER_ENTRY])
+
+        entry = reader.readEntry()
+        while entry is not None:
+            writeArchiveEntry(writer, reader, entry)
+            entry = reader.readEntry()
+
+
+def writeArchiveEntry(writer, reader, entry, selected=True):
+    """
+    Recreates a single entry of an archive, whose header has just been read.
+    :param writer: The DirectoryWriter recreating the data.
+    :param reader: The ArchiveReader the entry has been read from.
+    :param entry: The ArchiveEntry, as returned by ArchiveReader.readEntry.
+    :param selected: Whether the entry gets recreated. The data of a file that isn't selected is read and dropped.
+    """
+    if not selected:
+        for piece in reader.readData(entry.size):
+            pass
+        return
+
+    if entry.entry_type == ArchiveFormat.FOLDER_ENTRY:
+        writer.createFolder(entry.path, entry.mode, entry.mtime_ns)
+        return
+
+    # Creates a file at the specified path and writes the byte data to it as it arrives
+    writer.writeFile(entry.path, reader.readData(entry.size), entry.size, entry.mode, entry.mtime_ns)
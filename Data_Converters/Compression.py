@@ -0,0 +1,185 @@
+from Data_Converters.StegoErrors import CorruptDataError, InvalidSettingError
+import bz2, lzma, time, zlib
+
+
+# Codec identifiers, as stored in the archive preamble
+NONE = 0
+ZLIB = 1
+BZ2 = 2
+LZMA = 3
+
+CODEC_NAMES = {"none": NONE, "zlib": ZLIB, "bz2": BZ2, "lzma": LZMA}
+
+# Number of bytes from the start of the data used for trying out every codec in 'auto' mode
+SAMPLE_SIZE = 2 ** 20
+
+# In 'auto' mode, the fastest codec whose output is at most this much larger than the smallest output is chosen
+SIZE_TOLERANCE = 1.05
+
+# In 'auto' mode, data that can't be shrunk below this fraction of its size is not compressed at all
+MIN_COMPRESSION_RATIO = 0.95
+
+# Largest piece of decompressed data produced at once, so that highly compressed data never expands all at once
+DECOMPRESSED_CHUNK_SIZE = 2 ** 20
+
+
+def getCodec(compression):
+    """
+    Gets the codec identifier for the name of a compression setting.
+    :param compression: One of 'none', 'zlib', 'bz2' or 'lzma' ('auto' is handled by chooseCodec).
+    :return: The codec identifier.
+    """
+    if compression not in CODEC_NAMES:
+        raise InvalidSettingError("Unknown compression '" + str(compression) + "'. Choose one of: auto, " + ", ".join(CODEC_NAMES) + ".")
+
+    return CODEC_NAMES[compression]
+
+
+def getCodecName(codec):
+    """
+    :param codec: The codec identifier.
+    :return: The name of the codec.
+    """
+    for name, value in CODEC_NAMES.items():
+        if value == codec:
+            return name
+
+    return "unknown"
+
+
+def createCompressor(codec):
+    """
+    :param codec: The codec identifier (anything but NONE).
+    :return: An incremental compressor object with the methods compress and flush.
+    """
+    if codec == ZLIB:
+        return zlib.compressobj()
+    if codec == BZ2:
+        return bz2.BZ2Compressor()
+
+    return lzma.LZMACompressor()
+
+
+def restartCompressor(compressor, codec):
+    """
+    Ends everything compressed so far in a way that decompressing can start right after it, without any of the
+    data before it (a restart point).
+    :param compressor: The compressor object (see createCompressor).
+    :param codec: The codec identifier the compressor belongs to.
+    :return: A tuple containing the remaining compressed data and the compressor to continue with.
+    """
+    # A full flush empties the zlib window, so the deflate stream can be picked up from here. bz2 and lzma streams
+    # can't be flushed like that, so a new stream is started instead.
+    if codec == ZLIB:
+        return (compressor.flush(zlib.Z_FULL_FLUSH), compressor)
+
+    return (compressor.flush(), createCompressor(codec))
+
+
+def createDecompressor(codec, from_restart_point=False):
+    """
+    :param codec: The codec identifier (anything but NONE).
+    :param from_restart_point: Whether decompressing starts at a restart point inside of the compressed data (see
+    restartCompressor) rather than at its very start.
+    :return: An incremental decompressor object with the method decompress.
+    """
+    if codec == ZLIB:
+        # Past its start, the zlib stream continues as raw deflate data
+        return zlib.decompressobj(-zlib.MAX_WBITS if from_restart_point else zlib.MAX_WBITS)
+    if codec == BZ2:
+        return bz2.BZ2Decompressor()
+    if codec == LZMA:
+        return lzma.LZMADecompressor()
+
+    raise CorruptDataError("Unable to extract data from the given image(s). The hidden data has been compressed with an unsupported codec.")
+
+
+def decompressChunks(chunks, codec, from_restart_point=False):
+    """
+    Decompresses a stream of data piece by piece.
+    :param chunks: An iterable yielding the compressed data in consecutive chunks of bytes.
+    :param codec: The codec identifier. With NONE, the chunks are passed on unchanged.
+    :param from_restart_point: Whether the chunks start at a restart point (see restartCompressor) rather than at
+    the very start of the compressed data.
+    :return: A generator yielding the decompressed data in consecutive chunks of at most DECOMPRESSED_CHUNK_SIZE
+    bytes.
+    """
+    if codec == NONE:
+        yield from chunks
+        return
+
+    decompressors = [createDecompressor(codec, from_restart_point)]
+
+    for chunk in chunks:
+        try:
+            for decompressed in decompressChunk(decompressors, codec, chunk):
+                if len(decompressed) > 0:
+                    yield decompressed
+        except (zlib.error, OSError, lzma.LZMAError, EOFError):
+            raise CorruptDataError("Unable to extract data from the given image(s). The hidden data could not be decompressed.")
+
+    if codec == ZLIB:
+        yield decompressors[0].flush()
+
+
+def decompressChunk(decompressors, codec, chunk):
+    """
+    Decompresses a single chunk of compressed data, in pieces of limited size.
+    :param decompressors: A list holding the decompressor object (see createDecompressor), which gets replaced
+    whenever a bz2 or lzma stream ends and the next one (see restartCompressor) begins.
+    :param codec: The codec identifier the decompressor belongs to.
+    :param chunk: The next chunk of compressed data.
+    :return: A generator yielding the decompressed data in consecutive pieces of at most DECOMPRESSED_CHUNK_SIZE bytes.
+    """
+    if codec == ZLIB:
+        # Input that didn't fit is handed back as the unconsumed tail
+        while True:
+            decompressed = decompressors[0].decompress(chunk, DECOMPRESSED_CHUNK_SIZE)
+            chunk = decompressors[0].unconsumed_tail
+            yield decompressed
+
+            if len(chunk) == 0 and len(decompressed) < DECOMPRESSED_CHUNK_SIZE:
+                return
+
+    # Input that didn't fit is kept by the decompressor until it asks for more
+    while True:
+        yield decompressors[0].decompress(chunk, DECOMPRESSED_CHUNK_SIZE)
+        chunk = b""
+
+        if decompressors[0].eof:
+            # Any data after the end of a stream belongs to the next one
+            chunk = decompressors[0].unused_data
+            decompressors[0] = createDecompressor(codec)
+
+            if len(chunk) == 0:
+                return
+        elif decompressors[0].needs_input:
+            return
+
+
+def chooseCodec(sample):
+    """
+    Picks the codec with the best tradeoff between size and speed for the given data ('auto' mode). Every codec
+    compresses the sample, and the fastest one whose output is close to the smallest output wins.
+    :param sample: The first bytes of the data to be compressed (up to SAMPLE_SIZE bytes).
+    :return: The codec identifier.
+    """
+    if len(sample) == 0:
+        return NONE
+
+    results = []
+    for codec in (ZLIB, BZ2, LZMA):
+        start = time.perf_counter()
+        compressor = createCompressor(codec)
+        size = len(compressor.compress(sample)) + len(compressor.flush())
+        results.append((time.perf_counter() - start, size, codec))
+
+    smallest_size = min(size for duration, size, codec in results)
+
+    # Data that barely shrinks (e.g. media files that are already compressed) is not worth compressing
+    if smallest_size > len(sample) * MIN_COMPRESSION_RATIO:
+        return NONE
+
+    for duration, size, codec in sorted(results):
+        if size <= smallest_size * SIZE_TOLERANCE:
+            return codec
@@ -1,62 +1,427 @@
-import os, sys
+from Data_Converters import ArchiveFormat, Compression
+from Data_Converters.StegoErrors import DataModifiedError, InvalidInputError
+import collections, concurrent.futures, itertools, os, stat, tempfile
 
 
-def extractByteFileData(filePath):
+# Number of bytes read from a file at a time while its contents are being streamed into the archive
+FILE_CHUNK_SIZE = 2 ** 20
+
+# Number of folders listed, and of files read, at the same time. Payloads of many small files spend most of their
+# time waiting on the disk for every single file rather than reading data, which reading several files at once hides.
+FILE_READING_THREADS = 8
+
+# Files no larger than FILE_CHUNK_SIZE are read ahead of the archive, in the background, up to this many bytes
+FILE_READ_AHEAD_LIMIT = 16 * 2 ** 20
+
+# Small files are read in batches of up to FILE_CHUNK_SIZE bytes, and at most this many files
+FILE_BATCH_LENGTH = 256
+
+# Compressed archives are kept in memory up to this size, and spill over into a temporary file beyond it
+COMPRESSED_DATA_MEMORY_LIMIT = 64 * 2 ** 20
+
+
+def getFileStat(filePath):
+    """
+    Gets the size, mode and modification time of a given file without reading its contents.
+    :param filePath: The path to the file.
+    :return: The os.stat_result of the file.
+    """
+    try:
+        return os.stat(filePath)
+    except FileNotFoundError:
+        raise InvalidInputError("Specified path to data that you want copied and hidden does not exist. (Path Name: '" + str(filePath) + "')")
+
+
+def extractByteFileData(filePath, size):
     """
-    Extracts the data from a given file and returns its contents in byte format.
+    Extracts the data from a given file piece by piece, so that the whole file never needs to be held in memory.
     :param filePath: The path to the file, whose contents will be extracted.
+    :param size: The size of the file in bytes, as it has been recorded in the archive.
+    :return: A generator yielding the contents of the file in byte format, in consecutive chunks.
+    """
+    try:
+        with open(filePath, 'rb') as file:
+            remaining = size
+
+            while remaining > 0:
+                data = file.read(min(remaining, FILE_CHUNK_SIZE))
+
+                # The file has been modified since its size was recorded
+                if len(data) == 0:
+                    break
+
+                remaining -= len(data)
+                yield data
+
+            changed = remaining != 0 or len(file.read(1)) != 0
+    except FileNotFoundError:
+        raise InvalidInputError("Specified path to data that you want copied and hidden does not exist. (Path Name: '" + str(filePath) + "')")
+
+    if changed:
+        raise DataModifiedError("File '" + str(filePath) + "' has been modified while its data was being hidden.")
+
+
+def readFileData(filePath, size):
+    """
+    Reads the entire contents of a (small) file at once.
+    :param filePath: The path to the file, whose contents will be read.
+    :param size: The size of the file in bytes, as it has been recorded in the archive.
     :return: The contents of the file in byte format.
     """
     try:
         with open(filePath, 'rb') as file:
-            data = file.read()
+            data = file.read(size + 1)
     except FileNotFoundError:
-        print("Error - Specified path to data that you want copied and hidden does not exist. (Path Name: '" + str(filePath) + "')")
-        sys.exit(1)
+        raise InvalidInputError("Specified path to data that you want copied and hidden does not exist. (Path Name: '" + str(filePath) + "')")
+
+    # The file has been modified since its size was recorded
+    if len(data) != size:
+        raise DataModifiedError("File '" + str(filePath) + "' has been modified while its data was being hidden.")
 
     return data
 
 
-def getByteData(path):
+def getArchiveEntries(path, skip_symlinks=False, skip_special_files=True, num_threads=FILE_READING_THREADS):
     """
-    Recursively gets the byte data of an entire directory's contents, stored as a dictionary.
+    Recursively lists the entire contents of the data to be hidden, in the order they are stored in the archive
+    (every folder's contents sorted by name). Several folders are listed at the same time.
     :param path: The path to the content(s) to be stored.
-    :return: The dictionary, containing all contents of the specified directory. The keys are the file/folder names.
-    If a file, the value is the contents of the file in byte format. If a folder, the value is another dictionary
-    used to represent the contents of that subpath.
+    :param skip_symlinks: Whether symbolic links (to files or folders) inside the folder are left out. By default,
+    they are stored as the files and folders they lead to.
+    :param skip_special_files: Whether items inside the folder that are neither files nor folders (e.g. named pipes,
+    sockets and devices) are left out, rather than being read like files.
+    :param num_threads: The number of folders that get listed at the same time.
+    :return: A generator yielding a tuple for every file and folder, containing the path of the item relative to the
+    root of the archive, the full path to the item (None if the item is a folder), the size of the item in bytes
+    (0 for folders), its permission bits and its modification time in nanoseconds. A folder that has already been
+    listed (reached again through a symbolic link) is left out, so that links can't lead around in circles.
     """
-    byte_data_list = {}
-
     # True if the path specified leads directly to a file
     if not os.path.isdir(path):
-        fileName = os.path.basename(path)
-        byte_data_list[bytes(fileName, 'utf-8')] = extractByteFileData(path)
-        return byte_data_list
+        path_stat = getFileStat(path)
+        yield (os.path.basename(path), path, path_stat.st_size, stat.S_IMODE(path_stat.st_mode), path_stat.st_mtime_ns)
+        return
 
-    # Otherwise, the path leads to a folder, which will be examined recursively
+    # Otherwise, the path leads to a folder, which will be examined recursively. (A path ending in '/' has an
+    # empty base name, in which case only the contents of the folder get stored.)
     folderName = os.path.basename(path)
-    byte_data_list[bytes(folderName, 'utf-8')] = getByteData_Implementation(path)
+    path_stat = os.stat(path)
+
+    if folderName != "":
+        yield (folderName, None, 0, stat.S_IMODE(path_stat.st_mode), path_stat.st_mtime_ns)
+
+    # Every level of folders is listed at once, and the entries are put in order afterwards. Folders are told apart
+    # by their device and inode numbers, which are the same whichever path leads to them.
+    folder_contents = {}
+    folders = [path]
+    listed_folders = {(path_stat.st_dev, path_stat.st_ino)}
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, num_threads)) as executor:
+        while len(folders) > 0:
+            listings = list(executor.map(lambda folder_path: listFolder(folder_path, skip_symlinks, skip_special_files), folders))
+            next_folders = []
+
+            for folder_path, listing in zip(folders, listings):
+                folder_contents[folder_path] = []
+
+                for item in listing:
+                    if item[2]:
+                        if item[6] in listed_folders:
+                            continue
 
-    return byte_data_list
+                        listed_folders.add(item[6])
+                        next_folders.append(item[1])
 
+                    folder_contents[folder_path].append(item)
 
-def getByteData_Implementation(folder_path):
+            folders = next_folders
+
+    yield from getArchiveEntries_Implementation(path, folderName, folder_contents)
+
+
+def listFolder(folder_path, skip_symlinks=False, skip_special_files=True):
     """
-    Gets the byte data of the contents listed in the current given folder path, stored as a dictionary. (Part of getByteData)
-    :param folder_path: The path to the current folder for processing.
-    :return: The dictionary representation of all the contents inside the current folder.
+    Lists the contents of a single folder, using the information os.scandir gathers while listing it (so that no
+    folder needs to be looked up again by its path). (Part of getArchiveEntries)
+    :param folder_path: The path to the folder.
+    :param skip_symlinks: Whether symbolic links are left out (see getArchiveEntries).
+    :param skip_special_files: Whether items that are neither files nor folders are left out.
+    :return: A list containing, sorted by name, a tuple for every item of its name, its full path, whether it is a
+    folder, its size in bytes (0 for folders), its permission bits, its modification time in nanoseconds and, for
+    folders, a tuple of its device and inode numbers (None for files).
     """
-    byte_data_list = {}
+    listing = []
+
+    with os.scandir(folder_path) as items:
+        for item in items:
+            if skip_symlinks and item.is_symlink():
+                continue
+
+            try:
+                item_stat = item.stat()
+            except FileNotFoundError:
+                raise InvalidInputError("Specified path to data that you want copied and hidden does not exist. (Path Name: '" + str(item.path) + "')")
+
+            if stat.S_ISDIR(item_stat.st_mode):
+                listing.append((item.name, item.path, True, 0, stat.S_IMODE(item_stat.st_mode), item_stat.st_mtime_ns, (item_stat.st_dev, item_stat.st_ino)))
+                continue
+
+            if skip_special_files and not stat.S_ISREG(item_stat.st_mode):
+                continue
 
-    for sub_dir_name in sorted(os.listdir(folder_path)):
-        sub_dir_path = os.path.join(folder_path, sub_dir_name)
+            listing.append((item.name, item.path, False, item_stat.st_size, stat.S_IMODE(item_stat.st_mode), item_stat.st_mtime_ns, None))
+
+    listing.sort()
+
+    return listing
+
+
+def getArchiveEntries_Implementation(folder_path, relative_path, folder_contents):
+    """
+    Lists the contents of the current given folder path. (Part of getArchiveEntries)
+    :param folder_path: The path to the current folder for processing.
+    :param relative_path: The path of the current folder, relative to the root of the archive.
+    :param folder_contents: A dictionary mapping the path of every folder to its contents (see listFolder).
+    :return: A generator yielding the archive entries of all the contents inside the current folder.
+    """
+    for sub_dir_name, sub_dir_path, is_folder, size, mode, mtime_ns, folder_id in folder_contents[folder_path]:
+        sub_dir_relative_path = relative_path + "/" + sub_dir_name if relative_path != "" else sub_dir_name
 
         # True if the current item being looked at in the folder is itself another folder
-        if os.path.isdir(sub_dir_path):
-            byte_data_list[bytes(sub_dir_name, 'utf-8')] = getByteData_Implementation(sub_dir_path)
+        if is_folder:
+            yield (sub_dir_relative_path, None, 0, mode, mtime_ns)
+            yield from getArchiveEntries_Implementation(sub_dir_path, sub_dir_relative_path, folder_contents)
             continue
-        
+
         # Otherwise, the current item is a file
-        byte_data_list[bytes(sub_dir_name, 'utf-8')] = extractByteFileData(sub_dir_path)
-    
-    return byte_data_list
\ No newline at end of file
+        yield (sub_dir_relative_path, sub_dir_path, size, mode, mtime_ns)
+
+
+def getArchiveFiles(path, skip_symlinks=False):
+    """
+    Lists the entire contents of the data to be hidden along with the sizes of all files, which are recorded in the
+    table of contents before any file is read.
+    :param path: The path to the content(s) to be stored.
+    :param skip_symlinks: Whether symbolic links inside the folder are left out (see getArchiveEntries).
+    :return: A list containing a tuple for every file and folder (in the order they are stored in the archive) of
+    the entry type, the relative path, the data length, the full path to the item (None if it is a folder), its
+    permission bits and its modification time in nanoseconds.
+    """
+    archive_files = []
+
+    for relative_path, file_path, size, mode, mtime_ns in getArchiveEntries(path, skip_symlinks):
+        if file_path is None:
+            archive_files.append((ArchiveFormat.FOLDER_ENTRY, relative_path, 0, None, mode, mtime_ns))
+        else:
+            archive_files.append((ArchiveFormat.FILE_ENTRY, relative_path, size, file_path, mode, mtime_ns))
+
+    return archive_files
+
+
+def getArchiveSize(path, skip_symlinks=False):
+    """
+    Calculates the size of the (uncompressed) archive of an entire directory's contents without reading any file
+    contents.
+    :param path: The path to the content(s) to be stored.
+    :param skip_symlinks: Whether symbolic links inside the folder are left out (see getArchiveEntries).
+    :return: The size of the archive in bytes.
+    """
+    archive_files = getArchiveFiles(path, skip_symlinks)
+    size = ArchiveFormat.PREAMBLE_LENGTH + ArchiveFormat.getTableOfContentsLength([item[1] for item in archive_files])
+
+    for entry_type, relative_path, data_length, file_path, mode, mtime_ns in archive_files:
+        size += ArchiveFormat.getEntryHeaderLength(relative_path) + data_length
+
+    return size + ArchiveFormat.ENTRY_HEADER_LENGTH
+
+
+def getArchive(path, codec=Compression.NONE, bits_per_channel=1, skip_symlinks=False):
+    """
+    Converts an entire directory's contents into an archive (see ArchiveFormat). Uncompressed, the archive is
+    produced piece by piece while it is being read, so no file is read before its data is needed. Compressed, the
+    table of contents is only known once everything has been compressed, so the compressed entries are stored
+    (in memory or, beyond COMPRESSED_DATA_MEMORY_LIMIT, in a temporary file) before the archive is handed out.
+    :param path: The path to the content(s) to be stored.
+    :param codec: The identifier of the codec used for compressing the archive entries.
+    :param bits_per_channel: The number of least significant bits per channel value the archive gets stored with.
+    :param skip_symlinks: Whether symbolic links inside the folder are left out (see getArchiveEntries).
+    :return: A tuple containing an iterable yielding the archive in consecutive chunks of byte data, and the size of
+    the archive in bytes.
+    """
+    archive_files = getArchiveFiles(path, skip_symlinks)
+    preamble = ArchiveFormat.createPreamble(codec, bits_per_channel)
+
+    if codec == Compression.NONE:
+        records = []
+        offset = 0
+
+        # Every uncompressed entry is a restart point of its own
+        for entry_type, relative_path, data_length, file_path, mode, mtime_ns in archive_files:
+            records.append(ArchiveFormat.ContentsRecord(entry_type, relative_path, data_length, offset, 0))
+            offset += ArchiveFormat.getEntryHeaderLength(relative_path) + data_length
+
+        contents = ArchiveFormat.createTableOfContents(records)
+        entry_chunks = getArchiveEntryChunks(archive_files)
+        size = len(preamble) + len(contents) + offset + ArchiveFormat.ENTRY_HEADER_LENGTH
+
+        return (itertools.chain([preamble, contents], entry_chunks), size)
+
+    compressed_entries = tempfile.SpooledTemporaryFile(max_size=COMPRESSED_DATA_MEMORY_LIMIT)
+    records = ArchiveFormat.storeEntries(getArchiveEntryData(archive_files), codec, compressed_entries)
+
+    contents = ArchiveFormat.createTableOfContents(records)
+    size = len(preamble) + len(contents) + compressed_entries.tell()
+    compressed_entries.seek(0)
+
+    entry_chunks = iter(lambda: compressed_entries.read(FILE_CHUNK_SIZE), b"")
+
+    return (itertools.chain([preamble, contents], entry_chunks), size)
+
+
+def getStreamedArchive(path, codec, bits_per_channel=1, skip_symlinks=False):
+    """
+    Converts an entire directory's contents into a compressed archive (see ArchiveFormat) that is produced piece by
+    piece while it is being read, without storing it anywhere. The table of contents is only known once all entries
+    have been compressed, so the archive starts with a placeholder of the same length in its place.
+    :param path: The path to the content(s) to be stored.
+    :param codec: The identifier of the codec used for compressing the archive entries.
+    :param bits_per_channel: The number of least significant bits per channel value the archive gets stored with.
+    :param skip_symlinks: Whether symbolic links inside the folder are left out (see getArchiveEntries).
+    :return: A tuple containing a generator yielding the archive in consecutive chunks of byte data, the length of
+    the start of the archive (its preamble and table of contents) and a function returning the actual start of the
+    archive once the generator is exhausted.
+    """
+    archive_files = getArchiveFiles(path, skip_symlinks)
+    preamble = ArchiveFormat.createPreamble(codec, bits_per_channel)
+    contents_length = ArchiveFormat.getTableOfContentsLength([item[1] for item in archive_files])
+
+    records = []
+    entry_chunks = ArchiveFormat.compressEntries(getArchiveEntryData(archive_files), codec, records)
+
+    def getArchiveStart():
+        return preamble + ArchiveFormat.createTableOfContents(records)
+
+    return (itertools.chain([preamble, bytes(contents_length)], entry_chunks), len(preamble) + contents_length, getArchiveStart)
+
+
+def getArchiveChunks(path, codec=Compression.NONE, bits_per_channel=1, skip_symlinks=False):
+    """
+    Converts an entire directory's contents into an archive (see getArchive).
+    :param path: The path to the content(s) to be stored.
+    :param codec: The identifier of the codec used for compressing the archive entries.
+    :param bits_per_channel: The number of least significant bits per channel value the archive gets stored with.
+    :param skip_symlinks: Whether symbolic links inside the folder are left out (see getArchiveEntries).
+    :return: A generator yielding the archive in consecutive chunks of byte data.
+    """
+    archive_chunks, size = getArchive(path, codec, bits_per_channel, skip_symlinks)
+    yield from archive_chunks
+
+
+def getArchiveEntryData(archive_files, num_threads=FILE_READING_THREADS):
+    """
+    Pairs every item of the archive with its data. Files no larger than FILE_CHUNK_SIZE are read ahead by a pool of
+    threads (up to FILE_READ_AHEAD_LIMIT bytes), several files per batch, while larger files are only read once they
+    are asked for.
+    :param archive_files: The contents of the archive, as returned by getArchiveFiles.
+    :param num_threads: The number of batches of files that get read at the same time.
+    :return: A generator yielding a tuple for every file and folder of its entry type, its relative path, its data
+    length, an iterable yielding its data in consecutive chunks (empty for folders), its permission bits and its
+    modification time (see ArchiveFormat.compressEntries).
+    """
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, num_threads))
+    batches = collections.deque()
+    file_data = {}
+    read_ahead_bytes = 0
+    next_index = 0
+
+    try:
+        for index, (entry_type, relative_path, data_length, file_path, mode, mtime_ns) in enumerate(archive_files):
+            # Start reading the upcoming small files, without holding more than the limit in memory at once
+            next_index = max(next_index, index)
+            while next_index < len(archive_files) and len(batches) < num_threads * 2 and (len(batches) == 0 or read_ahead_bytes < FILE_READ_AHEAD_LIMIT):
+                batch, next_index = getFileBatch(archive_files, next_index)
+
+                if len(batch) > 0:
+                    batches.append((batch[0][0], executor.submit(readFileBatch, batch)))
+                    read_ahead_bytes += sum(size for batch_index, file_path, size in batch)
+
+            if len(batches) > 0 and batches[0][0] == index:
+                file_data.update(batches.popleft()[1].result())
+
+            if file_path is None:
+                yield (entry_type, relative_path, 0, [], mode, mtime_ns)
+            elif index in file_data:
+                read_ahead_bytes -= data_length
+                yield (entry_type, relative_path, data_length, [file_data.pop(index)], mode, mtime_ns)
+            else:
+                yield (entry_type, relative_path, data_length, extractByteFileData(file_path, data_length), mode, mtime_ns)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def getFileBatch(archive_files, start_index):
+    """
+    Picks the next small files of the archive to be read together (up to FILE_CHUNK_SIZE bytes in total, and at
+    most FILE_BATCH_LENGTH files).
+    (Part of getArchiveEntryData)
+    :param archive_files: The contents of the archive, as returned by getArchiveFiles.
+    :param start_index: The index of the first item of the archive that may be part of the batch.
+    :return: A tuple containing the batch, a list of a tuple of the index, the path and the size of every file in
+    it, and the index of the first item after the batch.
+    """
+    batch = []
+    batch_size = 0
+    index = start_index
+
+    while index < len(archive_files) and batch_size < FILE_CHUNK_SIZE and len(batch) < FILE_BATCH_LENGTH:
+        entry_type, relative_path, data_length, file_path, mode, mtime_ns = archive_files[index]
+
+        if file_path is not None and data_length <= FILE_CHUNK_SIZE:
+            batch.append((index, file_path, data_length))
+            batch_size += data_length
+
+        index += 1
+
+    return (batch, index)
+
+
+def readFileBatch(batch):
+    """
+    Reads the contents of every file of a batch (see getFileBatch).
+    :param batch: A list of a tuple of the index, the path and the size of every file to be read.
+    :return: A dictionary mapping the index of every file to its contents.
+    """
+    return {index: readFileData(file_path, size) for index, file_path, size in batch}
+
+
+def getArchiveEntryChunks(archive_files):
+    """
+    Produces all (uncompressed) entries of the archive of an entire directory's contents (everything following the
+    table of contents).
+    :param archive_files: The contents of the archive, as returned by getArchiveFiles.
+    :return: A generator yielding the archive entries in consecutive chunks of byte data.
+    """
+    for entry_type, relative_path, data_length, data_chunks, mode, mtime_ns in getArchiveEntryData(archive_files):
+        yield ArchiveFormat.createEntryHeader(entry_type, relative_path, data_length, mode, mtime_ns)
+        yield from data_chunks
+
+    yield ArchiveFormat.createEntryHeader(ArchiveFormat.END_ENTRY, "", 0)
+
+
+def getArchiveSample(path, skip_symlinks=False):
+    """
+    Gets the first bytes of the archive entries of an entire directory's contents, used for judging how well the
+    data compresses.
+    :param path: The path to the content(s) to be stored.
+    :param skip_symlinks: Whether symbolic links inside the folder are left out (see getArchiveEntries).
+    :return: Up to Compression.SAMPLE_SIZE bytes from the start of the archive entries.
+    """
+    sample = bytearray()
+
+    for chunk in getArchiveEntryChunks(getArchiveFiles(path, skip_symlinks)):
+        sample += chunk
+
+        if len(sample) >= Compression.SAMPLE_SIZE:
+            break
+
+    return bytes(sample[:Compression.SAMPLE_SIZE])
@@ -0,0 +1,171 @@
+import contextlib, json, os, sys, time
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak memory usage is not measured
+    resource = None
+
+
+class Instrumentation:
+    """
+    Receives the events of a run of hiding or extracting data: progress updates, messages and (if measuring is turned
+    on) the measurements of every stage. Every event is a dictionary with an 'event' key ('progress', 'message' or
+    'stage') and is passed on to the callback as soon as it happens, so progress can be shown or graphed while the
+    run is still going on. Measured events are also collected for the report returned by getReport.
+
+    A stage event holds the name of the stage, the photo it belongs to (None for stages of the whole run), its wall
+    time and CPU time in seconds, the number of bytes it processed, the peak memory usage of the process it ran in
+    (in bytes, None where unknown), the id of that process and the time (seconds since the epoch) it ended.
+    """
+
+    def __init__(self, callback=None, measure=True):
+        """
+        :param callback: A function called with every event as it happens, or None.
+        :param measure: Whether stages get measured. If False, only progress and message events are passed on.
+        """
+        self.callback = callback
+        self.measure = measure
+        self.events = []
+
+    def emit(self, event):
+        """
+        Passes an event on to the callback and (if measuring) records it for the report.
+        :param event: The event, a dictionary with an 'event' key.
+        """
+        if self.measure:
+            self.events.append(event)
+
+        if self.callback is not None:
+            self.callback(event)
+
+    def emitAll(self, events):
+        """
+        Passes on events that have been collected elsewhere, e.g. by a worker process (see createWorkerInstrumentation).
+        :param events: The list of events, in the order they happened.
+        """
+        for event in events:
+            self.emit(event)
+
+    def progress(self, operation, photo_name, bit_index, num_bits):
+        """
+        Reports that a photo is about to be processed.
+        :param operation: 'hide' or 'extract'.
+        :param photo_name: The name of the photo that is about to be processed.
+        :param bit_index: The index of the first bit of data stored in the photo.
+        :param num_bits: The total number of bits of data in the photos, or None if it is not known yet (in which
+        case the percentage is None as well).
+        """
+        percent = (bit_index * 1000 // num_bits) / 10 if num_bits is not None else None
+
+        self.emit({"event": "progress", "operation": operation, "photo": photo_name, "bit_index": bit_index,
+                   "num_bits": num_bits, "percent": percent, "timestamp": time.time()})
+
+    def message(self, text):
+        """
+        Reports a message that is meant to be shown to the user.
+        :param text: The message.
+        """
+        self.emit({"event": "message", "message": text, "timestamp": time.time()})
+
+    @contextlib.contextmanager
+    def stage(self, name, num_bytes=0, photo_name=None):
+        """
+        Measures the code run inside of a 'with' block as a stage. Nothing is measured if measuring is turned off.
+        :param name: The name of the stage, e.g. 'decode'.
+        :param num_bytes: The number of bytes the stage processes. It can still be changed (e.g. once it is known)
+        through the 'bytes' key of the dictionary the 'with' statement binds.
+        :param photo_name: The name of the photo the stage belongs to, or None for stages of the whole run.
+        """
+        event = {"event": "stage", "stage": name, "photo": photo_name, "bytes": num_bytes}
+
+        if not self.measure:
+            yield event
+            return
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        yield event
+
+        event["wall_seconds"] = time.perf_counter() - wall_start
+        event["cpu_seconds"] = time.process_time() - cpu_start
+        event["peak_memory_bytes"] = getPeakMemoryUsage()
+        event["process"] = os.getpid()
+        event["timestamp"] = time.time()
+        self.emit(event)
+
+    def createWorkerInstrumentation(self):
+        """
+        :return: A new Instrumentation for use in another process, measuring if this one does. Its events are
+        collected in its 'events' list, which gets passed back and handed to emitAll.
+        """
+        return Instrumentation(None, self.measure)
+
+    def getReport(self):
+        """
+        Sums up all measured stages by their names.
+        :return: A dictionary containing the totals of every stage ('count', 'wall_seconds', 'cpu_seconds', 'bytes',
+        the largest 'peak_memory_bytes' and, for stages that write output, 'output_bytes') under 'stages', and every
+        recorded event under 'events'.
+        """
+        stages = {}
+
+        for event in self.events:
+            if event["event"] != "stage":
+                continue
+
+            totals = stages.setdefault(event["stage"], {"count": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "bytes": 0, "peak_memory_bytes": None})
+            totals["count"] += 1
+            totals["wall_seconds"] += event["wall_seconds"]
+            totals["cpu_seconds"] += event["cpu_seconds"]
+            totals["bytes"] += event["bytes"]
+
+            if "output_bytes" in event:
+                totals["output_bytes"] = totals.get("output_bytes", 0) + event["output_bytes"]
+
+            if event["peak_memory_bytes"] is not None:
+                totals["peak_memory_bytes"] = max(totals["peak_memory_bytes"] or 0, event["peak_memory_bytes"])
+
+        return {"stages": stages, "events": self.events}
+
+    def writeReport(self, report_path):
+        """
+        Saves the report (see getReport) as a JSON file.
+        :param report_path: The path of the file the report is written to.
+        """
+        with open(report_path, 'w') as report_file:
+            json.dump(self.getReport(), report_file, indent=2)
+
+
+def createDefaultInstrumentation():
+    """
+    :return: The Instrumentation used when none is given: progress and messages are printed, nothing is measured.
+    """
+    return Instrumentation(printEvent, measure=False)
+
+
+def printEvent(event):
+    """
+    Prints progress and message events the way they are shown to the user. Stage events are not printed.
+    :param event: The event (see Instrumentation).
+    """
+    if event["event"] == "message":
+        print(event["message"])
+    elif event["event"] == "progress":
+        action = "hiding data in" if event["operation"] == "hide" else "extracting data from"
+
+        if event["percent"] is None:
+            print("Currently " + action + " photo " + event["photo"])
+        else:
+            print("Currently " + action + " photo " + event["photo"] + "  (" + str(event["percent"]) + "% complete)")
+
+
+def getPeakMemoryUsage():
+    """
+    :return: The peak resident set size of the current process so far in bytes, or None if it can't be measured.
+    """
+    if resource is None:
+        return None
+
+    # ru_maxrss is in bytes on macOS, but in kilobytes everywhere else
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -1,44 +1,123 @@
-import math, os, shutil, sys
+from Data_Converters.StegoErrors import InvalidInputError
+import json, os, shutil, tempfile
 
-def getNumBitsToReserve(num):
+def removePreviouslyExtractedData(extracted_data_path):
     """
-    Gets the size of the given number in terms of bits.
-    :param num: The number in decimal format, whose bit size will be calculated and returned.
-    :return: The number of bits needed to store 'num'.
+    Removes all data located inside of the folder of the specified path.
+    :param extracted_data_path: The path to the folder containing all contents that need to be deleted.
     """
-    return math.ceil(math.log2(num + 1)) if num > 0 else 1
+    checkFolderExists(extracted_data_path)
 
+    for item in os.listdir(extracted_data_path):
+        item_path = os.path.join(extracted_data_path, item)
+        
+        if os.path.isfile(item_path):
+            os.remove(item_path)
+        elif os.path.isdir(item_path):
+            shutil.rmtree(item_path)
 
-def removePreviouslyExtractedData(extracted_data_path):
+def checkFolderExists(folder_path):
     """
-    Removes all data located inside of the folder of the specified path.
-    :param extracted_data_path: The path to the folder containing all contents that need to be deleted.
+    Makes sure that a folder data gets written to exists, since it is never created.
+    :param folder_path: The path to the folder.
     """
-    try:
-        for item in os.listdir(extracted_data_path):
-            item_path = os.path.join(extracted_data_path, item)
-            
-            if os.path.isfile(item_path):
-                os.remove(item_path)
-            elif os.path.isdir(item_path):
-                shutil.rmtree(item_path)
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
-        sys.exit(1)
-
-def removePotentialHiddenFiles(folder_path):
-    """
-    Checks to see if there are any hidden files, whose names start with '.', and if so, removes them.
-    :param folder_path: The path to the folder that will be checked for any potential hidden files.
+    if not os.path.isdir(folder_path):
+        raise InvalidInputError("Specified path to output folder does not lead to a folder. (Path Name: '" + str(folder_path) + "')")
+
+
+def createStagingFolder(folder_path):
+    """
+    Creates an empty, hidden folder next to the given folder, where new contents for it can be prepared without
+    touching its current contents (see replaceFolderContents).
+    :param folder_path: The path to the folder whose new contents will be prepared.
+    :return: The path to the newly created staging folder.
+    """
+    checkFolderExists(folder_path)
+
+    return tempfile.mkdtemp(prefix=".staging-", dir=os.path.dirname(os.path.abspath(folder_path)))
+
+
+def replaceFolderContents(folder_path, staging_folder_path):
+    """
+    Replaces all contents of a folder with the contents of a staging folder (see createStagingFolder), which gets
+    removed afterwards.
+    :param folder_path: The path to the folder whose contents are replaced.
+    :param staging_folder_path: The path to the staging folder holding the new contents.
+    """
+    removePreviouslyExtractedData(folder_path)
+
+    for item in os.listdir(staging_folder_path):
+        os.replace(os.path.join(staging_folder_path, item), os.path.join(folder_path, item))
+
+    os.rmdir(staging_folder_path)
+
+
+def loadFileCache(cache_path):
+    """
+    Loads a cache of values worked out from files (see getCachedValue) from disk.
+    :param cache_path: The path to the cache file.
+    :return: The cache as a dictionary (empty if the file does not exist or cannot be read).
     """
     try:
-        folder_contents = os.listdir(folder_path)
-        
-        for item in folder_contents:
-            item_path = os.path.join(folder_path, item)
-            
-            # Check if the item is a hidden file (starts with a dot)
-            if item.startswith('.') and not item.lower().endswith('.png'):
-                os.remove(item_path)
-    except Exception as e:
-        print(f"An error occurred: {str(e)}")
\ No newline at end of file
+        with open(cache_path, 'r') as cache_file:
+            file_cache = json.load(cache_file)
+    except (OSError, ValueError):
+        return {}
+
+    return file_cache if type(file_cache) == dict else {}
+
+
+def saveFileCache(cache_path, file_cache):
+    """
+    Saves a cache of values worked out from files to disk. The file is replaced in one step, so an interrupted save
+    never leaves a half written cache behind.
+    :param cache_path: The path to the cache file.
+    :param file_cache: The dictionary loaded with loadFileCache.
+    """
+    temp_path = cache_path + ".tmp"
+
+    with open(temp_path, 'w') as cache_file:
+        json.dump(file_cache, cache_file)
+
+    os.replace(temp_path, cache_path)
+
+
+def getCachedValue(file_cache, file_path, key, length):
+    """
+    Looks up a value worked out from a file in a cache, as long as the file has not changed since.
+    :param file_cache: The dictionary loaded with loadFileCache.
+    :param file_path: The path to the file.
+    :param key: The name the value is cached under.
+    :param length: The number of items in the value (a list), used for telling cached values of other versions apart.
+    :return: The cached value, or None if it has to be worked out again.
+    """
+    stat = os.stat(file_path)
+    entry = file_cache.get(os.path.abspath(file_path))
+
+    # A file counts as unchanged if both its modification time and its size are still the same
+    if type(entry) == dict and entry.get("mtime_ns") == stat.st_mtime_ns and entry.get("size") == stat.st_size and type(entry.get(key)) == list and len(entry[key]) == length:
+        return entry[key]
+
+    return None
+
+
+def cacheValue(file_cache, file_path, key, value):
+    """
+    Adds a value that has just been worked out from a file to a cache (see getCachedValue).
+    :param file_cache: The dictionary loaded with loadFileCache.
+    :param file_path: The path to the file.
+    :param key: The name the value is cached under.
+    :param value: The value, as a list.
+    """
+    stat = os.stat(file_path)
+    file_cache[os.path.abspath(file_path)] = {"mtime_ns": stat.st_mtime_ns, "size": stat.st_size, key: value}
+
+
+def isPotentialHiddenFile(file_name):
+    """
+    Checks to see if a file found in a folder of photos is a hidden file, whose name starts with '.', which is
+    ignored rather than treated as a photo.
+    :param file_name: The name of the file.
+    :return: True if the file is a hidden file, False otherwise.
+    """
+    return file_name.startswith('.') and not file_name.lower().endswith('.png')
@@ -0,0 +1,53 @@
+class StegoError(Exception):
+    """
+    Base class of every error raised while hiding data in photos or extracting it again. The message of the error
+    describes what went wrong in a way that can be shown to the user as it is.
+    """
+
+
+class InvalidSettingError(StegoError):
+    """
+    A setting (e.g. the compression or the number of bits per channel value) has an unsupported value.
+    """
+
+
+class InvalidInputError(StegoError):
+    """
+    The data to be hidden or the photos to be used could not be found, or are of an unsupported type.
+    """
+
+
+class CapacityError(StegoError):
+    """
+    The data to be hidden does not fit inside the given photos.
+    """
+
+
+class SizeLimitError(StegoError):
+    """
+    The data to be hidden is larger than the size limit that has been set for it.
+    """
+
+
+class HidingCancelledError(StegoError):
+    """
+    Hiding the data has been declined when asked to confirm it. No photos have been modified.
+    """
+
+
+class DataModifiedError(StegoError):
+    """
+    The data to be hidden has been modified while it was being hidden, so the hidden copy would be incomplete.
+    """
+
+
+class InvalidPhotoSetError(StegoError):
+    """
+    The photos given for extraction are not exactly the complete set of photos that some data was hidden in.
+    """
+
+
+class CorruptDataError(StegoError):
+    """
+    The data extracted from the photos could not be read, because it has been damaged or uses an unsupported format.
+    """
@@ -1,24 +1,166 @@
-from Data_Converters import ByteDataToDirectory, DecimalBitConverters, BinaryByteConverters, Miscellaneous_Helpers
-from PIL import Image
-import pickle, os, sys, math, shutil
+from Data_Converters import ArchiveFormat, ByteDataToDirectory, BinaryByteConverters, Compression, Instrumentation, Miscellaneous_Helpers
+from Data_Converters.StegoErrors import CorruptDataError, InvalidInputError, InvalidPhotoSetError
+from Image_Manipulation import PhotoHeaders, PixelChannels
+import numpy
+import collections, concurrent.futures, fnmatch, itertools, os
 
 
-def extractDataFromImages(processed_photos, path_to_paste_data):
+# What extractDataFromImages did: the path to the folder the data has been recreated in, the number of photos the
+# data has been extracted from and the size of the hidden data in bytes
+ExtractResult = collections.namedtuple("ExtractResult", ["output_path", "num_photos", "num_bytes"])
+
+# A file or folder stored in the hidden data: its path relative to the folder it gets recreated in, whether it is a
+# folder and its size in bytes (0 for folders)
+HiddenEntry = collections.namedtuple("HiddenEntry", ["path", "is_folder", "size"])
+
+# When extracting selected entries, entries that are at most this many (stored) bytes apart are read in one go
+# rather than starting over at the restart point of the next one, which may mean reading a photo twice
+SESSION_GAP_LIMIT = 4 * 2 ** 20
+
+
+def extractDataFromImages(processed_photos, path_to_paste_data, num_workers=1, header_cache_path=None, instrumentation=None, sync=False):
     """
-    Extracts all hidden data from a given set of images and reconstructs the data back to its original form.
+    Extracts all hidden data from a given set of images and reconstructs the data back to its original form. Every
+    problem is reported by raising a StegoError (see StegoErrors).
     :param processed_photos: Path to the folder containing all photos which contain hidden data.
     :param path_to_paste_data: Path to the folder where the hidden data will be reconstructed and stored.
+    :param num_workers: The number of photos that get read at the same time, each in its own process. With the
+    default of 1, all photos are read one after another in the current process.
+    :param header_cache_path: Path to a file used for caching the reserve bits (headers) of photos between runs, so
+    that photos which have not changed don't need to be decoded again just to find out what they hold. By default,
+    no cache is used.
+    :param instrumentation: The Instrumentation (see Instrumentation.py) receiving the progress of extracting the
+    data and the measurements of every stage, for the whole run ('extract', 'clear_output', 'read_headers',
+    'recreate_files') and for every photo ('decode', 'read_payload'). Since files are written while the photos are
+    still being read, 'recreate_files' includes the time spent on reading them. By default, progress is printed
+    and nothing is measured.
+    :param sync: Whether the recreated files and folders are flushed to the disk (with fsync) before returning,
+    which is slower but makes sure they survive a crash or power loss.
+    :return: An ExtractResult describing the extracted data.
     """
-    # Any previously extracted data will get removed before adding the newly extracted data
-    Miscellaneous_Helpers.removePreviouslyExtractedData(path_to_paste_data)
-    
-    photo_dict = createPhotoDictionary(processed_photos)
-    bits = getAllBinaryDataFromPhotos(photo_dict)
-    
-    byte_data_list = BinaryByteConverters.convertFullBinaryToByteDataList(bits)
-    ByteDataToDirectory.createDirectoryFromByteData(path_to_paste_data, byte_data_list)
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
+
+    with instrumentation.stage("extract") as run_stage:
+        # Any previously extracted data will get removed before adding the newly extracted data
+        with instrumentation.stage("clear_output"):
+            Miscellaneous_Helpers.removePreviouslyExtractedData(path_to_paste_data)
+
+        with instrumentation.stage("read_headers"):
+            photo_dict = createPhotoDictionary(getProcessedPhotos(processed_photos), header_cache_path)
+
+        num_bytes = photo_dict[0].total_bit_data_size // 8
+        run_stage["bytes"] = num_bytes
+
+        # Photos are read in order and every file is written as soon as its data has been read, so only a few
+        # photos' worth of data is ever held in memory, however large the hidden data is
+        with instrumentation.stage("recreate_files", num_bytes):
+            photo_data_chunks = getPhotoDataChunks(photo_dict, num_workers, instrumentation)
+
+            try:
+                is_archive, chunks = checkForArchive(photo_data_chunks)
 
-    print("Success! The data from the image set has been extracted and can now be viewed. (100% complete)")
+                if is_archive:
+                    ByteDataToDirectory.createDirectoryFromArchive(path_to_paste_data, chunks, sync)
+                else:
+                    # Photos processed by older versions of this program hold a pickled dictionary instead of an archive
+                    byte_data_list = BinaryByteConverters.convertBytesToByteDataList(b"".join(chunks))
+                    ByteDataToDirectory.createDirectoryFromByteData(path_to_paste_data, byte_data_list, sync)
+            finally:
+                # Stops any worker processes still reading photos (e.g. after an error)
+                photo_data_chunks.close()
+
+    return ExtractResult(path_to_paste_data, len(photo_dict), num_bytes)
+
+
+def extractDataFromMemory(images):
+    """
+    Extracts the data hidden in a given set of images that are held in memory, without reading or writing any files.
+    The data must have been hidden as a single file, e.g. by hideDataInMemory.
+    :param images: The list of photos containing the hidden data, in any order (see PixelChannels.getInMemoryPhotos).
+    :return: The hidden data, as a value of type 'bytes'.
+    """
+    photo_dict = createPhotoDictionary(PixelChannels.getInMemoryPhotos(images))
+
+    # Nothing is printed, since the data is returned rather than written anywhere
+    instrumentation = Instrumentation.Instrumentation(measure=False)
+    is_archive, chunks = checkForArchive(getPhotoDataChunks(photo_dict, 1, instrumentation))
+
+    if is_archive:
+        return ArchiveFormat.readSingleFileArchive(chunks)
+
+    # Photos processed by older versions of this program hold a pickled dictionary instead of an archive
+    byte_data_list = BinaryByteConverters.convertBytesToByteDataList(b"".join(chunks))
+    values = list(byte_data_list.values())
+
+    if len(values) != 1 or type(values[0]) != bytes:
+        raise CorruptDataError("The hidden data is not a single file and can only be extracted into a folder.")
+
+    return values[0]
+
+
+def listHiddenData(processed_photos, header_cache_path=None):
+    """
+    Lists the files and folders hidden in a given set of images without extracting them. Only the photo(s) holding
+    the table of contents at the start of the data are read (besides the photo headers).
+    :param processed_photos: Path to the folder containing all photos which contain hidden data.
+    :param header_cache_path: Path to the file caching photo headers between runs, or None (see extractDataFromImages).
+    :return: A list of the HiddenEntry of every file and folder, in the order they are stored in.
+    """
+    photo_dict = createPhotoDictionary(getProcessedPhotos(processed_photos), header_cache_path)
+    instrumentation = Instrumentation.Instrumentation(measure=False)
+
+    codec, records, entries_offset = readArchiveContents(photo_dict, instrumentation)
+
+    return [HiddenEntry(record.path, record.entry_type == ArchiveFormat.FOLDER_ENTRY, record.size) for record in records]
+
+
+def extractSelectedData(processed_photos, path_to_paste_data, patterns, num_workers=1, header_cache_path=None, instrumentation=None, sync=False):
+    """
+    Extracts only the hidden files and folders matching any of the given patterns. Using the table of contents at the
+    start of the data, only the photos holding the selected entries are read.
+    :param processed_photos: Path to the folder containing all photos which contain hidden data.
+    :param path_to_paste_data: Path to the folder where the selected data will be reconstructed and stored.
+    :param patterns: A list of relative paths or glob patterns (see fnmatch), e.g. 'Notes/*.txt'. A folder that
+    matches is extracted along with everything inside of it.
+    :param num_workers: The number of photos that get read at the same time, each in its own process.
+    :param header_cache_path: Path to the file caching photo headers between runs, or None.
+    :param instrumentation: The Instrumentation receiving the progress and measurements (see extractDataFromImages),
+    which also measures reading the table of contents ('read_contents').
+    :param sync: Whether the recreated files and folders are flushed to the disk (see extractDataFromImages).
+    :return: An ExtractResult describing the extracted data, where 'num_photos' is the number of photos that have
+    been read.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
+
+    with instrumentation.stage("extract") as run_stage:
+        with instrumentation.stage("clear_output"):
+            Miscellaneous_Helpers.removePreviouslyExtractedData(path_to_paste_data)
+
+        with instrumentation.stage("read_headers"):
+            photo_dict = createPhotoDictionary(getProcessedPhotos(processed_photos), header_cache_path)
+
+        num_bytes = photo_dict[0].total_bit_data_size // 8
+        run_stage["bytes"] = num_bytes
+        photos_read = set()
+
+        with instrumentation.stage("read_contents"):
+            codec, records, entries_offset = readArchiveContents(photo_dict, instrumentation, photos_read)
+
+        selected = [i for i, record in enumerate(records) if isSelected(record.path, patterns)]
+
+        if len(selected) == 0:
+            raise InvalidInputError("None of the hidden files and folders match '" + "', '".join(patterns) + "'.")
+
+        with instrumentation.stage("recreate_files", sum(records[i].size for i in selected)):
+            with ByteDataToDirectory.DirectoryWriter(path_to_paste_data, sync=sync) as writer:
+                writer.createFolders([records[i].path for i in selected if records[i].entry_type == ArchiveFormat.FOLDER_ENTRY])
+
+                for first, last in groupSelectedRecords(records, selected):
+                    extractRecords(photo_dict, records, first, last, set(selected), codec, entries_offset, writer, num_workers, instrumentation, photos_read)
+
+    return ExtractResult(path_to_paste_data, len(photos_read), num_bytes)
 
 
 # ********************************************************************
@@ -26,340 +168,466 @@ def extractDataFromImages(processed_photos, path_to_paste_data):
 # ********************************************************************
 
 
-def getAllBinaryDataFromPhotos(photo_dict):
+def readArchiveContents(photo_dict, instrumentation, photos_read=None):
     """
-    Extracts all the binary data hidden inside a given set of photos.
+    Reads the preamble and the table of contents at the start of the hidden data, reading as few photos as possible.
     :param photo_dict: A dictionary of photos, where the key is the photo's identifier number and the value
-    is the name of the path to the photo.
-    :return: All of the extracted hidden data represented as a string of bits.
+    is the PhotoHeader of the photo.
+    :param instrumentation: The Instrumentation receiving the progress and measurements.
+    :param photos_read: A set the names of all photos that get read are added to, or None.
+    :return: A tuple containing the codec the archive entries have been compressed with, the list of ContentsRecords
+    and the position of the first byte of the entries.
     """
-    bits = bytearray()
-    total_bit_data_size = getTotalBitsNumDataSize(photo_dict[0], 4 + Miscellaneous_Helpers.getNumBitsToReserve(getImageNum(photo_dict[0])))
+    photo_data_chunks = getPhotoDataChunks(photo_dict, 1, instrumentation, 0, photos_read)
 
-    # Extract all hidden data from all images
-    for i in range(len(photo_dict)):
-        bits += extractDataFromImage(photo_dict[i], len(bits), total_bit_data_size)
-    
-    if len(bits) != total_bit_data_size:
-        print("Error - Unable to process photo(s) as it may be prone to errors")
-        sys.exit(1)
+    try:
+        is_archive, chunks = checkForArchive(photo_data_chunks)
+
+        # Photos processed by older versions of this program hold a pickled dictionary instead of an archive
+        if not is_archive:
+            raise CorruptDataError("The data has been hidden by an older version of this program and can only be extracted as a whole.")
 
-    return bits
+        reader = ArchiveFormat.ArchiveReader(chunks)
+        codec = reader.readPreamble()
 
+        return (codec, reader.table_of_contents, reader.entries_offset)
+    finally:
+        # Stops reading once the table of contents is known
+        photo_data_chunks.close()
 
-def getStartBitsDataLength(image_path):
+
+def isSelected(relative_path, patterns):
     """
-    Gets the total number of reserve bits that are present in a given photo.
-    :param image_path: The path to the current image containing a certain number of reserve bits.
-    :return: The total number of reserve bits present in the given image.
+    Checks whether an entry of the archive, or any folder it is stored in, matches any of the given patterns.
+    :param relative_path: The path of the entry, relative to the root of the archive.
+    :param patterns: A list of relative paths or glob patterns.
+    :return: True if the entry is selected, otherwise False.
     """
-    image_num = getImageNum(image_path)
-    image_num_data_length = 4 + Miscellaneous_Helpers.getNumBitsToReserve(image_num)
+    parts = relative_path.split('/')
 
-    # All additional photos after the first photo only store the image number data as their precursor
-    if image_num != 0:
-        return image_num_data_length
-    
-    stored_bit_data_size = getTotalBitsNumDataSize(image_path, image_num_data_length)
+    for i in range(1, len(parts) + 1):
+        path = '/'.join(parts[:i])
+
+        for pattern in patterns:
+            if fnmatch.fnmatchcase(path, pattern.replace('\\', '/').strip('/')):
+                return True
 
-    return image_num_data_length + 6 + Miscellaneous_Helpers.getNumBitsToReserve(stored_bit_data_size)
+    return False
 
 
-def iterateOverBitImageVals(length, i, w, h, image, photo_path):
+def groupSelectedRecords(records, selected):
     """
-    Iterates over a specified number of bits inside the image. No pixel values are changed and no data is extracted.
-    :param length: The number of bits to iterate through (number of RGB pixel values)
-    :param i: The current index value, representing the number of bits that have currently been gone over so far in
-    the given image.
-    :param w: The current image pixel width value being looked at.
-    :param h: The current image pixel height value being looked at.
-    :param image: The image object containing all the pixel data of the current image.
-    :param photo_path: The path to the photo whose pixel values are being iterated over.
-    :return: The updated values of i, w, and h.
+    Groups the selected entries into runs that get read in one go, each starting at the restart point of its first
+    entry.
+    :param records: The ContentsRecords of all entries.
+    :param selected: The indices of the selected records, in increasing order.
+    :return: A list containing a tuple of the index of the first and the last record of every run.
     """
-    width, height = image.size
+    groups = []
 
-    for j in range(length):
-        if w >= width:
-            w = 0
-            h += 1
-            if h >= height:
-                print("Error - Invalid image for data extraction.")
-                print("Image " + str(os.path.basename(photo_path)) + " is too small and therefore could've never stored any data in the first place.")
-                image.close()
-                sys.exit(1)
+    for i in selected:
+        if len(groups) > 0:
+            first, last = groups[-1]
 
-        i += 1
-    
-        # The RGB values for the current pixel have all been gone through and it's now time for the next pixel
-        if i % 3 == 0:
-            w += 1
-    
-    return (i, w, h)
-
-
-def getPixelVals(length, extracted_bits, i, w, h, image, photo_path):
-    """
-    Gets all of the image pixel least significant bit values within a specified range (i to i + length - 1)
-    :param length: The number of pixel value bits to extract from the given image.
-    :param extracted_bits: All hidden bits get extracted and stored in this data structure (a list of 0's and 1's)
-    :param i: The current index value, representing the number of bits that have currently been gone over so far in
-    the given image.
-    :param w: The current image pixel width value being looked at.
-    :param h: The current image pixel height value being looked at.
-    :param image: The image object containing all the pixel data of the current image.
-    :param photo_path: The path to the photo whose pixel lsb values are being extracted and stored.
-    :return: The updated values of i, w, and h.
-    """
-    width, height = image.size
-
-    for j in range(length):
-        if w >= width:
-            w = 0
-            h += 1
-            if h >= height:
-                print("Error - Invalid image for data extraction.")
-                print("Image " + str(os.path.basename(photo_path)) + " is too small and therefore could've never stored any data in the first place.")
-                image.close()
-                sys.exit(1)
-        
-        rgb = image.getpixel((w, h))
-        extracted_bits.append(rgb[i%3] % 2)
+            # The restart point of the entry after the last one is where the last one ends at the latest
+            if records[i].restart_offset - records[last + 1].restart_offset <= SESSION_GAP_LIMIT:
+                groups[-1] = (first, i)
+                continue
 
-        i += 1
-    
-        if i % 3 == 0:
-            w += 1
-    
-    return (i, w, h)
+        groups.append((i, i))
 
+    return groups
 
-def getTotalBitsNumDataSize(image_path, precursor_bit_length):
+
+def extractRecords(photo_dict, records, first, last, selected, codec, entries_offset, writer, num_workers, instrumentation, photos_read):
     """
-    Gets the number of bits reserved for storing the total number of bits of data that has been hidden (Stored num only in first image)
-    :param image_path: The path to the image containing the number of bits of data that has been hidden.
-    :param precursor_bit_length: The number of image pixel value bits that need to be iterated over before we get to the bits in the
-    image used to store the value we are looking for.
-    :return: The total number of bits that have been hidden in a photo set (which we have found, hidden in our given image).
+    Reads a run of entries starting at the restart point of the first one, recreating the selected ones.
+    :param photo_dict: A dictionary of photos, where the key is the photo's identifier number and the value
+    is the PhotoHeader of the photo.
+    :param records: The ContentsRecords of all entries.
+    :param first: The index of the first record of the run.
+    :param last: The index of the last record of the run.
+    :param selected: The set of indices of the selected records.
+    :param codec: The codec the archive entries have been compressed with.
+    :param entries_offset: The position of the first byte of the entries within the hidden data.
+    :param writer: The DirectoryWriter recreating the selected data.
+    :param num_workers: The number of photos that get read at the same time, each in its own process.
+    :param instrumentation: The Instrumentation receiving the progress and measurements.
+    :param photos_read: A set the names of all photos that get read are added to.
     """
-    # Only the image that has image number 0 can be inputted into this function
-    if getImageNum(image_path) != 0:
-        print("Error - Image " + str(os.path.basename(image_path)) + " is an invalid image for extracting total number of bits.")
-        sys.exit(1)
+    start = records[first]
+    photo_data_chunks = getPhotoDataChunks(photo_dict, num_workers, instrumentation, entries_offset + start.restart_offset, photos_read)
 
-    image = Image.open(image_path)
+    try:
+        # Past the start of the entries, zlib data continues without its stream header
+        from_restart_point = codec == Compression.ZLIB and start.restart_offset > 0
+        entry_chunks = Compression.decompressChunks(photo_data_chunks, codec, from_restart_point)
 
-    # Convert the image to RGB color mode if needed
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    
-    width, height = image.size
-    
-    w = 0
-    h = 0
+        reader = ArchiveFormat.ArchiveReader(ArchiveFormat.skipBytes(entry_chunks, start.skip))
 
-    i = 0
+        for i in range(first, last + 1):
+            entry = reader.readEntry()
 
-    # Iterate over starting bit values in image containing image num data since we will currently not be dealing with this
-    i, w, h = iterateOverBitImageVals(precursor_bit_length, i, w, h, image, image_path)
-    
-    # Obtaining the length (of the) length in bits of the total number of bits that are hidden
-    b_total_size_length = bytearray()
-    i, w, h = getPixelVals(6, b_total_size_length, i, w, h, image, image_path)
-    total_size_length = 1 + DecimalBitConverters.convertBitsToDecimal(b_total_size_length)
-    
-    # Obtaining the length in bits of the total number of bits that are hidden
-    b_bit_data_size = bytearray()
-    i, w, h = getPixelVals(total_size_length, b_bit_data_size, i, w, h, image, image_path)
-    
-    return DecimalBitConverters.convertBitsToDecimal(b_bit_data_size)
+            if entry is None or entry.path != records[i].path:
+                raise CorruptDataError("Unable to extract data from the given image(s). The table of contents does not match the hidden data.")
+
+            ByteDataToDirectory.writeArchiveEntry(writer, reader, entry, i in selected)
+    finally:
+        photo_data_chunks.close()
 
 
-def createPhotoDictionary(processed_photos):
+def getPhotoDataChunks(photo_dict, num_workers=1, instrumentation=None, start_byte=0, photos_read=None):
+    """
+    Reads the data hidden inside a given set of photos piece by piece, one photo after another in order of their
+    identifier numbers.
+    :param photo_dict: A dictionary of photos, where the key is the photo's identifier number and the value
+    is the PhotoHeader of the photo.
+    :param num_workers: The number of photos that get read at the same time, each in its own process.
+    :param instrumentation: The Instrumentation receiving the progress and measurements. By default, progress is
+    printed and nothing is measured.
+    :param start_byte: The position of the first byte of data wanted. Photos holding only data before it are not read.
+    :param photos_read: A set the names of all photos that get read are added to, or None.
+    :return: A generator yielding the hidden data from 'start_byte' on in consecutive chunks of bytes (about one
+    per photo).
     """
-    Creates a dictionary of photos, where the keys are the extracted unique image identifier numbers that are mapped to their 
-    corresponding photos.
+    total_bit_data_size = photo_dict[0].total_bit_data_size
+
+    if total_bit_data_size == 0:
+        raise InvalidPhotoSetError("Invalid Photo")
+
+    photo_plans = [plan for plan in planPhotoExtraction(photo_dict, total_bit_data_size) if plan[3] + plan[4] > start_byte * 8]
+
+    # The byte at the end of a photo's part of the data is shared with the next photo unless the part ends on a
+    # byte boundary. Its bits are held back and combined with the start of the next part.
+    shared_byte = 0
+
+    photo_data = readPlannedPhotos(photo_plans, photo_dict[0].bits_per_channel, total_bit_data_size, num_workers, instrumentation)
+
+    for photo_plan, (bit_index, packed_data, num_photo_bits) in zip(photo_plans, photo_data):
+        if photos_read is not None:
+            photos_read.add(photo_plan[0])
+
+        chunk = bytearray(packed_data)
+
+        if len(chunk) > 0:
+            chunk[0] |= shared_byte
+            shared_byte = 0
+
+        end_bit = bit_index + num_photo_bits
+        if end_bit % 8 != 0 and end_bit < total_bit_data_size and len(chunk) > 0:
+            shared_byte = chunk.pop()
+
+        # The first photo read may start before the wanted data (its first byte may also lack the bits held by the
+        # photo before it, which are never wanted then)
+        if bit_index // 8 < start_byte:
+            del chunk[:start_byte - bit_index // 8]
+
+        if len(chunk) > 0:
+            yield bytes(chunk)
+
+
+def readPlannedPhotos(photo_plans, bits_per_channel, total_bit_data_size, num_workers=1, instrumentation=None):
+    """
+    Extracts the data of every planned photo, handing the results back in the order of the plan.
+    :param photo_plans: The photos to be read, as returned by planPhotoExtraction.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param total_bit_data_size: The total number of bits of data that have been hidden in the image set.
+    :param num_workers: The number of photos that get read at the same time, each in its own process.
+    :param instrumentation: The Instrumentation receiving the progress and measurements, or None.
+    :return: A generator yielding a tuple for every photo of the index of the first bit of data it holds, its data
+    (see extractDataFromImage) and the number of bits of data it holds.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
+
+    if num_workers <= 1:
+        for photo_name, photo, payload_offset, bit_index, num_photo_bits in photo_plans:
+            instrumentation.progress("extract", photo_name, bit_index, total_bit_data_size)
+            bit_index, packed_data, events = extractDataFromImage(photo, payload_offset, bit_index, num_photo_bits, bits_per_channel, photo_name, instrumentation)
+            yield (bit_index, packed_data, num_photo_bits)
+        return
+
+    pending = collections.deque()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for photo_name, photo, payload_offset, bit_index, num_photo_bits in photo_plans:
+            # Limit the number of photos read ahead, since each one holds its part of the data in memory
+            if len(pending) >= 2 * num_workers:
+                yield receivePhotoData(*pending.popleft(), instrumentation)
+
+            instrumentation.progress("extract", photo_name, bit_index, total_bit_data_size)
+
+            # The worker measures its stages itself and hands back the events along with the data
+            worker_instrumentation = instrumentation.createWorkerInstrumentation()
+            future = executor.submit(extractDataFromImage, photo, payload_offset, bit_index, num_photo_bits, bits_per_channel, photo_name, worker_instrumentation)
+            pending.append((future, num_photo_bits))
+
+        while len(pending) > 0:
+            yield receivePhotoData(*pending.popleft(), instrumentation)
+
+
+def receivePhotoData(future, num_photo_bits, instrumentation):
+    """
+    Waits for a photo that is being read in a worker process.
+    :param future: The future of the call to extractDataFromImage.
+    :param num_photo_bits: The number of bits of data the photo holds.
+    :param instrumentation: The Instrumentation the events recorded by the worker are passed on to.
+    :return: A tuple of the index of the first bit of data the photo holds, its data and 'num_photo_bits'.
+    """
+    # Any error that occurred while reading the photo gets raised here
+    bit_index, packed_data, events = future.result()
+    instrumentation.emitAll(events)
+
+    return (bit_index, packed_data, num_photo_bits)
+
+
+def checkForArchive(chunks):
+    """
+    Checks whether data starts like an archive, without reading any more of it than needed.
+    :param chunks: An iterable yielding the data in consecutive chunks of bytes.
+    :return: A tuple containing True if the data is an archive (otherwise False) and an iterable yielding all of
+    the data, including the chunks that have been looked at.
+    """
+    chunks = iter(chunks)
+    start_chunks = []
+    num_start_bytes = 0
+
+    while num_start_bytes < len(ArchiveFormat.MAGIC):
+        chunk = next(chunks, None)
+
+        if chunk is None:
+            break
+
+        start_chunks.append(chunk)
+        num_start_bytes += len(chunk)
+
+    return (ArchiveFormat.isArchive(b"".join(start_chunks)), itertools.chain(start_chunks, chunks))
+
+
+def planPhotoExtraction(photo_dict, total_bit_data_size):
+    """
+    Works out which part of the hidden data each photo holds, using only the photo headers. Photos have been filled
+    up in order of their identifier numbers, each one as much as possible.
+    :param photo_dict: A dictionary of photos, where the key is the photo's identifier number and the value
+    is the PhotoHeader of the photo.
+    :param total_bit_data_size: The total number of bits of data that have been hidden in the image set.
+    :return: A list containing a tuple for every photo (in order of identifier numbers) of the name of the photo, the
+    photo (its path, or the photo itself), the index of the first channel value holding data, the index of the first bit of data it holds and the number of bits of data it holds.
+    Photos with a fixed size header record their part of the data themselves.
+    """
+    photo_plans = []
+    bit_index = 0
+    bits_per_channel = photo_dict[0].bits_per_channel
+
+    for i in range(len(photo_dict)):
+        header = photo_dict[i]
+
+        if header.header_version > 0:
+            # Consecutive photos hold consecutive parts of the data
+            if header.bit_index != bit_index or header.num_photo_bits > total_bit_data_size - bit_index:
+                raise InvalidPhotoSetError("Invalid set of photos for extraction. The data held by photo '" + header.name + "' doesn't follow on from the photo before it.")
+
+            num_photo_bits = header.num_photo_bits
+        else:
+            num_channels = max(0, header.width * header.height * header.channels_per_pixel - header.payload_offset)
+            capacity = PixelChannels.getPayloadCapacity(num_channels, bits_per_channel, i == 0)
+            num_photo_bits = min(total_bit_data_size - bit_index, capacity)
+
+        photo_plans.append((header.name, header.photo, header.payload_offset, bit_index, num_photo_bits))
+        bit_index += num_photo_bits
+
+    if bit_index != total_bit_data_size:
+        raise InvalidPhotoSetError("Unable to process photo(s) as it may be prone to errors")
+
+    return photo_plans
+
+
+def getProcessedPhotos(processed_photos):
+    """
+    Lists the photos in the folder of processed photos.
     :param processed_photos: The path to the folder containing the processed photos which have data hidden in them.
+    :return: A list containing a tuple of the file name and the path of every photo.
+    """
+    # Path must lead to a folder
+    if not os.path.isdir(processed_photos):
+        raise InvalidInputError("Specified path to folder containing processed photos does not lead to a folder.")
+
+    photos = []
+    for photo in os.listdir(processed_photos):
+        # Sometimes unwanted hidden files may appear, which are left alone
+        if Miscellaneous_Helpers.isPotentialHiddenFile(photo):
+            continue
+
+        # Check to make sure only compatible image types being processed
+        if not photo.lower().endswith('.png'):
+            raise InvalidInputError("Only png images are allowed for extraction.")
+
+        photos.append((photo, os.path.join(processed_photos, photo)))
+
+    return photos
+
+
+def createPhotoDictionary(photos, header_cache_path=None):
+    """
+    Creates a dictionary of photos, where the keys are the extracted unique image identifier numbers that are mapped to the 
+    headers (PhotoHeader) of their corresponding photos. Every photo's header is decoded only once.
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every
+    processed photo which has data hidden in it.
+    :param header_cache_path: Path to the file caching photo headers between runs, or None if no cache is used.
     :return: The newly created dictionary of photos with their corresponding identifier numbers (keys). Note that in order to
     be valid, all keys must be a unique number from 0 to n - 1, where n is the total number of photos containing the hidden data.
+    Photos without a fixed size header (see PhotoHeaders.readFixedHeader) among photos that have one are not part of
+    the set and are left out, and so are photos of other sets if exactly one set is complete (see selectPhotoSet).
     """
     photo_dict = {}
 
-    Miscellaneous_Helpers.removePotentialHiddenFiles(processed_photos)
+    header_cache = Miscellaneous_Helpers.loadFileCache(header_cache_path) if header_cache_path is not None else None
+    headers = PhotoHeaders.getPhotoHeaders(photos, header_cache)
 
-    # Fill the dictionary with the photos and their corresponding identifier numbers
-    for photo in os.listdir(processed_photos):
-        # Check to make sure only compatible image types being processed
-        if not photo.lower().endswith('.png'):
-            print("Error - Only png images are allowed for extraction.")
-            sys.exit(1)
+    if header_cache is not None:
+        Miscellaneous_Helpers.saveFileCache(header_cache_path, header_cache)
+
+    # A photo without a readable header only matters if none of the photos has a fixed size header
+    errors = [header for header in headers if isinstance(header, InvalidPhotoSetError)]
+    headers = [header for header in headers if not isinstance(header, InvalidPhotoSetError)]
 
-        photo_path = os.path.join(processed_photos, photo)
-        current_num = getImageNum(photo_path)
+    # Photos processed by this version of the program start with a magic number, so any other photo is not a member
+    # of the set (older versions could only store photo sets without any other photos around them)
+    if any(header.header_version > 0 for header in headers):
+        headers = selectPhotoSet([header for header in headers if header.header_version > 0])
+    elif len(errors) > 0:
+        raise errors[0]
+
+    # Fill the dictionary with the photos and their corresponding identifier numbers
+    for header in headers:
+        photo_name = header.name
+        current_num = header.image_num
 
         # Multiple separate photos cannot contain the same identifier number
         if current_num in photo_dict:
-            print("Error - Invalid set of photos for extraction.")
-            print("Photos '" + str(os.path.basename(photo_dict[current_num])) + "' and '" + photo + "' contain the same identifier number.")
-            sys.exit(1)
+            raise InvalidPhotoSetError("Invalid set of photos for extraction. Photos '" + photo_dict[current_num].name + "' and '" + photo_name + "' contain the same identifier number.")
+
+        photo_dict[current_num] = header
 
-        photo_dict[current_num] = photo_path
+    # There must exist at least one photo
+    if len(photo_dict) == 0:
+        raise InvalidInputError("You do not have any photos listed.")
+
+    # Photos recording how many photos the set has (always including photo 0) reveal missing photos straight away
+    num_photos = getNumPhotosInSet(photo_dict.values())
+    if num_photos is not None and num_photos != len(photo_dict):
+        missing_nums = [str(num) for num in range(num_photos) if num not in photo_dict]
+        raise InvalidPhotoSetError("Invalid set of photos for extraction. The data has been hidden in " + str(num_photos) + " photos, but " + str(len(photo_dict)) + " of them have been found" + (" (missing photo numbers: " + ", ".join(missing_nums) + ")." if 0 < len(missing_nums) <= 20 else "."))
 
     nums = fillListWithNumbersFromZeroToMax(len(photo_dict) - 1)
     
     # Check that all photo identifier numbers are within proper range (0 to n - 1, where n is the number of photos to process)
     for key in photo_dict:
         if not key in nums:
-            print("Error - Invalid set of photos for extraction.")
-            print("Photo number for '" + str(os.path.basename(photo_dict[key])) + "' is not in range, given the current set of photos for extraction.")
-            sys.exit(1)
+            raise InvalidPhotoSetError("Invalid set of photos for extraction. Photo number for '" + photo_dict[key].name + "' is not in range, given the current set of photos for extraction.")
         
         nums.remove(key)
     
     return photo_dict
 
 
-def fillListWithNumbersFromZeroToMax(max):
+def selectPhotoSet(headers):
     """
-    Fills a list with integers from zero to max (size = max + 1)
-    :param max: The largest (and last) integer value to be stored in the list.
-    :return: The list containing integers zero to max.
+    Picks out the photos of a single set among photos with a fixed size header. Every time data gets hidden, its
+    photos get a new random set identifier (see PhotoHeaders.createSetId), so photos left over from another time
+    data has been hidden can be told apart from the photos of the set.
+    :param headers: The PhotoHeader of every photo with a fixed size header.
+    :return: The headers of the photos belonging to the set. If the photos come from several sets, only the one set
+    that is complete is kept.
     """
-    aList = []
-    for i in range(max + 1):
-        aList.append(i)
-    
-    return aList
+    photo_sets = {}
+    for header in headers:
+        photo_sets.setdefault(header.set_id, []).append(header)
 
+    if len(photo_sets) == 1:
+        return headers
 
-def getMainDataFromPixels(bits, i, w, h, image, current_num_extracted, total_bits):
-    """
-    Extracts all hidden data that will later be reconstructed.
-    :param bits: Our bytearray data structure which stores all extracted bits.
-    :param i: The current index value, representing the number of bits that have currently been gone over so far in
-    the given image.
-    :param w: The current image pixel width value being looked at.
-    :param h: The current image pixel height value being looked at.
-    :param image: The image object containing all the pixel data of the current image.
-    :param current_num_extracted: The current number of bits that have so far been extracted from any potential
-    previous images (not including reserve bits).
-    :param total_bits: The total number of bits of data that have been hidden (In all images). This way we know 
-    when to stop extracting least significant bit values.
-    :return: The updated current number of bits that have been extracted.
-    """
-    width, height = image.size
+    complete_sets = [photo_set for photo_set in photo_sets.values() if isCompletePhotoSet(photo_set)]
 
-    # Go through potential remaining G/B values in current pixel to start with fresh new pixel
-    while i % 3 != 0:
-        rgb = image.getpixel((w, h))
-        bits.append(rgb[i%3] % 2)
-        
-        i += 1
-        current_num_extracted += 1
-         
-        # All data hidden in image(s) has been read, meaning any future remaining pixels do not need to be explored since they never got modified.
-        if current_num_extracted == total_bits:
-            image.close()
-            return current_num_extracted
-    
-    w += 1
-
-    for h in range(h, height):
-        for w in range(w, width):
-            for j in range(3):
-                rgb = image.getpixel((w, h))
-                bits.append(rgb[i%3] % 2)
-                
-                i += 1
-                current_num_extracted += 1
-
-                # All data hidden in image(s) has been read
-                if current_num_extracted == total_bits:
-                    image.close()
-                    return current_num_extracted
-        w = 0
-    
-    return current_num_extracted
+    if len(complete_sets) == 0:
+        raise InvalidPhotoSetError("Invalid set of photos for extraction. The photos belong to " + str(len(photo_sets)) + " different sets of hidden data, none of which is complete.")
 
+    if len(complete_sets) > 1:
+        raise InvalidPhotoSetError("Invalid set of photos for extraction. The photos hold " + str(len(complete_sets)) + " different sets of hidden data, so it's unclear which one to extract.")
 
-def extractDataFromImage(image_path, current_num_bits_extracted, total_bit_data_size):
-    """
-    Extracts all hidden data from a given image.
-    :param image_path: The path to the image containing hidden data that will be extracted.
-    :param current_num_bits_extracted: The current number of bits of data that have so far been 
-    extracted from any potential previous images.
-    :param total_bit_data_size: The total number of bits of data that have been hidden in an image
-    set. This same number of bits needs to be extracted from all photos.
-    :return: The updated bytearray data structure storing all extracted bits.
-    """
-    try:
-        print("Currently extracting data from photo " + str(os.path.basename(image_path)), end="")
-        print("  (" + str((current_num_bits_extracted * 1000 // total_bit_data_size) / 10) + "% complete)")
-    except ZeroDivisionError as e:
-        print("\nError - Invalid Photo")
-        sys.exit(1)
+    return complete_sets[0]
 
-    bits = bytearray()
-    precursor_bit_length = getStartBitsDataLength(image_path)
 
-    image = Image.open(image_path)
+def isCompletePhotoSet(headers):
+    """
+    Checks whether the photos of a set are all there, going by the number of photos recorded in their headers.
+    :param headers: The PhotoHeader of every photo of the set.
+    :return: True if the set has exactly as many distinct photo identifier numbers as it records, False otherwise.
+    """
+    num_photos = getNumPhotosInSet(headers)
+    image_nums = set(header.image_num for header in headers)
 
-    # Convert the image to RGB color mode if needed
-    if image.mode != "RGB":
-        image = image.convert("RGB")
+    return num_photos is not None and len(image_nums) == len(headers) == num_photos and image_nums == set(range(num_photos))
 
-    width, height = image.size
 
-    w = 0
-    h = 0
+def getNumPhotosInSet(headers):
+    """
+    Finds the number of photos in a set, which is recorded by photo 0 and every other photo whose header was
+    written once the number was known (see SET_INFO_FLAG in PhotoHeaders).
+    :param headers: The PhotoHeader of every photo of the set.
+    :return: The number of photos in the set, or None if none of the headers records it.
+    """
+    for header in headers:
+        if header.num_photos is not None:
+            return header.num_photos
 
-    i = 0
+    return None
 
-    # Iterate over starting bit values in image containing image num data (and data size if first image)
-    i, w, h = iterateOverBitImageVals(precursor_bit_length, i, w, h, image, image_path) 
-    
-    # Extract the main data that will later be reconstructed from the remaining pixels
-    current_num_bits_extracted = getMainDataFromPixels(bits, i, w, h, image, current_num_bits_extracted, total_bit_data_size)
 
-    # Future bits in the image have been explored when they shouldn't have
-    if current_num_bits_extracted > total_bit_data_size:
-        print("Error in extracting data from photo " + str(os.path.basename(image_path)))
-        sys.exit(1)
+def fillListWithNumbersFromZeroToMax(max):
+    """
+    Fills a list with integers from zero to max (size = max + 1)
+    :param max: The largest (and last) integer value to be stored in the list.
+    :return: The list containing integers zero to max.
+    """
+    aList = []
+    for i in range(max + 1):
+        aList.append(i)
     
-    image.close()
-
-    return bits
+    return aList
 
 
-def getImageNum(photo_path):
+def extractDataFromImage(photo, payload_offset, bit_index, num_photo_bits, bits_per_channel=1, photo_name=None, instrumentation=None):
     """
-    Obtains the image identifier number hidden in an image.
-    :param photo_path: The path to the image containing an identifier number we wish toi extract.
-    :return: The hidden image identifier number from the given image.
+    Extracts all hidden data from a given image. (This function runs on its own in a separate process when photos
+    are read in parallel.)
+    :param photo: The path to the image containing hidden data that will be extracted, or the image itself.
+    :param payload_offset: The index of the first channel value of the image that holds data.
+    :param bit_index: The index of the first bit of data held by the image, within all the data of the image set.
+    :param num_photo_bits: The number of bits of data held by the image.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param photo_name: The name of the image, which its measurements are recorded under.
+    :param instrumentation: The Instrumentation measuring the 'decode' and 'read_payload' stages, or None.
+    :return: A tuple containing 'bit_index', the extracted bits, packed into bytes so that they line up with the
+    byte at index bit_index // 8 of all the data (any bits before 'bit_index' in the first byte are zero), and the
+    list of events recorded by 'instrumentation' (empty if None).
     """
-    image = Image.open(photo_path)
+    if instrumentation is None:
+        instrumentation = Instrumentation.Instrumentation(measure=False)
 
-    # Convert the image to RGB color mode if needed
-    if image.mode != "RGB":
-        image = image.convert("RGB")
-    
-    width, height = image.size
-
-    w = 0
-    h = 0
+    with instrumentation.stage("decode", 0, photo_name) as stage:
+        # Only the rows up to the last channel value holding data get decoded, e.g. just the first few rows of a
+        # nearly empty last photo
+        num_channels = payload_offset + PixelChannels.getPayloadChannelCount(num_photo_bits, bits_per_channel, bit_index == 0)
+        channels, width, height, mode = PixelChannels.readImageChannels(photo, num_channels)
+        stage["bytes"] = len(channels)
 
-    i = 0
+    with instrumentation.stage("read_payload", (num_photo_bits + 7) // 8, photo_name):
+        # Any remaining pixels after the data never got modified
+        bits = PixelChannels.readPayloadFromChannels(channels, payload_offset, num_photo_bits, bits_per_channel, bit_index == 0)
+        if bit_index % 8 != 0:
+            bits = numpy.concatenate((numpy.zeros(bit_index % 8, dtype=numpy.uint8), bits))
 
-    # Extract the length, in bits, of the current photo ID number
-    b_ID_length = bytearray()
-    i, w, h = getPixelVals(4, b_ID_length, i, w, h, image, photo_path)
-    ID_length = 1 + DecimalBitConverters.convertBitsToDecimal(b_ID_length)
+        packed_data = numpy.packbits(bits).tobytes()
 
-    # Extract the actual photo ID num
-    b_photo_num = bytearray()
-    i, w, h = getPixelVals(ID_length, b_photo_num, i, w, h, image, photo_path)
-    
-    image.close()
-    
-    return DecimalBitConverters.convertBitsToDecimal(b_photo_num)
-        
+    return (bit_index, packed_data, instrumentation.events)
@@ -1,63 +1,204 @@
-from Data_Converters import DirectoryToByteData, BinaryByteConverters, DecimalBitConverters, Miscellaneous_Helpers
+from Data_Converters import ArchiveFormat, Compression, DirectoryToByteData, Instrumentation, Miscellaneous_Helpers
+from Data_Converters.BitStream import BitReader, BitWriter, ChunkedBitReader
+from Data_Converters.StegoErrors import CapacityError, DataModifiedError, HidingCancelledError, InvalidInputError, InvalidSettingError, SizeLimitError
+from Image_Manipulation import PhotoHeaders, PhotoSizes, PixelChannels
 from PIL import Image
-import pickle, sys, os, math
+import collections, concurrent.futures, io, os, shutil
 
 
-def hideDataInImages(folder_path, path_to_input_photos, path_to_processed_photos):
+# Ways of choosing which of the input photos get used and in which order: as listed in the folder (the way photos
+# have always been used), the fewest photos able to hold the data, or the photos with the fewest pixels in total, which
+# takes the least time to process
+COVER_SELECTIONS = ("ordered", "fewest_photos", "least_pixels")
+
+# What hideDataInImages did: the paths of the processed photos that have been saved, the names of the input photos
+# that weren't needed, the size of the hidden data in bytes, the name of the codec it has been compressed with, the
+# number of bits per channel value it has been stored with, the png profile the processed photos were saved with and
+# the way the photos have been chosen (see COVER_SELECTIONS). The processed photos are listed in the order they were
+# filled in.
+HideResult = collections.namedtuple("HideResult", [
+    "processed_photos", "unused_photos", "num_bytes", "codec", "bits_per_channel", "png_profile", "cover_selection"
+])
+
+# What getCapacityOfPhotos found: the PhotoCapacity of every photo, in the order the photos are used, the total
+# number of bytes of data the photos are able to store and the number of bits per channel value it was calculated for
+CapacityReport = collections.namedtuple("CapacityReport", ["photos", "num_bytes", "bits_per_channel"])
+
+# The size of a single photo and the number of bytes of data it is able to store
+PhotoCapacity = collections.namedtuple("PhotoCapacity", ["name", "width", "height", "channels_per_pixel", "num_bytes"])
+
+
+def hideDataInImages(folder_path, path_to_input_photos, path_to_processed_photos, num_workers=1, compression="none", bits_per_channel=1, confirm=None, max_size=None, instrumentation=None, png_profile="balanced", photo_size_cache_path=None, cover_selection="ordered", skip_symlinks=False):
     """
-    Hides data in a given set of images and saves those modified images to a new folder.
+    Hides data in a given set of images and saves those modified images to a new folder. Nothing is ever asked for
+    interactively; every problem is reported by raising a StegoError (see StegoErrors).
     :param folder_path: The path to the data that we want to extract and hide.
     :param path_to_input_photos: The path to the folder containing the photo(s) that will be used to hide
     the data.
     :param path_to_processed_photos: Folder location where all photos that have been processed will be saved.
+    :param num_workers: The number of photos that get processed at the same time, each in its own process.
+    With the default of 1, all photos are processed one after another in the current process.
+    :param compression: How the data gets compressed before being hidden: 'none', 'zlib', 'bz2', 'lzma', or 'auto'
+    to pick whichever codec gives the best tradeoff between size and speed for the data. Less data means fewer
+    photos that need to be processed. The codec is recorded along with the data, so extraction needs no setting.
+    :param bits_per_channel: The number of least significant bits (1 to 4) of every pixel channel value used for
+    storing data. Using more bits multiplies the capacity of every photo, at the cost of changes to the photos that
+    are easier to notice. Like the codec, the setting is recorded along with the data.
+    :param confirm: A function that is called with the size of the data to be hidden (in bytes) once it is known
+    that the data fits, before any photo is modified. Returning False cancels hiding the data, raising a
+    HidingCancelledError. By default, no confirmation is needed. Compressed data then gets hidden while it is being
+    compressed (see hideStreamedData), rather than being compressed into a temporary file first to find out its size.
+    :param max_size: The largest size of the data to be hidden (in bytes, after compression) that is accepted.
+    Larger data raises a SizeLimitError before any photo is modified (or, for compressed data that is hidden while
+    it is being compressed, once the limit is passed, before any previously processed photos are removed). By default, there is no
+    limit.
+    :param instrumentation: The Instrumentation (see Instrumentation.py) receiving the progress of hiding the data
+    and the measurements of every stage, for the whole run ('hide', 'choose_codec', 'compress', 'plan',
+    'clear_output') and for every photo ('read_data', 'decode', 'embed', 'encode'). Data that is hidden while it is
+    being compressed is compressed during 'read_data'. By default, progress is printed and nothing is measured.
+    :param png_profile: How the processed photos are encoded: 'fast', 'balanced' or 'smallest' (see
+    PixelChannels.PNG_PROFILES). Encoding is the slowest part of processing a photo, and the profiles trade its
+    speed for the size of the saved photos. The hidden data is the same either way.
+    :param photo_size_cache_path: The path to a file caching the sizes of the input photos between runs (see
+    PhotoSizes.getPhotoSizes), or None.
+    :param cover_selection: Which of the input photos are used, in which order (see selectCovers): 'ordered' fills
+    them in the order they are listed in the folder, 'fewest_photos' uses as few photos as possible and
+    'least_pixels' the photos with the fewest pixels in total, i.e. the least decoding and encoding. Photos that are
+    not needed are never touched. 'least_pixels' needs to know the size of compressed data beforehand, so the data
+    is then compressed into a temporary file first.
+    :param skip_symlinks: Whether symbolic links inside the folder of data are left out, rather than hiding the
+    files and folders they lead to (see DirectoryToByteData.getArchiveEntries).
+    :return: A HideResult describing the hidden data and the photos that have been processed.
     """
-    byte_data_list = DirectoryToByteData.getByteData(folder_path)
-    bits = BinaryByteConverters.convertByteDataListToFullBinary(byte_data_list)
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
 
-    # All error checking happens here to determine whether or not photo data can properly be hidden
-    checkIfDataCanBeHidden(len(bits), path_to_input_photos)
+    checkBitsPerChannel(bits_per_channel)
+    checkCoverSelection(cover_selection)
+    PixelChannels.getPngSaveOptions(png_profile)
 
-    printSizeOfDataToBeHidden(len(bits))
+    with instrumentation.stage("hide") as run_stage:
+        codec = getCodecForData(folder_path, compression, instrumentation, skip_symlinks)
 
-    # Any processed photos from a previous session will get removed
-    Miscellaneous_Helpers.removePreviouslyExtractedData(path_to_processed_photos)
+        # Without anyone to confirm the size first (or a choice of photos depending on it), compressed data is hidden
+        # while it is being compressed
+        if codec != Compression.NONE and confirm is None and cover_selection != "least_pixels":
+            with instrumentation.stage("plan"):
+                photos = getInputPhotos(path_to_input_photos)
+                checkNumberOfPhotos(photos)
+                photo_sizes = PhotoSizes.getPhotoSizes(photos, photo_size_cache_path)
+                photos = selectCovers(photos, None, bits_per_channel, photo_sizes, cover_selection)[0]
 
-    # Total number of bits to be hidden in binary (bit) format
-    b_total_bits = DecimalBitConverters.convertDecimalToBits(len(bits), Miscellaneous_Helpers.getNumBitsToReserve(len(bits)))
+            instrumentation.message("Compressing data using " + Compression.getCodecName(codec) + "...")
+            archive_chunks, archive_start_length, getArchiveStart = DirectoryToByteData.getStreamedArchive(folder_path, codec, bits_per_channel, skip_symlinks)
 
-    unused_photos = []
+            # Whether the data fits is only known once all of it has been hidden, so the photos are saved in a staging
+            # folder first and any previously processed photos are only replaced once it has succeeded
+            staging_path = Miscellaneous_Helpers.createStagingFolder(path_to_processed_photos)
 
-    bit_index = 0
-    photo_num = 0
-    first_image = True
-    for photo in os.listdir(path_to_input_photos):
-        photo_path = os.path.join(path_to_input_photos, photo)
+            try:
+                used_photos, unused_photos, num_bytes = hideStreamedData(archive_chunks, archive_start_length, getArchiveStart, photos, staging_path, num_workers, bits_per_channel, max_size, instrumentation, png_profile, photo_sizes)
 
-        # If true, then all data has been hidden in all previous photo(s) and any remaining photos will not be needed when extracting data.
-        if bit_index >= len(bits):
-            unused_photos.append(photo)
-            continue
+                with instrumentation.stage("clear_output"):
+                    Miscellaneous_Helpers.replaceFolderContents(path_to_processed_photos, staging_path)
+            finally:
+                shutil.rmtree(staging_path, ignore_errors=True)
 
-        b_photo_num = DecimalBitConverters.convertDecimalToBits(photo_num, Miscellaneous_Helpers.getNumBitsToReserve(photo_num))
+            run_stage["bytes"] = num_bytes
+            processed_photos = [os.path.join(path_to_processed_photos, photo_name) for photo_name in used_photos]
 
-        # Hides data in the current photo and updates the next bit index in 'bits' to be stored
-        bit_index = hideDataInPhoto(bits, bit_index, photo_path, b_photo_num, b_total_bits, first_image, path_to_processed_photos)
-        first_image = False
-        photo_num += 1
-    
-    # This error should never occur but is checked just in case.
-    if bit_index < len(bits):
-        print("Error - Not all data was able to be hidden in the given photos.")
-        print("If this error occurs, something went wrong and the process was unsuccessful")
-        sys.exit(1)
-    
-    print("Your data has successfully been hidden! (100% complete)")
-    
-    # Any potential remaining photos that didn't need to be used for hiding data are listed here.
-    if len(unused_photos) > 0:
-        print("\nHere are all the photos that didn't need to (and haven't been) processed...")
-        for photo in unused_photos:
-            print("-> " + photo)
+            return HideResult(processed_photos, unused_photos, num_bytes, Compression.getCodecName(codec), bits_per_channel, png_profile, cover_selection)
+
+        data_chunks, num_bytes = getDataToBeHidden(folder_path, codec, bits_per_channel, instrumentation, skip_symlinks)
+        num_bits = num_bytes * 8
+        run_stage["bytes"] = num_bytes
+
+        # All error checking happens here to determine whether or not photo data can properly be hidden
+        with instrumentation.stage("plan"):
+            photos = getInputPhotos(path_to_input_photos)
+            photo_sizes = PhotoSizes.getPhotoSizes(photos, photo_size_cache_path)
+            photo_plans, unused_photos = planHiding(num_bytes, photos, bits_per_channel, max_size, photo_sizes, cover_selection)
+
+        if confirm is not None and not confirm(num_bytes):
+            raise HidingCancelledError("No new images have been modified/saved.")
+
+        # Any processed photos from a previous session will get removed
+        with instrumentation.stage("clear_output"):
+            Miscellaneous_Helpers.removePreviouslyExtractedData(path_to_processed_photos)
+
+        bits = ChunkedBitReader(data_chunks, num_bits)
+        photo_jobs = getPlannedPhotoJobs(bits, photo_plans, instrumentation)
+        hidePhotoJobs(photo_jobs, num_bits, path_to_processed_photos, num_workers, bits_per_channel, instrumentation, png_profile)
+
+        # The data grew after its size had been calculated, so the hidden copy would be incomplete
+        if not bits.isAtEnd():
+            raise DataModifiedError("The data to be hidden has been modified while it was being hidden.")
+
+    processed_photos = [os.path.join(path_to_processed_photos, photo_plan[0]) for photo_plan in photo_plans]
+
+    return HideResult(processed_photos, unused_photos, num_bytes, Compression.getCodecName(codec), bits_per_channel, png_profile, cover_selection)
+
+
+def hideDataInMemory(payload, images, name="payload", compression="none", bits_per_channel=1, max_size=None, png_profile="balanced"):
+    """
+    Hides data in a given set of images that are held in memory, without reading or writing any files. The data
+    is stored exactly the way hideDataInImages stores a single file, so either way of extracting works for it.
+    :param payload: The data to be hidden, as a value of type 'bytes'.
+    :param images: The list of photos that will be used to hide the data (see PixelChannels.getInMemoryPhotos).
+    None of them are modified.
+    :param name: The file name the data gets when it is extracted into a folder.
+    :param compression: The compression setting (see hideDataInImages).
+    :param bits_per_channel: The number of least significant bits (1 to 4) of every channel value used for storing data.
+    :param max_size: The largest size of the data to be hidden (in bytes, after compression) that is accepted.
+    :param png_profile: How the processed photos are encoded (see hideDataInImages).
+    :return: A list of the processed photos, each one encoded as png data. The list only covers the photos that
+    were needed, so its n-th entry is the processed version of the n-th photo in 'images'.
+    """
+    checkBitsPerChannel(bits_per_channel)
+    PixelChannels.getPngSaveOptions(png_profile)
+
+    data_chunks, num_bytes, codec = getBytesToBeHidden(payload, name, compression, bits_per_channel)
+    photo_plans = planHiding(num_bytes, PixelChannels.getInMemoryPhotos(images), bits_per_channel, max_size)[0]
+
+    bits = ChunkedBitReader(data_chunks, num_bytes * 8)
+    processed_photos = []
+
+    for photo_name, photo, header, bit_index, num_photo_bits in photo_plans:
+        data = readDataForPhoto(bits, num_photo_bits)
+        image = embedDataInPhoto(photo, header, data, bits_per_channel, bit_index == 0)
+
+        png_data = io.BytesIO()
+        PixelChannels.saveImageAsPng(image, png_data, png_profile)
+        processed_photos.append(png_data.getvalue())
+
+    return processed_photos
+
+
+def getCapacityOfPhotos(path_to_input_photos, bits_per_channel=1, photo_size_cache_path=None):
+    """
+    Works out how much data a folder of photos is able to store, without decoding or modifying any of them (nor
+    anything else in the folder). Only the headers of the photos are read.
+    :param path_to_input_photos: The path to the folder containing the photo(s) that would be used to hide data.
+    :param bits_per_channel: The number of least significant bits (1 to 4) of every channel value used for storing data.
+    :param photo_size_cache_path: The path to a file caching the sizes of photos between runs, or None.
+    :return: A CapacityReport.
+    """
+    checkBitsPerChannel(bits_per_channel)
+
+    photos = getInputPhotos(path_to_input_photos)
+    checkNumberOfPhotos(photos)
+    photo_sizes = PhotoSizes.getPhotoSizes(photos, photo_size_cache_path)
+
+    photo_capacities = []
+    total_capacity = 0
+
+    for photo_num, (photo_name, photo) in enumerate(photos):
+        capacity = getPhotoCapacity(photo, PhotoHeaders.FIXED_HEADER_BIT_LENGTH, bits_per_channel, photo_num == 0, photo_sizes[photo_name])
+
+        photo_capacities.append(PhotoCapacity(photo_name, *photo_sizes[photo_name], capacity // 8))
+        total_capacity += capacity
+
+    return CapacityReport(photo_capacities, total_capacity // 8, bits_per_channel)
 
 
 # ********************************************************************
@@ -65,303 +206,681 @@ def hideDataInImages(folder_path, path_to_input_photos, path_to_processed_photos
 # ********************************************************************
 
 
-def printSizeOfDataToBeHidden(num_bits):
+def checkBitsPerChannel(bits_per_channel):
+    """
+    Makes sure that the number of bits per channel value is supported.
+    :param bits_per_channel: The requested number of least significant bits of every channel value used for storing data.
+    """
+    # More than 4 bits per channel value would visibly alter the photos
+    if bits_per_channel not in (1, 2, 3, 4):
+        raise InvalidSettingError("The number of bits per channel value must be between 1 and 4.")
+
+
+def checkCoverSelection(cover_selection):
+    """
+    Makes sure that the way of choosing the photos is supported.
+    :param cover_selection: The requested way of choosing the photos (see COVER_SELECTIONS).
+    """
+    if cover_selection not in COVER_SELECTIONS:
+        raise InvalidSettingError("Unknown cover selection '" + str(cover_selection) + "'. Choose one of: " + ", ".join(COVER_SELECTIONS) + ".")
+
+
+def getInputPhotos(path_to_input_photos):
+    """
+    Lists the photos in the folder of photos that will be used to hide the data.
+    :param path_to_input_photos: The path to the folder containing the photos.
+    :return: A list containing a tuple of the file name and the path of every photo.
+    """
+    # Path must lead to a folder
+    if not os.path.isdir(path_to_input_photos):
+        raise InvalidInputError("Specified path to folder containing photos does not lead to a folder.")
+
+    photos = []
+    for photo in os.listdir(path_to_input_photos):
+        # Sometimes unwanted hidden files may appear, which are left alone
+        if Miscellaneous_Helpers.isPotentialHiddenFile(photo):
+            continue
+
+        # Path must lead to a png image
+        if not photo.lower().endswith('.png'):
+            raise InvalidInputError("Only png images are supported for this application. " + photo + " is not a png image.")
+
+        photos.append((photo, os.path.join(path_to_input_photos, photo)))
+
+    return photos
+
+
+def getCodecForData(folder_path, compression, instrumentation=None, skip_symlinks=False):
+    """
+    Picks the codec the data to be hidden gets compressed with.
+    :param folder_path: The path to the data that we want to extract and hide.
+    :param compression: The compression setting (see hideDataInImages).
+    :param instrumentation: The Instrumentation measuring the 'choose_codec' stage, or None.
+    :param skip_symlinks: Whether symbolic links inside the folder of data are left out.
+    :return: The identifier of the codec.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
+
+    if compression != "auto":
+        return Compression.getCodec(compression)
+
+    with instrumentation.stage("choose_codec") as stage:
+        sample = DirectoryToByteData.getArchiveSample(folder_path, skip_symlinks)
+        stage["bytes"] = len(sample)
+
+        return Compression.chooseCodec(sample)
+
+
+def getDataToBeHidden(folder_path, codec, bits_per_channel=1, instrumentation=None, skip_symlinks=False):
+    """
+    Prepares the archive of the data to be hidden, with its size known before any of it is hidden.
+    :param folder_path: The path to the data that we want to extract and hide.
+    :param codec: The identifier of the codec the archive gets compressed with.
+    :param bits_per_channel: The number of least significant bits per channel value, recorded in the archive.
+    :param instrumentation: The Instrumentation receiving messages and measurements, or None.
+    :param skip_symlinks: Whether symbolic links inside the folder of data are left out.
+    :return: A tuple containing an iterable yielding the archive in consecutive chunks of bytes and the size of the
+    archive in bytes.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
+
+    # Uncompressed, the size is known up front and the data is only read while it is being hidden
+    if codec == Compression.NONE:
+        return DirectoryToByteData.getArchive(folder_path, codec, bits_per_channel, skip_symlinks)
+
+    instrumentation.message("Compressing data using " + Compression.getCodecName(codec) + "...")
+
+    # The compressed size is only known once everything has been compressed
+    with instrumentation.stage("compress") as stage:
+        archive_chunks, num_bytes = DirectoryToByteData.getArchive(folder_path, codec, bits_per_channel, skip_symlinks)
+        stage["bytes"] = num_bytes
+
+    return (archive_chunks, num_bytes)
+
+
+def getBytesToBeHidden(payload, name, compression, bits_per_channel=1):
+    """
+    Prepares the archive of data that is held in memory, stored as a single file.
+    :param payload: The data to be hidden, as a value of type 'bytes'.
+    :param name: The file name the data is stored under in the archive.
+    :param compression: The compression setting (see hideDataInImages).
+    :param bits_per_channel: The number of least significant bits per channel value, recorded in the archive.
+    :return: A tuple containing an iterable yielding the archive in consecutive chunks of bytes, the size of the
+    archive in bytes and the identifier of the codec it has been compressed with.
+    """
+    if name in ("", ".", "..") or '/' in name or '\\' in name:
+        raise InvalidSettingError("Invalid file name for the hidden data: '" + name + "'")
+
+    payload = bytes(payload)
+
+    if compression == "auto":
+        sample = ArchiveFormat.createEntryHeader(ArchiveFormat.FILE_ENTRY, name, len(payload)) + payload[:Compression.SAMPLE_SIZE]
+        codec = Compression.chooseCodec(sample[:Compression.SAMPLE_SIZE])
+    else:
+        codec = Compression.getCodec(compression)
+
+    entries = io.BytesIO()
+    records = ArchiveFormat.storeEntries([(ArchiveFormat.FILE_ENTRY, name, len(payload), [payload], 0, 0)], codec, entries)
+
+    archive = ArchiveFormat.createPreamble(codec, bits_per_channel) + ArchiveFormat.createTableOfContents(records) + entries.getvalue()
+
+    return ([archive], len(archive), codec)
+
+
+def hideStreamedData(data_chunks, data_start_length, getDataStart, photos, path_to_processed_photos, num_workers=1, bits_per_channel=1, max_size=None, instrumentation=None, png_profile="balanced", photo_sizes=None):
+    """
+    Hides data whose size is only known once all of it has been produced (e.g. while it is being compressed),
+    filling up one photo after another as the data arrives, so that only the part of the data held by the photos
+    being processed is ever in memory. The total size stored in photo 0 and the start of the data are back-patched
+    once everything else has been hidden: the photos holding them keep their part of the data until then and are
+    processed last.
+    :param data_chunks: An iterable yielding the data in consecutive chunks of bytes. Its start (see getDataStart)
+    may be a placeholder.
+    :param data_start_length: The number of bytes at the start of the data that are back-patched.
+    :param getDataStart: A function returning the actual start of the data, called once 'data_chunks' is exhausted.
+    :param photos: A list containing a tuple of the name and the path of every photo that can be used, in order.
+    :param path_to_processed_photos: The path to the location to store all photos that have been processed.
+    :param num_workers: The number of photos that get processed at the same time, each in its own process.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param max_size: The largest size of the data (in bytes) that is accepted, or None for no limit.
+    :param instrumentation: The Instrumentation receiving the progress and measurements, or None.
+    :param png_profile: The png encoding profile the processed photos are saved with.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None to read them when needed.
+    :return: A tuple containing the list of names of the photos that have been processed, the list of names of
+    the photos that were not needed and the size of the data in bytes.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
+
+    bits = ChunkedBitReader(data_chunks)
+    used_photos = []
+
+    photo_jobs = getStreamedPhotoJobs(bits, data_start_length, getDataStart, photos, bits_per_channel, max_size, used_photos, instrumentation, photo_sizes)
+    hidePhotoJobs(photo_jobs, None, path_to_processed_photos, num_workers, bits_per_channel, instrumentation, png_profile)
+
+    unused_photos = [photo_name for photo_name, photo in photos[len(used_photos):]]
+
+    return (used_photos, unused_photos, len(bits) // 8)
+
+
+def getStreamedPhotoJobs(bits, data_start_length, getDataStart, photos, bits_per_channel, max_size, used_photos, instrumentation, photo_sizes=None):
+    """
+    Fills up one photo after another with the data as it arrives. (Part of hideStreamedData)
+    :param bits: The ChunkedBitReader over the data, whose length is set once all of it has been read.
+    :param data_start_length: The number of bytes at the start of the data that are back-patched.
+    :param getDataStart: A function returning the actual start of the data, called once all of it has been read.
+    :param photos: A list containing a tuple of the name and the path of every photo that can be used, in order.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param max_size: The largest size of the data (in bytes) that is accepted, or None for no limit.
+    :param used_photos: A list the name of every photo that is used is appended to.
+    :param instrumentation: The Instrumentation measuring the 'read_data' stages.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None to read them when needed.
+    :return: A generator yielding a tuple for every photo of its name, the photo, its reserve bits, the index of the
+    first bit of data it stores and its part of the data (see hidePhotoJobs).
+    """
+    # The photos holding the placeholder at the start of the data (including photo 0, holding the total size and the
+    # number of photos) are held back
+    held_jobs = []
+    bit_index = 0
+    set_id = PhotoHeaders.createSetId()
+
+    for photo_name, photo in photos:
+        first_image = bit_index == 0
+        capacity = getPhotoCapacity(photo, PhotoHeaders.FIXED_HEADER_BIT_LENGTH, bits_per_channel, first_image, getPhotoSize(photo_name, photo_sizes))
+
+        if capacity == 0:
+            raise CapacityError("Image size for " + photo_name + " is way too small and is therefore unable to hide any data.")
+
+        with instrumentation.stage("read_data", 0, photo_name) as stage:
+            data = bits.readAvailableBits(capacity)
+            stage["bytes"] = (len(data) + 7) // 8
+
+        # The data has ended right at the end of the previous photo
+        if len(data) == 0:
+            break
+
+        if max_size is not None and bit_index + len(data) > max_size * 8:
+            raise SizeLimitError("Size of data to be hidden exceeds the limit of " + str(max_size) + " bytes.")
+
+        # The setting for the number of bits per channel value is only found if the first photo holds all of it
+        if first_image and bits_per_channel > 1 and len(data) == capacity and capacity < PixelChannels.PREAMBLE_BIT_LENGTH:
+            raise CapacityError("Image size for " + photo_name + " is too small to be the first photo when using more than one bit per channel value.")
+
+        photo_num = len(used_photos)
+        used_photos.append(photo_name)
+
+        if bit_index < data_start_length * 8:
+            held_jobs.append((photo_name, photo, photo_num, bit_index, data))
+        else:
+            yield (photo_name, photo, PhotoHeaders.createFixedHeader(set_id, bits_per_channel, photo_num, bit_index, len(data)), bit_index, data)
+
+        bit_index += len(data)
+
+    # The data doesn't fit, which is only known once all photos have been filled up
+    if not bits.isAtEnd():
+        num_bits = bit_index + bits.skipToEnd()
+        raise CapacityError("Not enough space is available to store requested data in specified photo(s). Your requested capacity: " + str(num_bits / 8) + " bytes. Maximum capacity allowed: " + str(bit_index / 8) + " bytes.")
+
+    bits.bit_length = bit_index
+    yield from getBackPatchedPhotoJobs(held_jobs, getDataStart(), bit_index, len(used_photos), set_id, bits_per_channel)
+
+
+def getBackPatchedPhotoJobs(held_jobs, data_start, num_bits, num_photos, set_id, bits_per_channel):
+    """
+    Fills in the actual start of the data, the total size and the number of photos in the photos that have been
+    held back. (Part of hideStreamedData)
+    :param held_jobs: The held back photos (see getStreamedPhotoJobs), which hold the start of the data in order.
+    :param data_start: The actual start of the data, in byte format.
+    :param num_bits: The total number of bits of data.
+    :param num_photos: The number of photos the data has been hidden in.
+    :param set_id: The identifier of the set of photos (see PhotoHeaders.createSetId).
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :return: A generator yielding the completed photos (see hidePhotoJobs).
+    """
+    start = BitWriter()
+
+    for photo_name, photo, photo_num, bit_index, data in held_jobs:
+        start.writeBits(data.getBitArray())
+
+    start.data[:len(data_start)] = data_start
+    reader = BitReader(start.getBitStream())
+
+    for photo_name, photo, photo_num, bit_index, data in held_jobs:
+        header = PhotoHeaders.createFixedHeader(set_id, bits_per_channel, photo_num, bit_index, len(data), num_photos, num_bits)
+
+        yield (photo_name, photo, header, bit_index, reader.readBits(len(data)))
+
+
+def getPlannedPhotoJobs(bits, photo_plans, instrumentation):
+    """
+    Reads the part of the data every planned photo stores.
+    :param bits: The ChunkedBitReader over the data, represented in bits, that is to be hidden.
+    :param photo_plans: The photos to be processed, as returned by planPhotos.
+    :param instrumentation: The Instrumentation measuring the 'read_data' stages.
+    :return: A generator yielding a tuple for every photo of its name, the photo, its reserve bits, the index of the
+    first bit of data it stores and its part of the data (see hidePhotoJobs).
+    """
+    for photo_name, photo, header, bit_index, num_photo_bits in photo_plans:
+        yield (photo_name, photo, header, bit_index, readDataForPhoto(bits, num_photo_bits, photo_name, instrumentation))
+
+
+def hidePhotoJobs(photo_jobs, num_bits, path_to_processed_photos, num_workers, bits_per_channel=1, instrumentation=None, png_profile="balanced"):
+    """
+    Hides every photo's part of the data in it and saves the processed photos. With more than one worker, a pool of
+    worker processes decodes, modifies and saves several photos at the same time.
+    :param photo_jobs: An iterable yielding a tuple for every photo of its name, the photo, its reserve bits, the
+    index of the first bit of data it stores and its part of the data (a BitStream).
+    :param num_bits: The total number of bits of data, or None if it is not known yet (only used for progress).
+    :param path_to_processed_photos: The path to the location to store all photos that have been processed.
+    :param num_workers: The number of photos that get processed at the same time.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param instrumentation: The Instrumentation receiving the progress and measurements, or None.
+    :param png_profile: The png encoding profile the processed photos are saved with.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.createDefaultInstrumentation()
+
+    if num_workers <= 1:
+        for photo_name, photo, header, bit_index, data in photo_jobs:
+            instrumentation.progress("hide", photo_name, bit_index, num_bits)
+            processed_photo_path = os.path.join(path_to_processed_photos, photo_name)
+            hideDataInPhoto(photo, header, data, processed_photo_path, bits_per_channel, bit_index == 0, photo_name, instrumentation, png_profile)
+        return
+
+    pending = collections.deque()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+        for photo_name, photo, header, bit_index, data in photo_jobs:
+            # Limit the number of photos waiting to be processed, since each one holds its part of the data in memory
+            if len(pending) >= 2 * num_workers:
+                instrumentation.emitAll(pending.popleft().result())
+
+            instrumentation.progress("hide", photo_name, bit_index, num_bits)
+            processed_photo_path = os.path.join(path_to_processed_photos, photo_name)
+
+            # The worker measures its stages itself and hands back the events once the photo is done
+            worker_instrumentation = instrumentation.createWorkerInstrumentation()
+            pending.append(executor.submit(hideDataInPhoto, photo, header, data, processed_photo_path, bits_per_channel, bit_index == 0, photo_name, worker_instrumentation, png_profile))
+
+        # Any error that occurred while processing a photo gets raised here
+        for future in pending:
+            instrumentation.emitAll(future.result())
+
+
+def readDataForPhoto(bits, num_photo_bits, photo_name=None, instrumentation=None):
+    """
+    Reads the next part of the data to be hidden. (Reading uncompressed data is when the files get read.)
+    :param bits: The ChunkedBitReader over the data, represented in bits, that is to be hidden.
+    :param num_photo_bits: The number of bits of data the next photo stores.
+    :param photo_name: The name of the photo the data is read for.
+    :param instrumentation: The Instrumentation measuring the 'read_data' stage, or None.
+    :return: The bits that have been read, stored in a BitStream.
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.Instrumentation(measure=False)
+
+    try:
+        with instrumentation.stage("read_data", (num_photo_bits + 7) // 8, photo_name):
+            return bits.readBits(num_photo_bits)
+    except EOFError:
+        raise DataModifiedError("The data to be hidden has been modified while it was being hidden.")
+
+
+def getReadableDataSize(num_bytes):
     """
-    Given the total number of bits, prints the size of the data to be hidden in a more human-readable format
-    and prompts the user with the option of if they still want to continue with the data hiding process.
-    :param num_bits: The number of bits that will be converted into a more human-readable format.
+    Converts the size of some data into a more human-readable format.
+    :param num_bytes: The number of bytes that will be converted into a more human-readable format.
+    :return: The size as a string, e.g. '12.3 kilobytes'.
     """
-    num_bytes = num_bits / 8
     dataTypeStr = ""
 
     if num_bytes < 1000:
-        dataTypeStr = " bytes."
+        dataTypeStr = " bytes"
     elif num_bytes < 10 ** 6:
-        dataTypeStr = " kilobytes."
+        dataTypeStr = " kilobytes"
         num_bytes = (num_bytes // 100) / 10
     elif num_bytes < 10 ** 9:
-        dataTypeStr = " megabytes."
+        dataTypeStr = " megabytes"
         num_bytes = (num_bytes // 10 ** 5) / 10
     elif num_bytes < 10 ** 12:
-        dataTypeStr = " gigabytes."
+        dataTypeStr = " gigabytes"
         num_bytes = (num_bytes // 10 ** 8) / 10
     else:
-        dataTypeStr = " terabytes."
+        dataTypeStr = " terabytes"
         num_bytes = (num_bytes // 10 ** 11) / 10
 
-    print("Size of data to be hidden: " + str(num_bytes) + dataTypeStr)
-    print("Do you wish to continue?")
-    answer = input()
+    return str(num_bytes) + dataTypeStr
+
+
+def planHiding(num_bytes, photos, bits_per_channel=1, max_size=None, photo_sizes=None, cover_selection="ordered"):
+    """
+    Makes sure that the data to be hidden is acceptable and fits inside the given photos, and plans which part of
+    it gets hidden in which photo.
+    :param num_bytes: The size of the data to be hidden in bytes.
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every photo.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param max_size: The largest size of the data to be hidden (in bytes) that is accepted, or None for no limit.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None to read them when needed.
+    :param cover_selection: Which of the photos are used, in which order (see selectCovers).
+    :return: The photo plans and unused photos, as returned by planPhotos.
+    """
+    if max_size is not None and num_bytes > max_size:
+        raise SizeLimitError("Size of data to be hidden (" + str(num_bytes) + " bytes) exceeds the limit of " + str(max_size) + " bytes.")
+
+    photos, skipped_photos = selectCovers(photos, num_bytes * 8, bits_per_channel, photo_sizes, cover_selection)
+    checkIfDataCanBeHidden(num_bytes * 8, photos, bits_per_channel, photo_sizes)
+
+    # Photos are filled in order, so the part of the data hidden in each photo is known before the first one is touched
+    photo_plans, unused_photos = planPhotos(photos, num_bytes * 8, bits_per_channel, photo_sizes)
+
+    return (photo_plans, unused_photos + skipped_photos)
+
+
+def selectCovers(photos, num_bits, bits_per_channel=1, photo_sizes=None, cover_selection="ordered"):
+    """
+    Chooses which photos are used for hiding the data and in which order they are filled. Every photo that gets
+    used has to be decoded and encoded again, which takes time in proportion to its number of pixels.
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every photo.
+    :param num_bits: The total number of bits of data that will be hidden, or None if it is not known yet (in which
+    case photos are only put in order and none are left out up front).
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None to read them when needed.
+    :param cover_selection: 'ordered' keeps the photos as they are, 'fewest_photos' fills the photos able to store
+    the most data first and 'least_pixels' the photos storing the most data per pixel first, finishing with the
+    smallest photo that holds the rest of the data.
+    :return: A tuple containing the list of photos to be used, in order, and the list of names of the photos that
+    are left out. If the data doesn't fit either way, all photos are returned in order, so that the capacity check
+    reports it.
+    """
+    if cover_selection == "ordered":
+        return (photos, [])
+
+    capacities = {}
+    num_pixels = {}
+    for photo_name, photo in photos:
+        photo_size = getPhotoSize(photo_name, photo_sizes) or PixelChannels.getImageInfo(photo)
+        # The capacities hold whatever the position of a photo turns out to be
+        capacities[photo_name] = getPhotoCapacity(photo, PhotoHeaders.FIXED_HEADER_BIT_LENGTH, bits_per_channel, True, photo_size)
+        num_pixels[photo_name] = photo_size[0] * photo_size[1]
+
+    if cover_selection == "fewest_photos":
+        ranked_photos = sorted(photos, key=lambda photo: -capacities[photo[0]])
+    else:
+        ranked_photos = sorted(photos, key=lambda photo: (-capacities[photo[0]] / max(1, num_pixels[photo[0]]), -capacities[photo[0]]))
+
+    if num_bits is None:
+        return (ranked_photos, [])
 
-    if answer[0] != 'y' and answer[0] != 'Y':
-        print("No new images have been modified/saved. Goodbye.")
-        sys.exit(0)
+    # Photos that can't store anything are never worth using
+    ranked_photos = [photo for photo in ranked_photos if capacities[photo[0]] > 0]
 
-    print("***")
+    # The largest capacity among each photo and all photos ranked below it
+    remaining_capacities = [0] * (len(ranked_photos) + 1)
+    for i in range(len(ranked_photos) - 1, -1, -1):
+        remaining_capacities[i] = max(remaining_capacities[i + 1], capacities[ranked_photos[i][0]])
 
+    selected_photos = []
+    num_remaining_bits = num_bits
 
-def checkIfDataCanBeHidden(num_bits, path_to_input_photos):
+    for i, (photo_name, photo) in enumerate(ranked_photos):
+        # Once a single photo is able to hold the rest of the data, the one with the fewest pixels finishes it
+        if remaining_capacities[i] >= num_remaining_bits:
+            last_photo = min([photo for photo in ranked_photos[i:] if capacities[photo[0]] >= num_remaining_bits], key=lambda photo: (num_pixels[photo[0]], capacities[photo[0]]))
+            selected_photos.append(last_photo)
+            break
+
+        selected_photos.append((photo_name, photo))
+        num_remaining_bits -= capacities[photo_name]
+    else:
+        return (photos, [])
+
+    selected_names = set(photo_name for photo_name, photo in selected_photos)
+
+    return (selected_photos, [photo_name for photo_name, photo in photos if photo_name not in selected_names])
+
+
+def checkIfDataCanBeHidden(num_bits, photos, bits_per_channel=1, photo_sizes=None):
     """
     Checks to see if the number of bits to be hidden will be able to fit inside the specified set of photos.
     :param num_bits: The number of bits that have been requested to be hidden.
-    :param path_to_input_photos: The path to the photos, whose sizes will be calculated to see if the given
+    :param photos: The photos (tuples of name and photo), whose sizes will be calculated to see if the given
     number of bits can fit inside the given set of photos.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None to read them when needed.
     """
-    capacity = getMaxDataThatCanBeHidden(path_to_input_photos, num_bits)
+    capacity = getMaxDataThatCanBeHidden(photos, bits_per_channel, photo_sizes)
 
     # All data must be able to fit inside image(s)
     if num_bits > capacity:
-        print("Error - Not enough space is available to store requested data in specified photo(s).")
-        print("Your requested capacity: " + str(num_bits / 8) + " bytes.")
-        print("Maximum capacity allowed: " + str(capacity / 8) + " bytes.")
-        sys.exit(1)
+        raise CapacityError("Not enough space is available to store requested data in specified photo(s). Your requested capacity: " + str(num_bits / 8) + " bytes. Maximum capacity allowed: " + str(capacity / 8) + " bytes.")
     
     # Such an event would require roughly 2.3 million terabytes of data or more to be hidden... but you can never be too safe!!
     if num_bits >= 2 ** 64:
-        print("Sorry, but you are dealing with an astronomical amount of data. Unable to process.")
-        sys.exit(1)
+        raise CapacityError("Sorry, but you are dealing with an astronomical amount of data. Unable to process.")
 
 
-def getNumBitsAvailableToHide(photo_name, photo_ID_reserve_bits, total_bits_reserve_bits, first_image):
+def getNumBitsAvailableToHide(photo_name, photo, first_image, bits_per_channel=1, photo_size=None):
     """
     Gets the total number of bits that can be hidden inside of a given photo (Minus the reserve bits).
-    :param photo_name: The path to the photo that will be calculated.
-    :param photo_ID_reserve_bits: The total number of bits that must be reserved for the storage of the
-    photo identification number inside the given photo.
-    :param total_bits_reserve_bits: The total number of bits that must be reserved for the storage of the
-    total number of bits that will be hidden and stored in the set of photos. (These bits will only be 
-    hidden inside of the first image that gets processed.)
+    :param photo_name: The name of the photo that will be calculated.
+    :param photo: The path to the photo, or the photo itself.
     :param first_image: A boolean value indicating whether or not the given photo is recognized as the
     first image. 
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    (The reserve bits always use a single bit per channel value.)
+    :param photo_size: The size of the photo (see getPhotoSize), or None to read it from the photo.
     :return: The maximum number of bits of hidden data that the photo is able to store.
     """
-    # Path must lead to a png image
-    if not photo_name.lower().endswith('.png'):
-        print("Error - Only png images are supported for this application.")
-        print(str(os.path.basename(photo_name)) + " is not a png image.")
-        sys.exit(1)
+    capacity = getPhotoCapacity(photo, PhotoHeaders.FIXED_HEADER_BIT_LENGTH, bits_per_channel, first_image, photo_size)
 
-    image = Image.open(photo_name)
-    width, height = image.size
-    image.close()
+    # Super rare occurrence except for EXTREMELY small images (containing only a couple of pixels)
+    if capacity <= 0:
+        raise CapacityError("Image size for " + photo_name + " is way too small and is therefore unable to hide any data.")
+    
+    return capacity
 
-    pixel_count = width * height
 
-    # The first image must contain a bit extra data
-    if first_image:
-        val = pixel_count * 3 - 10 - photo_ID_reserve_bits - total_bits_reserve_bits
-    else:
-        val = pixel_count * 3 - 4 - photo_ID_reserve_bits
+def checkNumberOfPhotos(photos):
+    """
+    Makes sure that there are photos to hide data in, and not more than their identifier numbers can tell apart.
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every photo.
+    """
+    # There must exist at least one photo
+    if len(photos) == 0:
+        raise InvalidInputError("You do not have any photos listed.")
 
-    if val <= 0:
-        print("Error - Image size for " + str(os.path.basename(photo_name)) + " is way too small and is therefore unable to hide any data.")
-        sys.exit(1)
-    
-    return val
+    # Number of photos in path cannot exceed max number able to be stored in reserved bit space
+    if len(photos) >= 2 ** 16:
+        raise CapacityError("Too many photos. Max is " + str(2 ** 16 - 1))
 
 
-def getMaxDataThatCanBeHidden(path_to_input_photos, total_bits):
+def getMaxDataThatCanBeHidden(photos, bits_per_channel=1, photo_sizes=None):
     """
     Gets the maximum amount of data that can be hidden inside a given set of photos.
-    :param path_to_input_photos: The path to the folder containing the set of photos.
-    :param total_bits: The total number of bits of data that will be hidden (not including reserve bits).
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every photo.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None to read them when needed.
     :return: The maximum size of data (in bits) that can be hidden in the given set of photos.
     """
-    # Path must lead to a folder
-    if not os.path.isdir(path_to_input_photos):
-        print("Error - Specified path to folder containing photos does not lead to a folder.")
-        sys.exit(1)
-    
-    # Sometimes unwanted hidden files may appear, which we do not want
-    Miscellaneous_Helpers.removePotentialHiddenFiles(path_to_input_photos)
-
     max_allowed_bits = 0
-    num_photos_in_directory = len(os.listdir(path_to_input_photos))
 
-    # There must exist at least one photo
-    if num_photos_in_directory == 0:
-        print("Error - You do not have any photos listed.")
-        sys.exit(1)
-
-    # Number of photos in path cannot exceed max number able to be stored in reserved bit space
-    if num_photos_in_directory >= 2 ** 16:
-        print("Error - Too many photos. Max is " + str(2 ** 16) - 1)
-        sys.exit(1)
-    
-    # Calculate reserve bits
-    photo_ID_reserve_bits = Miscellaneous_Helpers.getNumBitsToReserve(num_photos_in_directory)
-    total_bits_reserve_bits = Miscellaneous_Helpers.getNumBitsToReserve(total_bits)
+    checkNumberOfPhotos(photos)
 
     first_image = True
-    for photo in os.listdir(path_to_input_photos):
-        photo_path = os.path.join(path_to_input_photos, photo)
-        num = getNumBitsAvailableToHide(photo_path, photo_ID_reserve_bits, total_bits_reserve_bits, first_image)
+    for photo_name, photo in photos:
+        max_allowed_bits += getNumBitsAvailableToHide(photo_name, photo, first_image, bits_per_channel, getPhotoSize(photo_name, photo_sizes))
         first_image = False
 
-        # Super rare occurrence except for EXTREMELY small images (containing only a couple of pixels)
-        if num < 1:
-            print("Error - Image size for " + str(photo) + " is way too small.")
-            sys.exit(1)
+    return max_allowed_bits
 
-        max_allowed_bits += num
 
-    return max_allowed_bits
+def getPhotoSize(photo_name, photo_sizes):
+    """
+    Looks up the size of a photo among sizes that have been read beforehand.
+    :param photo_name: The name of the photo.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None.
+    :return: A tuple containing the pixel width and height of the photo and the number of channel values per pixel,
+    or None if the size has to be read from the photo itself.
+    """
+    return photo_sizes.get(photo_name) if photo_sizes is not None else None
 
 
-def storeDataInPixels(data, w, h, i, image):
+def storeDataInPixels(data, i, channels):
     """
     Stores a specific set of bits inside of the pixels of a given image.
     :param data: The data, represented in bits, that is to be stored inside the image.
-    :param w: The current pixel width value to start storing data at.
-    :param h: The current pixel height value to start storing data at.
     :param i: The current index value, representing the number of bits that have currently 
     been stored so far in the given image.
-    :param image: The image object containing all the pixel data of the current image.
-    :return: A tuple containing the pixel width and height values, as well as the index i.
-    """
-    width, height = image.size
-
-    for j in range(len(data)):
-        if w >= width:
-            w = 0
-            h += 1
-            if h >= height:
-                print("Error - Image size is not large enough to store all initial necessary components.")
-                image.close()
-                sys.exit(1)
-    
-        rgb = list(image.getpixel((w, h)))
+    :param channels: The flat array containing all the pixel color values of the current image.
+    :return: The updated index value, i.
+    """
+    # All initial necessary components must fit inside the image
+    if i + len(data) > len(channels):
+        raise CapacityError("Image size is not large enough to store all initial necessary components.")
 
-        # If true, then the current lsb pixel value needs to be changed
-        if rgb[i%3] % 2 != data[j]:
-            if data[j] == 0:
-                rgb[i%3] -= 1
-            else:
-                rgb[i%3] += 1
+    return PixelChannels.storeBitsInChannels(channels, i, data.getBitArray())
 
-        image.putpixel((w, h), tuple(rgb))
 
-        i += 1
+def storeMainDataInPixels(data, i, channels, width, channels_per_pixel=3, bits_per_channel=1, first_image=False):
+    """
+    All actual data meant to get hidden is stored here.
+    :param data: The part of the data, represented in bits, that is to be stored inside the image.
+    :param i: The current index value, representing the number of bits that have currently been stored so far in
+    the given image (the reserve bits).
+    :param channels: The flat array containing all the pixel color values of the current image.
+    :param width: The pixel width of the current image.
+    :param channels_per_pixel: The number of channel values every pixel of the current image has.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param first_image: A boolean value indicating whether 'data' is the very start of the hidden data.
+    """
+    offset = PixelChannels.getPayloadOffset(i, width, channels_per_pixel)
 
-        # The RGB values for the current pixel have all been gone through and it's now time for the next pixel
-        if i % 3 == 0:
-            w += 1
-    
-    return (w, h, i)
+    # This error should never occur since the amount of data for each photo is planned in advance.
+    if len(data) > PixelChannels.getPayloadCapacity(max(0, len(channels) - offset), bits_per_channel, first_image):
+        raise CapacityError("Not all data was able to be hidden in the given photos.")
+
+    PixelChannels.storePayloadInChannels(channels, offset, data.getBitArray(), bits_per_channel, first_image)
 
 
-def storeMainDataInPixels(bits, val, w, h, i, image, path_to_processed_photos, image_name):
+def planPhotos(photos, num_bits, bits_per_channel=1, photo_sizes=None):
     """
-    All actual data meant to get hidden is stored here.
-    :param bits: The data, represented in bits, that is to be stored inside the image.
-    :param val: The total current index value, representing the TOTAL number of bits that have so far been stored 
-    in any previously processed photos from this session, minus the number of reserve bits for this photo.
-    :param w: The current pixel width value to start storing data at.
-    :param h: The current pixel height value to start storing data at.
-    :param i: The current index value, representing the number of bits that have currently been stored so far in
-    the given image.
-    :param image: The image object containing all the pixel data of the current image.
-    :param path_to_processed_photos: The path to the location to store all photos that have been processed.
-    :param image_name: The base name of the current photo being processed. The processed photo will have this
-    same name and will then be stored in 'path_to_processed_photos'.
-    :return: The new value of the current index value, i
-    """
-    width, height = image.size
-
-    # Go through potential remaining G/B values in current pixel to start with fresh new pixel
-    while i % 3 != 0:
-        if i + val >= len(bits):
-            image.save(os.path.join(path_to_processed_photos, image_name))
-            return i
-        
-        rgb = list(image.getpixel((w, h)))
-
-        if rgb[i%3] % 2 != bits[i + val]:
-            if bits[i + val] == 0:
-                rgb[i%3] -= 1
-            else:
-                rgb[i%3] += 1
-        
-        image.putpixel((w, h), tuple(rgb))
-        
-        i += 1
-    
-    w += 1
-
-    # Go through all remaining pixels in photo (or until all data has been stored)
-    for h in range(h, height):
-        for w in range(w, width):
-            for j in range(3):
-                if i + val >= len(bits):
-                    image.save(os.path.join(path_to_processed_photos, image_name))
-                    return i
-
-                rgb = list(image.getpixel((w, h)))
-
-                if rgb[i%3] % 2 != bits[i + val]:
-                    if bits[i + val] == 0:
-                        rgb[i%3] -= 1
-                    else:
-                        rgb[i%3] += 1
-        
-                image.putpixel((w, h), tuple(rgb))
-                
-                i += 1
-        w = 0
-    
-    return i
+    Decides which part of the data gets hidden in which photo, before any photo is processed. Photos are used in
+    the order they are listed in, and each one is filled up completely before moving on to the next one.
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every
+    photo that can be used to hide the data.
+    :param num_bits: The total number of bits of data that will be hidden (not including reserve bits).
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param photo_sizes: The sizes of the photos (see PhotoSizes.getPhotoSizes), or None to read them when needed.
+    :return: A tuple containing the list of photos to be processed and the list of names of the photos that are not
+    needed. Every photo to be processed is a tuple of its name, the photo (its path, or the photo itself), its
+    reserve bits, the index of the first bit of data it stores and the number of bits of data it stores.
+    """
+    photo_plans = []
+    unused_photos = []
+
+    bit_index = 0
+    for photo_name, photo in photos:
+        # If true, then all data will be hidden in all previous photo(s) and any remaining photos will not be needed when extracting data.
+        if bit_index >= num_bits:
+            unused_photos.append(photo_name)
+            continue
+
+        capacity = getPhotoCapacity(photo, PhotoHeaders.FIXED_HEADER_BIT_LENGTH, bits_per_channel, bit_index == 0, getPhotoSize(photo_name, photo_sizes))
+        num_photo_bits = min(num_bits - bit_index, capacity)
+
+        # The setting for the number of bits per channel value is only found if the first photo holds all of it
+        if bit_index == 0 and bits_per_channel > 1 and num_photo_bits < min(num_bits, PixelChannels.PREAMBLE_BIT_LENGTH):
+            raise CapacityError("Image size for " + photo_name + " is too small to be the first photo when using more than one bit per channel value.")
+
+        photo_plans.append((photo_name, photo, bit_index, num_photo_bits))
+        bit_index += num_photo_bits
+
+    # This error should never occur but is checked just in case.
+    if bit_index < num_bits:
+        raise CapacityError("Not all data was able to be hidden in the given photos. If this error occurs, something went wrong and the process was unsuccessful")
+
+    # Every photo records the whole set along with its own part of the data, which is only known once all photos are planned
+    set_id = PhotoHeaders.createSetId()
+    photo_plans = [(photo_name, photo, PhotoHeaders.createFixedHeader(set_id, bits_per_channel, photo_num, bit_index, num_photo_bits, len(photo_plans), num_bits), bit_index, num_photo_bits) for photo_num, (photo_name, photo, bit_index, num_photo_bits) in enumerate(photo_plans)]
+
+    return (photo_plans, unused_photos)
+
+
+def getPhotoCapacity(photo, header_length, bits_per_channel=1, first_image=False, photo_size=None):
+    """
+    Gets the number of bits of data a photo is able to store, without decoding its pixels.
+    :param photo: The path to the photo, or the photo itself.
+    :param header_length: The number of reserve bits stored at the start of the photo.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param first_image: A boolean value indicating whether the photo stores the very start of the data.
+    :param photo_size: The size of the photo (see getPhotoSize), or None to read it from the photo.
+    :return: The number of bits of data the photo is able to store.
+    """
+    width, height, channels_per_pixel = photo_size if photo_size is not None else PixelChannels.getImageInfo(photo)
+
+    # Whatever is left over after the reserve bits (and the pixel alignment that follows them) can store data
+    payload_offset = PixelChannels.getPayloadOffset(header_length, width, channels_per_pixel)
+    num_channels = max(0, width * height * channels_per_pixel - payload_offset)
 
-def hideDataInPhoto(bits, current_index, photo, photo_ID, total_bits, first_image, path_to_processed_photos):
+    return PixelChannels.getPayloadCapacity(num_channels, bits_per_channel, first_image)
+
+
+def hideDataInPhoto(photo, header, data, processed_photo_path, bits_per_channel=1, first_image=False, photo_name=None, instrumentation=None, png_profile="balanced"):
     """
-    Hides all data needed to be hidden in the current given photo.
-    :param bits: The data, represented in bits, that is to be stored inside the image.
-    :param current_index: The total current index value, representing the TOTAL number of bits that have so far been stored 
-    in any previously processed photos from this session.
+    Hides all data needed to be hidden in the current given photo and saves the processed photo. (This function
+    runs on its own in a separate process when photos are processed in parallel.)
     :param photo: The path to the current photo to be processed.
-    :param photo_ID: The photo ID number (in bit format) that will be stored in the current photo to be processed. 
-    :param total_bits: The total number of bits of data that will be hidden (not including reserve bits).
-    :param first_image: A boolean value indicating whether or not the given photo is recognized as the
-    first image. 
-    :param path_to_processed_photos: The path to the location to store all photos that have been processed.
-    :return: The start of the next current bit index for the next potential photo to be processed.
+    :param header: The reserve bits (see PhotoHeaders.createFixedHeader) that will be stored at the start of the photo.
+    :param data: The part of the data, represented in bits, that is to be stored inside the photo.
+    :param processed_photo_path: The path the processed photo gets saved to.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param first_image: A boolean value indicating whether 'data' is the very start of the hidden data.
+    :param photo_name: The name of the photo, which its measurements are recorded under.
+    :param instrumentation: The Instrumentation measuring the stages of processing the photo, or None.
+    :param png_profile: The png encoding profile the processed photo is saved with (see PixelChannels.PNG_PROFILES).
+    :return: The list of events recorded by 'instrumentation' (empty if None).
     """
-    image = Image.open(photo)
+    if instrumentation is None:
+        instrumentation = Instrumentation.Instrumentation(measure=False)
 
-    print("Currently hiding data in photo " + str(os.path.basename(photo)) + "  (" + str((current_index * 1000 // len(bits)) / 10) + "% complete)")
+    image = embedDataInPhoto(photo, header, data, bits_per_channel, first_image, photo_name, instrumentation)
 
-    # Convert the image to RGB color mode if needed
-    if image.mode != "RGB":
-        image = image.convert("RGB")
+    # The photo is encoded exactly once, straight into its file
+    with instrumentation.stage("encode", len(image.getbands()) * image.width * image.height, photo_name) as stage:
+        stage["png_profile"] = png_profile
+        stage["output_bytes"] = PixelChannels.saveImageAsPng(image, processed_photo_path, png_profile)
+
+    return instrumentation.events
 
-    total_reserve_bits = 4 + len(photo_ID) if not first_image else 10 + len(photo_ID) + len(total_bits)
-    
-    width, height = image.size
 
-    w = 0
-    h = 0
+def embedDataInPhoto(photo, header, data, bits_per_channel=1, first_image=False, photo_name=None, instrumentation=None):
+    """
+    Creates a copy of a photo that has its part of the data hidden inside of it.
+    :param photo: The path to the photo, or the photo itself.
+    :param header: The reserve bits (see PhotoHeaders.createFixedHeader) that will be stored at the start of the photo.
+    :param data: The part of the data, represented in bits, that is to be stored inside the photo.
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param first_image: A boolean value indicating whether 'data' is the very start of the hidden data.
+    :param photo_name: The name of the photo, which its measurements are recorded under.
+    :param instrumentation: The Instrumentation measuring the 'decode' and 'embed' stages, or None.
+    :return: The processed image object, which keeps the transparent color of the photo (if any).
+    """
+    if instrumentation is None:
+        instrumentation = Instrumentation.Instrumentation(measure=False)
 
-    i = 0
+    with instrumentation.stage("decode", 0, photo_name) as stage:
+        channels, width, height, mode = PixelChannels.readImageChannels(photo)
+        transparency = PixelChannels.getImageTransparency(photo)
+        stage["bytes"] = len(channels)
 
-    # Store number of bits to reserve for photo ID num (minus one)
-    bit_ID_length = DecimalBitConverters.convertDecimalToBits(len(photo_ID) - 1, 4)
-    w, h, i = storeDataInPixels(bit_ID_length, w, h, i, image)
+    # Embedding includes expanding the data into one value per bit
+    with instrumentation.stage("embed", (len(data) + 7) // 8, photo_name):
+        # Store the header (see PhotoHeaders.createFixedHeader)
+        i = storeDataInPixels(header, 0, channels)
 
-    # Store photo ID num
-    w, h, i = storeDataInPixels(photo_ID, w, h, i, image)
-    
-    # Storing total number of bits to be stored is only done in the first photo
-    if first_image:
-        # Store number of bits to reserve for total num of bits (minus one)
-        bit_total_bits_length = DecimalBitConverters.convertDecimalToBits(len(total_bits) - 1, 6)
-        w, h, i = storeDataInPixels(bit_total_bits_length, w, h, i, image)
-        
-        # Store number of total bits to be stored
-        w, h, i = storeDataInPixels(total_bits, w, h, i, image)
-    
-    # Now we can store all hidden data! Hooray!
-    val = current_index - total_reserve_bits
-    i = storeMainDataInPixels(bits, val, w, h, i, image, path_to_processed_photos, os.path.basename(photo))
-    
-    image.save(os.path.join(path_to_processed_photos, os.path.basename(photo)))
-    
-    return i + val
\ No newline at end of file
+        # Now we can store all hidden data! Hooray!
+        storeMainDataInPixels(data, i, channels, width, Image.getmodebands(mode), bits_per_channel, first_image)
+
+    return PixelChannels.createImageFromChannelArray(channels, width, height, mode, transparency)
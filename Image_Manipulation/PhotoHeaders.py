@@ -0,0 +1,223 @@
+from Data_Converters import DecimalBitConverters, Miscellaneous_Helpers
+from Data_Converters.BitStream import BitReader, BitStream
+from Data_Converters.StegoErrors import CorruptDataError, InvalidPhotoSetError
+from Image_Manipulation import PixelChannels
+from PIL import Image
+import numpy
+import collections, concurrent.futures, os, struct, zlib
+
+
+# Every photo processed by this version of the program starts with a fixed size header (stored in the least
+# significant bit of its first channel values): the magic number, the header version, flags, the number of bits per
+# channel value used for storing the data, the photo identifier number, the number of photos in the set, the
+# identifier of the set (a random number picked every time data gets hidden), the index of the first bit of data
+# held by the photo, the number of bits of data it holds and the total number of bits of data, followed by a CRC-32
+# of all of them. The magic number lets photos that don't belong to a set be told apart after reading just a few
+# pixels, and every photo describes its own part of the data, so that it can be read without any other photo.
+HEADER_MAGIC = b"HDPH"
+HEADER_VERSION = 1
+FIXED_HEADER_FORMAT = ">4sBBBHHQQQQ"
+FIXED_HEADER_LENGTH = struct.calcsize(FIXED_HEADER_FORMAT) + 4
+FIXED_HEADER_BIT_LENGTH = FIXED_HEADER_LENGTH * 8
+
+# Flag set in headers that hold the number of photos and the total size of the data. Photo 0 always holds them,
+# other photos only if both were known when the photo was processed (i.e. not while the data was being compressed).
+SET_INFO_FLAG = 1
+
+# Largest possible number of reserve bits in an image processed by older versions of this program (ID length, ID,
+# total size length and total size)
+MAX_HEADER_BIT_LENGTH = 4 + 16 + 6 + 64
+
+# Number of channel values at the start of an image that always hold its header
+MAX_HEADER_CHANNEL_COUNT = max(FIXED_HEADER_BIT_LENGTH, MAX_HEADER_BIT_LENGTH)
+
+# Number of photos whose headers get read at the same time
+HEADER_READING_THREADS = 8
+
+
+# Everything stored in the reserve bits (header) of a processed photo, along with what is needed to locate its data.
+# 'photo' is the path to the photo, or the photo itself if it is held in memory (see PixelChannels.openImage).
+# The total size is always stored in the photo with identifier number 0 and is None for photos not holding it (see
+# SET_INFO_FLAG). 'header_version' is 0 for the variable length headers of older versions of this program (see
+# readLegacyHeader), which store neither the number of photos, the set identifier nor which part of the data a photo
+# holds (these are None then), and don't have the length fields of the variable length header (these are None
+# otherwise). Older versions always stored a single bit per channel value.
+PhotoHeader = collections.namedtuple("PhotoHeader", [
+    "name", "photo", "image_num", "ID_length", "total_size_length", "total_bit_data_size", "payload_offset", "width", "height",
+    "channels_per_pixel", "bits_per_channel", "header_version", "num_photos", "bit_index", "num_photo_bits", "set_id"
+])
+
+
+def readPhotoHeader(photo_name, photo):
+    """
+    Decodes all reserve bits of a photo in a single pass over the image. Only the first rows of the image, which
+    hold the reserve bits, get decoded.
+    :param photo_name: The name of the processed photo.
+    :param photo: The path to the processed photo, or the photo itself.
+    :return: The PhotoHeader of the photo.
+    """
+    channels, width, height, mode = PixelChannels.readImageChannels(photo, MAX_HEADER_CHANNEL_COUNT)
+    channels_per_pixel = Image.getmodebands(mode)
+
+    fixed_header = numpy.packbits(PixelChannels.readBitsFromChannels(channels, 0, FIXED_HEADER_BIT_LENGTH)).tobytes()
+    if len(fixed_header) > len(HEADER_MAGIC) and fixed_header.startswith(HEADER_MAGIC):
+        return readFixedHeader(photo_name, photo, fixed_header, channels, width, height, channels_per_pixel)
+
+    return readLegacyHeader(photo_name, photo, channels, width, height, channels_per_pixel)
+
+
+def readFixedHeader(photo_name, photo, fixed_header, channels, width, height, channels_per_pixel):
+    """
+    Decodes the fixed size header of a photo processed by this version of the program.
+    :param photo_name: The name of the processed photo.
+    :param photo: The path to the processed photo, or the photo itself.
+    :param fixed_header: The bytes stored at the start of the photo (as many as the header takes up), starting with
+    the magic number.
+    :param channels: The flat array of (at least the first) channel values of the photo.
+    :param width: The pixel width of the photo.
+    :param height: The pixel height of the photo.
+    :param channels_per_pixel: The number of channel values every pixel of the photo has.
+    :return: The PhotoHeader of the photo.
+    """
+    version = fixed_header[len(HEADER_MAGIC)]
+
+    if version > HEADER_VERSION:
+        raise CorruptDataError("Image " + photo_name + " has been processed by a newer version of this program (header version " + str(version) + ").")
+
+    if version != HEADER_VERSION or len(fixed_header) < FIXED_HEADER_LENGTH:
+        raise CorruptDataError("The header of image " + photo_name + " is damaged.")
+
+    fields = fixed_header[:FIXED_HEADER_LENGTH - 4]
+
+    if struct.unpack(">I", fixed_header[FIXED_HEADER_LENGTH - 4:FIXED_HEADER_LENGTH])[0] != zlib.crc32(fields):
+        raise CorruptDataError("The header of image " + photo_name + " is damaged.")
+
+    magic, version, flags, bits_per_channel, image_num, num_photos, set_id, bit_index, num_photo_bits, total_bit_data_size = struct.unpack(FIXED_HEADER_FORMAT, fields)
+
+    if not flags & SET_INFO_FLAG:
+        num_photos = None
+        total_bit_data_size = None
+
+    payload_offset = PixelChannels.getPayloadOffset(FIXED_HEADER_BIT_LENGTH, width, channels_per_pixel)
+
+    return PhotoHeader(photo_name, photo, image_num, None, None, total_bit_data_size, payload_offset, width, height, channels_per_pixel, bits_per_channel, version, num_photos, bit_index, num_photo_bits, set_id)
+
+
+def readLegacyHeader(photo_name, photo, channels, width, height, channels_per_pixel):
+    """
+    Decodes the variable length header of a photo processed by an older version of this program.
+    :param photo_name: The name of the processed photo.
+    :param photo: The path to the processed photo, or the photo itself.
+    :param channels: The flat array of (at least the first) channel values of the photo.
+    :param width: The pixel width of the photo.
+    :param height: The pixel height of the photo.
+    :param channels_per_pixel: The number of channel values every pixel of the photo has.
+    :return: The PhotoHeader of the photo.
+    """
+    reader = BitReader(BitStream.fromBitArray(PixelChannels.readBitsFromChannels(channels, 0, MAX_HEADER_BIT_LENGTH)))
+
+    # Extract the length, in bits, of the current photo ID number, followed by the actual photo ID num
+    ID_length = 1 + DecimalBitConverters.convertBitsToDecimal(getPixelVals(4, reader, photo_name))
+    image_num = DecimalBitConverters.convertBitsToDecimal(getPixelVals(ID_length, reader, photo_name))
+
+    total_size_length = None
+    total_bit_data_size = None
+
+    # The total number of bits that are hidden (and the length of that number) are only stored in the first photo
+    if image_num == 0:
+        total_size_length = 1 + DecimalBitConverters.convertBitsToDecimal(getPixelVals(6, reader, photo_name))
+        total_bit_data_size = DecimalBitConverters.convertBitsToDecimal(getPixelVals(total_size_length, reader, photo_name))
+
+    payload_offset = PixelChannels.getPayloadOffset(reader.position, width, channels_per_pixel)
+
+    return PhotoHeader(photo_name, photo, image_num, ID_length, total_size_length, total_bit_data_size, payload_offset, width, height, channels_per_pixel, 1, 0, None, None, None, None)
+
+
+def createFixedHeader(set_id, bits_per_channel, image_num, bit_index, num_photo_bits, num_photos=None, total_bit_data_size=None):
+    """
+    Creates the fixed size header that gets stored at the very start of a photo (see readFixedHeader).
+    :param set_id: The identifier of the set of photos (see createSetId).
+    :param bits_per_channel: The number of least significant bits of every channel value used for storing data.
+    :param image_num: The identifier number of the photo.
+    :param bit_index: The index of the first bit of data held by the photo.
+    :param num_photo_bits: The number of bits of data held by the photo.
+    :param num_photos: The number of photos in the set, or None if it isn't known yet (in which case neither is
+    the total size).
+    :param total_bit_data_size: The total number of bits of data hidden in the set of photos.
+    :return: The header, as a BitStream of FIXED_HEADER_BIT_LENGTH bits.
+    """
+    flags = SET_INFO_FLAG if num_photos is not None else 0
+    fields = struct.pack(FIXED_HEADER_FORMAT, HEADER_MAGIC, HEADER_VERSION, flags, bits_per_channel, image_num, num_photos or 0, set_id, bit_index, num_photo_bits, total_bit_data_size or 0)
+
+    return BitStream(fields + struct.pack(">I", zlib.crc32(fields)))
+
+
+def createSetId():
+    """
+    Picks the identifier shared by all photos that data gets hidden in at once, telling them apart from the photos
+    of any other time data has been hidden.
+    :return: A random 64 bit number.
+    """
+    return int.from_bytes(os.urandom(8), 'big')
+
+
+def getPixelVals(length, reader, photo_name):
+    """
+    Gets the next image pixel least significant bit values from the reserve bits of an image.
+    :param length: The number of pixel value bits to extract from the given image.
+    :param reader: The BitReader over the reserve bits of the image, which keeps track of how many bits have been
+    gone over so far.
+    :param photo_name: The name of the photo whose pixel lsb values are being extracted and stored.
+    :return: The extracted bits, stored in a BitStream.
+    """
+    try:
+        return reader.readBits(length)
+    except EOFError:
+        raise InvalidPhotoSetError("Invalid image for data extraction. Image " + photo_name + " is too small and therefore could've never stored any data in the first place.")
+
+
+def getPhotoHeader(photo_name, photo, header_cache=None):
+    """
+    Gets the PhotoHeader of a photo, using the header cache if the photo has not changed since it was last decoded.
+    :param photo_name: The name of the processed photo.
+    :param photo: The path to the processed photo, or the photo itself (which is never cached).
+    :param header_cache: A dictionary loaded with Miscellaneous_Helpers.loadFileCache, or None if no cache is used.
+    Newly decoded headers are added to it.
+    :return: The PhotoHeader of the photo.
+    """
+    if header_cache is None or not isinstance(photo, str):
+        return readPhotoHeader(photo_name, photo)
+
+    cached_header = Miscellaneous_Helpers.getCachedValue(header_cache, photo, "header", len(PhotoHeader._fields) - 2)
+    if cached_header is not None:
+        return PhotoHeader(photo_name, photo, *cached_header)
+
+    header = readPhotoHeader(photo_name, photo)
+    Miscellaneous_Helpers.cacheValue(header_cache, photo, "header", list(header[2:]))
+
+    return header
+
+
+def getPhotoHeaders(photos, header_cache=None, num_threads=HEADER_READING_THREADS):
+    """
+    Gets the PhotoHeader of every photo in a set, reading the headers of several photos at the same time. Every
+    header describes its photo on its own, so the order they are read in doesn't matter.
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every photo.
+    :param header_cache: A dictionary loaded with Miscellaneous_Helpers.loadFileCache, or None if no cache is used
+    (see getPhotoHeader).
+    :param num_threads: The number of photos whose headers get read at the same time.
+    :return: A list containing, in the order of 'photos', the PhotoHeader of every photo or the InvalidPhotoSetError
+    raised for a photo whose header can't be read.
+    """
+    def getHeaderOrError(photo_name, photo):
+        try:
+            return getPhotoHeader(photo_name, photo, header_cache)
+        except InvalidPhotoSetError as e:
+            return e
+
+    if len(photos) <= 1:
+        return [getHeaderOrError(photo_name, photo) for photo_name, photo in photos]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(num_threads, len(photos)))) as executor:
+        return list(executor.map(getHeaderOrError, *zip(*photos)))
+
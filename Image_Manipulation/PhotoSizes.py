@@ -0,0 +1,73 @@
+from Data_Converters import Miscellaneous_Helpers
+from Image_Manipulation import PixelChannels
+import concurrent.futures
+
+
+# Number of photos whose sizes get read at the same time. Reading a size only takes a few small reads from the
+# start of the file, so the time is spent waiting on the disk rather than computing.
+SIZE_READING_THREADS = 16
+
+
+def getPhotoSizes(photos, size_cache_path=None, num_threads=SIZE_READING_THREADS):
+    """
+    Gets the size of every photo in a set, as needed for planning how much data fits into them. Sizes of png photos
+    are read straight from their headers (see PixelChannels.readPngInfo), several photos at the same time.
+    :param photos: A list containing a tuple of the name and the photo (its path, or the photo itself) for every photo.
+    :param size_cache_path: The path to a file caching the sizes of photos between runs, or None. A cached size is
+    used as long as the photo's modification time and file size are unchanged.
+    :param num_threads: The number of photos whose sizes get read at the same time.
+    :return: A dictionary mapping the name of every photo to a tuple of its pixel width and height and the number of
+    channel values per pixel (see PixelChannels.getImageInfo).
+    """
+    size_cache = Miscellaneous_Helpers.loadFileCache(size_cache_path) if size_cache_path is not None else None
+    photo_sizes = {}
+    missing_photos = []
+
+    for photo_name, photo in photos:
+        photo_size = getCachedPhotoSize(photo, size_cache)
+
+        if photo_size is None:
+            missing_photos.append((photo_name, photo))
+        else:
+            photo_sizes[photo_name] = photo_size
+
+    if len(missing_photos) > 0:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, min(num_threads, len(missing_photos)))) as executor:
+            read_sizes = executor.map(PixelChannels.getImageInfo, [photo for photo_name, photo in missing_photos])
+
+            for (photo_name, photo), photo_size in zip(missing_photos, read_sizes):
+                photo_sizes[photo_name] = photo_size
+                cachePhotoSize(photo, photo_size, size_cache)
+
+        if size_cache is not None:
+            Miscellaneous_Helpers.saveFileCache(size_cache_path, size_cache)
+
+    return photo_sizes
+
+
+def getCachedPhotoSize(photo, size_cache):
+    """
+    Looks up the size of a photo in the size cache.
+    :param photo: The path to the photo, or the photo itself (which is never cached).
+    :param size_cache: A dictionary loaded with Miscellaneous_Helpers.loadFileCache, or None if no cache is used.
+    :return: The cached size of the photo (see getPhotoSizes), or None if it has to be read.
+    """
+    if size_cache is None or not isinstance(photo, str):
+        return None
+
+    photo_size = Miscellaneous_Helpers.getCachedValue(size_cache, photo, "photo_size", 3)
+
+    return tuple(photo_size) if photo_size is not None else None
+
+
+def cachePhotoSize(photo, photo_size, size_cache):
+    """
+    Adds the size of a photo that has just been read to the size cache.
+    :param photo: The path to the photo, or the photo itself (which is never cached).
+    :param photo_size: The size of the photo (see getPhotoSizes).
+    :param size_cache: The dictionary of cached sizes, or None if no cache is used.
+    """
+    if size_cache is None or not isinstance(photo, str):
+        return
+
+    Miscellaneous_Helpers.cacheValue(size_cache, photo, "photo_size", list(photo_size))
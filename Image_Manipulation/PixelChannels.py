@@ -0,0 +1,542 @@
+from Data_Converters import ArchiveFormat
+from Data_Converters.StegoErrors import InvalidInputError, InvalidSettingError
+from PIL import Image
+import numpy
+import io, struct, zlib
+
+
+# The archive preamble at the start of the data is always stored using one bit per channel value
+PREAMBLE_BIT_LENGTH = ArchiveFormat.PREAMBLE_LENGTH * 8
+
+# Color modes whose 8 bit channel values are used for storing data just as they are
+NATIVE_MODES = ("L", "LA", "RGB", "RGBA")
+
+# The first bytes of every png file
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Number of channel values per pixel of every png color type (see readPngInfo): grayscale, RGB, palette,
+# grayscale with alpha and RGB with alpha
+PNG_COLOR_TYPE_CHANNELS = {0: 1, 2: 3, 3: 3, 4: 2, 6: 4}
+
+# Number of samples per pixel stored in the scanlines of every png color type (a palette index is a single sample)
+PNG_COLOR_TYPE_SAMPLES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+# Number of bytes of png data read at a time when only the first rows of an image are decoded
+PNG_READ_SIZE = 2 ** 16
+
+# Options passed to Pillow for saving processed photos, trading encoding speed for file size. Pillow picks the
+# filter of every row itself; 'optimize' makes it search harder for the smallest output. 'balanced' is Pillow's
+# own default. (Hidden data lives in the pixels, so every profile produces the same pixels.)
+PNG_PROFILES = {
+    "fast": {"compress_level": 1},
+    "balanced": {"compress_level": 6},
+    "smallest": {"compress_level": 9, "optimize": True},
+}
+
+
+def getInMemoryPhotos(images):
+    """
+    Checks a list of photos that are held in memory and gives every one of them a name for messages ('#' followed
+    by its index in the list).
+    :param images: A list of photos, each one a PIL Image, a NumPy array (uint8, of shape (height, width) or
+    (height, width, channels) with 2 to 4 channels) or the encoded bytes of a png image.
+    :return: A list containing a tuple of the name and the photo itself for every photo.
+    """
+    photos = []
+
+    for i, image in enumerate(images):
+        name = "#" + str(i)
+
+        if isinstance(image, numpy.ndarray):
+            if image.dtype != numpy.uint8 or not (image.ndim == 2 or (image.ndim == 3 and image.shape[2] in (2, 3, 4))):
+                raise InvalidInputError("Array for photo " + name + " must be of type uint8 and have 1 to 4 channels.")
+        elif isinstance(image, (bytes, bytearray)):
+            if bytes(image[:len(PNG_SIGNATURE)]) != PNG_SIGNATURE:
+                raise InvalidInputError("Only png images are supported for this application. The data of photo " + name + " is not a png image.")
+        elif not isinstance(image, Image.Image):
+            raise InvalidInputError("Photo " + name + " is not a PIL image, a NumPy array or the data of a png image.")
+
+        photos.append((name, image))
+
+    return photos
+
+
+def openImage(photo):
+    """
+    Opens a photo, which is either stored in a file or held in memory (see getInMemoryPhotos).
+    :param photo: The path to the photo, or the photo itself.
+    :return: The image object. Unless it is 'photo' itself, it should be closed once it is no longer needed.
+    """
+    if isinstance(photo, Image.Image):
+        return photo
+
+    if isinstance(photo, numpy.ndarray):
+        return Image.fromarray(photo)
+
+    if isinstance(photo, (bytes, bytearray)):
+        return Image.open(io.BytesIO(photo))
+
+    return Image.open(photo)
+
+
+def getImageInfo(photo):
+    """
+    Gets the size of a photo without decoding its pixels.
+    :param photo: The path to the photo, or the photo itself.
+    :return: A tuple containing the pixel width and height of the photo and the number of channel values per pixel.
+    """
+    # Photos stored in png files don't even need to be opened by Pillow
+    if isinstance(photo, str):
+        png_info = readPngInfo(photo)
+
+        if png_info is not None:
+            return png_info
+
+    image = openImage(photo)
+    width, height = image.size
+    channels_per_pixel = getChannelsPerPixel(image)
+
+    if image is not photo:
+        image.close()
+
+    return (width, height, channels_per_pixel)
+
+
+def readPngInfo(photo_path):
+    """
+    Gets the size of a png photo straight from its header chunk (IHDR), without Pillow. For the few kinds of png
+    whose storage mode (see getStorageMode) depends on transparency, the chunks up to the image data are looked at
+    as well.
+    :param photo_path: The path to the photo.
+    :return: A tuple containing the pixel width and height of the photo and the number of channel values per pixel
+    (see getImageInfo), or None if the file is not a png that can be read this way.
+    """
+    with open(photo_path, 'rb') as photo_file:
+        if photo_file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            return None
+
+        chunk_length, chunk_type = struct.unpack(">I4s", photo_file.read(8))
+        if chunk_type != b"IHDR" or chunk_length != 13:
+            return None
+
+        width, height, bit_depth, color_type = struct.unpack(">IIBB", photo_file.read(10))
+        if color_type not in PNG_COLOR_TYPE_CHANNELS:
+            return None
+
+        has_transparency = False
+
+        # Only some kinds of png gain an alpha channel if they have transparency (see getPngChannelsPerPixel)
+        if getPngChannelsPerPixel(color_type, bit_depth, False) != getPngChannelsPerPixel(color_type, bit_depth, True):
+            photo_file.seek(len(PNG_SIGNATURE) + 8 + chunk_length + 4)
+
+            while True:
+                chunk_header = photo_file.read(8)
+                if len(chunk_header) < 8:
+                    return None
+
+                chunk_length, chunk_type = struct.unpack(">I4s", chunk_header)
+                if chunk_type in (b"IDAT", b"IEND"):
+                    break
+                if chunk_type == b"tRNS":
+                    has_transparency = True
+                    break
+
+                photo_file.seek(chunk_length + 4, io.SEEK_CUR)
+
+    return (width, height, getPngChannelsPerPixel(color_type, bit_depth, has_transparency))
+
+
+def getPngChannelsPerPixel(color_type, bit_depth, has_transparency):
+    """
+    Gets the number of channel values per pixel that a png image is worked on with (see getStorageMode).
+    :param color_type: The color type stored in the header chunk (IHDR) of the png.
+    :param bit_depth: The bit depth stored in the header chunk of the png.
+    :param has_transparency: Whether the png has a transparency chunk (tRNS).
+    :return: The number of channel values per pixel.
+    """
+    # Pillow opens 16 bit grayscale photos with alpha as RGBA
+    if color_type == 4 and bit_depth == 16:
+        return 4
+
+    # Palette based photos, and grayscale photos that Pillow doesn't open as 8 bit grayscale, gain an alpha channel
+    # if they have transparency
+    if has_transparency and (color_type == 3 or (color_type == 0 and bit_depth in (1, 16))):
+        return PNG_COLOR_TYPE_CHANNELS[color_type] + 1
+
+    return PNG_COLOR_TYPE_CHANNELS[color_type]
+
+
+def readLeadingPngRows(photo, num_channels):
+    """
+    Inflates the rows of a png image one after another, stopping as soon as the rows read hold at least the given
+    number of channel values, so that reading the start of an image costs only the rows that are actually needed.
+    The rows are returned as a png image of their own, which Pillow decodes just like the full image (the rows at
+    the top of an image never depend on the rows below them).
+    :param photo: The path to the png image, or its encoded data.
+    :param num_channels: The number of channel values (see getStorageMode) needed from the start of the image.
+    :return: A tuple containing the data of a png image made of the leading rows of the image and the pixel width
+    and height of the full image, or None if the whole image has to be decoded anyway (e.g. it is interlaced, so
+    its rows aren't stored in order, or all of its rows are needed).
+    """
+    with (open(photo, 'rb') if isinstance(photo, str) else io.BytesIO(photo)) as png_file:
+        if png_file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+            return None
+
+        header = None
+        has_transparency = False
+        other_chunks = []
+
+        # Every chunk up to the image data (e.g. the palette) is kept for the png holding the leading rows
+        while True:
+            chunk_header = png_file.read(8)
+            if len(chunk_header) < 8:
+                return None
+
+            chunk_length, chunk_type = struct.unpack(">I4s", chunk_header)
+            if chunk_type in (b"IDAT", b"IEND"):
+                break
+
+            chunk = png_file.read(chunk_length + 4)
+            if len(chunk) < chunk_length + 4:
+                return None
+
+            if chunk_type == b"IHDR":
+                header = chunk[:chunk_length]
+                continue
+
+            has_transparency = has_transparency or chunk_type == b"tRNS"
+            other_chunks.append(chunk_header + chunk)
+
+        if chunk_type != b"IDAT" or header is None or len(header) != 13:
+            return None
+
+        width, height, bit_depth, color_type, compression_method, filter_method, interlace_method = struct.unpack(">IIBBBBB", header)
+        if interlace_method != 0 or color_type not in PNG_COLOR_TYPE_CHANNELS or width == 0:
+            return None
+
+        channels_per_row = width * getPngChannelsPerPixel(color_type, bit_depth, has_transparency)
+        num_rows = (num_channels + channels_per_row - 1) // channels_per_row
+        if num_rows >= height:
+            return None
+
+        # Every row starts with the byte holding its filter type
+        row_length = 1 + (width * PNG_COLOR_TYPE_SAMPLES[color_type] * bit_depth + 7) // 8
+        num_row_bytes = max(1, num_rows) * row_length
+
+        decompressor = zlib.decompressobj()
+        rows = bytearray()
+
+        while len(rows) < num_row_bytes:
+            # The image data may be split up into any number of chunks, of any size
+            while chunk_length > 0 and len(rows) < num_row_bytes:
+                data = png_file.read(min(chunk_length, PNG_READ_SIZE))
+                if len(data) == 0:
+                    return None
+
+                chunk_length -= len(data)
+                rows += decompressor.decompress(data, num_row_bytes - len(rows))
+
+            if len(rows) >= num_row_bytes:
+                break
+
+            png_file.read(4)
+            chunk_header = png_file.read(8)
+            if len(chunk_header) < 8:
+                return None
+
+            chunk_length, chunk_type = struct.unpack(">I4s", chunk_header)
+            if chunk_type != b"IDAT":
+                return None
+
+    leading_header = struct.pack(">IIBBBBB", width, max(1, num_rows), bit_depth, color_type, compression_method, filter_method, 0)
+    png_data = PNG_SIGNATURE + createPngChunk(b"IHDR", leading_header) + b"".join(other_chunks)
+    png_data += createPngChunk(b"IDAT", zlib.compress(bytes(rows), 0)) + createPngChunk(b"IEND", b"")
+
+    return (png_data, width, height)
+
+
+def createPngChunk(chunk_type, data):
+    """
+    Encodes a single png chunk.
+    :param chunk_type: The four byte type of the chunk.
+    :param data: The data of the chunk.
+    :return: The encoded chunk, including its length and checksum.
+    """
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def getStorageMode(image):
+    """
+    Gets the color mode an image is worked on in. Grayscale and RGB images (with or without alpha) keep their own
+    mode, so that every one of their channels can store data. Any other image (e.g. palette based) gets converted
+    to the closest of those modes, keeping its transparency.
+    :param image: The opened image object.
+    :return: One of NATIVE_MODES.
+    """
+    if image.mode in NATIVE_MODES:
+        return image.mode
+
+    base_mode = "L" if Image.getmodebase(image.mode) == "L" else "RGB"
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+
+    return base_mode + ("A" if has_alpha else "")
+
+
+def getChannelsPerPixel(image):
+    """
+    Gets the number of channel values every pixel of an image contributes for storing data, without decoding it.
+    :param image: The opened image object.
+    :return: The number of channel values per pixel (1 to 4).
+    """
+    return Image.getmodebands(getStorageMode(image))
+
+
+def getChannelArray(image):
+    """
+    Copies all of the pixel color values of an image into one flat array, where every pixel contributes all of its
+    channel values one after another (row by row, left to right).
+    :param image: The image object containing all the pixel data of the current image (in one of NATIVE_MODES).
+    :return: A writable, one dimensional numpy array (uint8) containing every channel value of the image.
+    """
+    return numpy.array(image, dtype=numpy.uint8).reshape(-1)
+
+
+def readImageChannels(photo, num_channels=None):
+    """
+    Opens an image and copies all of its pixel color values into a flat array.
+    :param photo: The path to the image to be read, or the image itself (see openImage). An image given directly
+    is never modified.
+    :param num_channels: The number of channel values needed from the start of the image, or None if all of them
+    are needed. Png images are then only decoded up to the row holding the last one of them (see
+    readLeadingPngRows), so the array may end early.
+    :return: A tuple containing the flat array of channel values, the pixel width and height of the image and the
+    color mode the channel values belong to.
+    """
+    if num_channels is not None and isinstance(photo, (str, bytes, bytearray)):
+        leading_rows = readLeadingPngRows(photo, num_channels)
+
+        if leading_rows is not None:
+            png_data, width, height = leading_rows
+            channels, row_width, num_rows, mode = readImageChannels(png_data)
+
+            return (channels, width, height, mode)
+
+    opened_image = openImage(photo)
+    mode = getStorageMode(opened_image)
+
+    # Only images that aren't in one of the native modes need to be converted
+    image = opened_image.convert(mode) if opened_image.mode != mode else opened_image
+
+    width, height = image.size
+    channels = getChannelArray(image)
+
+    if opened_image is not photo:
+        opened_image.close()
+
+    return (channels, width, height, mode)
+
+
+def getImageTransparency(photo):
+    """
+    Gets the transparent color of a grayscale or RGB image without an alpha channel (stored in the tRNS chunk of a
+    png), without decoding its pixels. (Images of any other mode that have transparency are worked on with an
+    alpha channel, see getStorageMode.)
+    :param photo: The path to the image, or the image itself (see openImage).
+    :return: The transparent color (a gray value or an RGB tuple), or None if the image has none.
+    """
+    opened_image = openImage(photo)
+    transparency = opened_image.info.get("transparency") if opened_image.mode in ("L", "RGB") else None
+
+    if opened_image is not photo:
+        opened_image.close()
+
+    return transparency
+
+
+def createImageFromChannelArray(channels, width, height, mode="RGB", transparency=None):
+    """
+    Rebuilds an image from a flat array of channel values.
+    :param channels: The one dimensional array of channel values (see getChannelArray).
+    :param width: The pixel width of the image being rebuilt.
+    :param height: The pixel height of the image being rebuilt.
+    :param mode: The color mode the channel values belong to (one of NATIVE_MODES).
+    :param transparency: The transparent color of the image (see getImageTransparency), or None. It is saved along
+    with the image.
+    :return: The newly created image object.
+    """
+    if mode == "L":
+        image = Image.fromarray(channels.reshape(height, width), mode)
+    else:
+        image = Image.fromarray(channels.reshape(height, width, Image.getmodebands(mode)), mode)
+
+    if transparency is not None:
+        image.info["transparency"] = transparency
+
+    return image
+
+
+def getPngSaveOptions(png_profile):
+    """
+    :param png_profile: The name of a png encoding profile (see PNG_PROFILES).
+    :return: The options passed to Pillow when saving a png image with the profile.
+    """
+    if png_profile not in PNG_PROFILES:
+        raise InvalidSettingError("Unknown png profile '" + str(png_profile) + "'. Choose one of: " + ", ".join(PNG_PROFILES) + ".")
+
+    return PNG_PROFILES[png_profile]
+
+
+def saveImageAsPng(image, destination, png_profile="balanced"):
+    """
+    Encodes an image as png, exactly once.
+    :param image: The image object to be saved.
+    :param destination: The path of the file, or a binary file object, the png data is written to.
+    :param png_profile: The png encoding profile (see PNG_PROFILES).
+    :return: The size of the png data in bytes.
+    """
+    if isinstance(destination, str):
+        with open(destination, 'wb') as png_file:
+            image.save(png_file, format="PNG", **getPngSaveOptions(png_profile))
+            return png_file.tell()
+
+    start = destination.tell()
+    image.save(destination, format="PNG", **getPngSaveOptions(png_profile))
+    return destination.tell() - start
+
+
+def getPayloadOffset(header_length, width, channels_per_pixel=3):
+    """
+    Gets the index of the first channel value used for storing the main (non reserve) data of an image. The main
+    data first fills up any remaining channel values of the pixel the header ended in and then moves on to the next
+    pixel. If the header ended exactly on a pixel boundary, one extra pixel gets skipped (unless that boundary is
+    also the start of a new row). This mirrors the layout that has always been used for storing data, so that
+    previously processed photos can still be read.
+    :param header_length: The number of channel values occupied by the reserve bits (header) of the image.
+    :param width: The pixel width of the image.
+    :param channels_per_pixel: The number of channel values every pixel of the image has.
+    :return: The index (within the flat channel array) at which the main data starts.
+    """
+    if header_length % channels_per_pixel != 0:
+        return header_length
+
+    if (header_length // channels_per_pixel) % width == 0:
+        return header_length
+
+    return header_length + channels_per_pixel
+
+
+def storeBitsInChannels(channels, offset, bits, bits_per_channel=1):
+    """
+    Stores a run of bits inside the least significant bits of consecutive channel values, all at once.
+    :param channels: The one dimensional array of channel values that will be modified.
+    :param offset: The index of the first channel value that will store a bit.
+    :param bits: The bits (zeroes and ones) to be stored, as a uint8 numpy array.
+    :param bits_per_channel: The number of least significant bits used in every channel value (1 to 4). The bits
+    are stored most significant bit first, and the last channel value gets padded with zeroes if needed.
+    :return: The index of the channel value directly after the last one that was modified.
+    """
+    if bits_per_channel > 1:
+        padding = (-len(bits)) % bits_per_channel
+        groups = numpy.concatenate((bits, numpy.zeros(padding, dtype=numpy.uint8))).reshape(-1, bits_per_channel)
+        weights = numpy.left_shift(1, numpy.arange(bits_per_channel - 1, -1, -1)).astype(numpy.uint8)
+        bits = groups.dot(weights).astype(numpy.uint8)
+
+    end = offset + len(bits)
+    region = channels[offset:end]
+
+    numpy.bitwise_and(region, 0xFF ^ ((1 << bits_per_channel) - 1), out=region)
+    numpy.bitwise_or(region, bits, out=region)
+
+    return end
+
+
+def readBitsFromChannels(channels, offset, length, bits_per_channel=1):
+    """
+    Reads the least significant bits of a run of consecutive channel values, all at once.
+    :param channels: The one dimensional array of channel values to read from.
+    :param offset: The index of the first channel value to read.
+    :param length: The number of bits to read.
+    :param bits_per_channel: The number of least significant bits used in every channel value (1 to 4).
+    :return: The extracted bits (zeroes and ones) as a uint8 numpy array.
+    """
+    if bits_per_channel == 1:
+        return numpy.bitwise_and(channels[offset:offset + length], 1)
+
+    num_channels = (length + bits_per_channel - 1) // bits_per_channel
+    values = numpy.bitwise_and(channels[offset:offset + num_channels], (1 << bits_per_channel) - 1)
+    bits = numpy.unpackbits(values.reshape(-1, 1), axis=1)[:, 8 - bits_per_channel:]
+
+    return bits.reshape(-1)[:length]
+
+
+def getPayloadCapacity(num_channels, bits_per_channel, first_image):
+    """
+    Gets the number of bits of data that a run of channel values is able to store.
+    :param num_channels: The number of channel values available for storing data.
+    :param bits_per_channel: The number of least significant bits used in every channel value.
+    :param first_image: A boolean value indicating whether the data starts in these channel values, in which case
+    the archive preamble at the start of the data uses a single bit per channel value.
+    :return: The number of bits of data that can be stored.
+    """
+    if not first_image or bits_per_channel == 1:
+        return num_channels * bits_per_channel
+
+    if num_channels <= PREAMBLE_BIT_LENGTH:
+        return num_channels
+
+    return PREAMBLE_BIT_LENGTH + (num_channels - PREAMBLE_BIT_LENGTH) * bits_per_channel
+
+
+def storePayloadInChannels(channels, offset, bits, bits_per_channel, first_image):
+    """
+    Stores (a part of) the data being hidden inside of consecutive channel values.
+    :param channels: The one dimensional array of channel values that will be modified.
+    :param offset: The index of the first channel value that will store data.
+    :param bits: The bits (zeroes and ones) to be stored, as a uint8 numpy array.
+    :param bits_per_channel: The number of least significant bits used in every channel value.
+    :param first_image: A boolean value indicating whether 'bits' is the very start of the data, in which case the
+    archive preamble is stored using a single bit per channel value.
+    """
+    if first_image and bits_per_channel > 1:
+        offset = storeBitsInChannels(channels, offset, bits[:PREAMBLE_BIT_LENGTH])
+        bits = bits[PREAMBLE_BIT_LENGTH:]
+
+    storeBitsInChannels(channels, offset, bits, bits_per_channel)
+
+
+def getPayloadChannelCount(length, bits_per_channel, first_image):
+    """
+    Gets the number of channel values that (a part of) the hidden data takes up.
+    :param length: The number of bits of data.
+    :param bits_per_channel: The number of least significant bits used in every channel value.
+    :param first_image: A boolean value indicating whether the bits are the very start of the data (see
+    readPayloadFromChannels).
+    :return: The number of channel values storing the data.
+    """
+    if not first_image or bits_per_channel == 1:
+        return (length + bits_per_channel - 1) // bits_per_channel
+
+    preamble_length = min(length, PREAMBLE_BIT_LENGTH)
+
+    return preamble_length + (length - preamble_length + bits_per_channel - 1) // bits_per_channel
+
+
+def readPayloadFromChannels(channels, offset, length, bits_per_channel, first_image):
+    """
+    Reads (a part of) the hidden data from consecutive channel values.
+    :param channels: The one dimensional array of channel values to read from.
+    :param offset: The index of the first channel value that stores data.
+    :param length: The number of bits to read.
+    :param bits_per_channel: The number of least significant bits used in every channel value.
+    :param first_image: A boolean value indicating whether the bits are the very start of the data, in which case
+    the archive preamble has been stored using a single bit per channel value.
+    :return: The extracted bits (zeroes and ones) as a uint8 numpy array.
+    """
+    if not first_image or bits_per_channel == 1:
+        return readBitsFromChannels(channels, offset, length, bits_per_channel)
+
+    preamble_length = min(length, PREAMBLE_BIT_LENGTH)
+    preamble = readBitsFromChannels(channels, offset, preamble_length)
+    rest = readBitsFromChannels(channels, offset + preamble_length, length - preamble_length, bits_per_channel)
+
+    return numpy.concatenate((preamble, rest))
@@ -0,0 +1,112 @@
+from Data_Converters.StegoErrors import StegoError, InvalidSettingError, InvalidInputError, CapacityError, SizeLimitError, HidingCancelledError, DataModifiedError, InvalidPhotoSetError, CorruptDataError
+from Data_Converters.Instrumentation import Instrumentation, printEvent
+from Image_Manipulation import ImageDataExtraction, ImageDataHiding
+
+
+# Public API for hiding data in photos and extracting it again from within another program. Unlike main.py, nothing
+# here ever asks for input or exits the interpreter: results are returned and problems are raised as StegoErrors, so
+# a single long-running process can handle any number of jobs.
+
+HideResult = ImageDataHiding.HideResult
+ExtractResult = ImageDataExtraction.ExtractResult
+HiddenEntry = ImageDataExtraction.HiddenEntry
+CapacityReport = ImageDataHiding.CapacityReport
+PhotoCapacity = ImageDataHiding.PhotoCapacity
+
+
+def hide(payload, covers, out, num_workers=1, compression="none", bits_per_channel=1, confirm=None, max_size=None, instrumentation=None, png_profile="balanced", size_cache_path=None, cover_selection="ordered", skip_symlinks=False):
+    """
+    Hides a file or folder in a set of photos.
+    :param payload: The path to the file or folder to be hidden. A folder path ending in '/' hides only the contents
+    of the folder.
+    :param covers: The path to the folder containing the png photo(s) used for hiding the data.
+    :param out: The path to the folder the processed photos are saved in. Anything already inside of it is removed.
+    :param num_workers: The number of photos that get processed at the same time, each in its own process.
+    :param compression: 'none', 'zlib', 'bz2', 'lzma' or 'auto'.
+    :param bits_per_channel: The number of least significant bits (1 to 4) of every channel value used for storing data.
+    :param confirm: A function called with the size of the data (in bytes) before any photo is modified, which
+    returns False to cancel (raising a HidingCancelledError). By default, no confirmation is needed.
+    :param max_size: The largest size of the data (in bytes) that is accepted, or None for no limit.
+    :param instrumentation: An Instrumentation receiving progress events and (if measuring) the time, bytes and peak
+    memory of every stage, e.g. Instrumentation(callback) or Instrumentation(printEvent) followed by
+    writeReport(path). By default, progress is printed and nothing is measured.
+    :param png_profile: How the processed photos are encoded: 'fast', 'balanced' or 'smallest', trading encoding
+    speed for file size.
+    :param size_cache_path: The path to a file caching the sizes of the covers between calls, or None.
+    :param cover_selection: Which covers get used: 'ordered' (in the order they are listed in the folder),
+    'fewest_photos' or 'least_pixels' (the least processing time). The chosen covers are listed in the result.
+    :param skip_symlinks: Whether symbolic links inside the payload folder are left out. By default, they are hidden
+    as the files and folders they lead to. (Items that are neither files nor folders, e.g. named pipes, are always
+    left out.)
+    :return: A HideResult describing the hidden data and the photos that have been processed.
+    """
+    return ImageDataHiding.hideDataInImages(payload, covers, out, num_workers, compression, bits_per_channel, confirm, max_size, instrumentation, png_profile, size_cache_path, cover_selection, skip_symlinks)
+
+
+def capacity(covers, bits_per_channel=1, size_cache_path=None):
+    """
+    Works out how much data a set of photos is able to hold, reading only the headers of the photos and without
+    modifying anything.
+    :param covers: The path to the folder containing the png photo(s) that would be used for hiding data.
+    :param bits_per_channel: The number of least significant bits (1 to 4) of every channel value used for storing data.
+    :param size_cache_path: The path to a file caching the sizes of the covers between calls, or None.
+    :return: A CapacityReport listing the PhotoCapacity (name, width, height, channels_per_pixel, num_bytes) of every
+    cover and the total number of bytes (after compression) that fit into all of them.
+    """
+    return ImageDataHiding.getCapacityOfPhotos(covers, bits_per_channel, size_cache_path)
+
+
+def extract(photos, out, num_workers=1, header_cache_path=None, instrumentation=None, only=None, sync=False):
+    """
+    Extracts the data hidden in a set of photos and recreates it.
+    :param photos: The path to the folder containing exactly the set of photos that the data has been hidden in.
+    :param out: The path to the folder the data is recreated in. Anything already inside of it is removed.
+    :param num_workers: The number of photos that get read at the same time, each in its own process.
+    :param header_cache_path: The path to a file caching the headers of photos between calls, or None.
+    :param instrumentation: An Instrumentation receiving progress events and measurements (see hide).
+    :param only: A list of relative paths or glob patterns (e.g. 'Notes/*.txt', see listContents) selecting the
+    files and folders to be extracted, in which case only the photos holding them are read. By default, everything
+    is extracted.
+    :param sync: Whether the extracted files and folders are flushed to the disk (with fsync) before returning.
+    :return: An ExtractResult describing the extracted data.
+    """
+    if only is not None:
+        return ImageDataExtraction.extractSelectedData(photos, out, only, num_workers, header_cache_path, instrumentation, sync)
+
+    return ImageDataExtraction.extractDataFromImages(photos, out, num_workers, header_cache_path, instrumentation, sync)
+
+
+def listContents(photos, header_cache_path=None):
+    """
+    Lists the files and folders hidden in a set of photos without extracting them, reading only the first photo
+    of the set (besides the photo headers).
+    :param photos: The path to the folder containing exactly the set of photos that the data has been hidden in.
+    :param header_cache_path: The path to a file caching the headers of photos between calls, or None.
+    :return: A list of the HiddenEntry (path, is_folder, size) of every hidden file and folder.
+    """
+    return ImageDataExtraction.listHiddenData(photos, header_cache_path)
+
+
+def hideBytes(payload, covers, name="payload", compression="none", bits_per_channel=1, max_size=None, png_profile="balanced"):
+    """
+    Hides data held in memory in a set of photos held in memory, without reading or writing any files.
+    :param payload: The data to be hidden, as a value of type 'bytes'.
+    :param covers: A list of photos, each one a PIL Image, a NumPy array (uint8) or the encoded bytes of a png image.
+    :param name: The file name the data gets when the photos are extracted into a folder with extract.
+    :param compression: 'none', 'zlib', 'bz2', 'lzma' or 'auto'.
+    :param bits_per_channel: The number of least significant bits (1 to 4) of every channel value used for storing data.
+    :param max_size: The largest size of the data (in bytes) that is accepted, or None for no limit.
+    :param png_profile: How the processed photos are encoded: 'fast', 'balanced' or 'smallest'.
+    :return: A list of the processed photos as png data, where the n-th entry belongs to the n-th cover. Covers that
+    were not needed are left out at the end.
+    """
+    return ImageDataHiding.hideDataInMemory(payload, covers, name, compression, bits_per_channel, max_size, png_profile)
+
+
+def extractBytes(photos):
+    """
+    Extracts data hidden as a single file (e.g. with hideBytes) from a set of photos held in memory.
+    :param photos: A list of the processed photos, each one a PIL Image, a NumPy array (uint8) or png data.
+    :return: The hidden data, as a value of type 'bytes'.
+    """
+    return ImageDataExtraction.extractDataFromMemory(photos)
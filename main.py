@@ -1,5 +1,6 @@
-from Image_Manipulation import ImageDataExtraction, ImageDataHiding
-import os
+from Image_Manipulation import ImageDataHiding
+import StegoAPI
+import argparse, os, sys
 
 
 def main():
@@ -26,21 +27,233 @@ def main():
     if PATH_TO_DATA_YOU_WANT_HIDDEN == "":
         PATH_TO_DATA_YOU_WANT_HIDDEN = script_directory + '/Data_To_Hide/'
 
+    '''
+    Number of photos that get processed at the same time while hiding or extracting data, each in its own process. By default,
+    all photos are processed one after another. Set this to the number of CPU cores (e.g. os.cpu_count()) to speed up
+    working with many photos.
+    '''
+    NUMBER_OF_WORKERS = 1
+
+    '''
+    How the data gets compressed before it is hidden: 'none', 'zlib', 'bz2', 'lzma', or 'auto' to let the program
+    pick whichever works best for your data. Compressed data needs fewer photos, but takes longer to hide. By default,
+    the data is not compressed.
+    '''
+    COMPRESSION = 'none'
+
+    '''
+    Number of least significant bits (1 to 4) of every pixel color value used for storing data. Higher values let
+    every photo hold more data, but make the changes to the photos easier to notice.
+    '''
+    BITS_PER_CHANNEL = 1
+
+    '''
+    How the processed photos are saved: 'fast' (quickest to save, larger files), 'balanced', or 'smallest' (slowest
+    to save, smallest files). The hidden data is the same either way.
+    '''
+    PNG_PROFILE = 'balanced'
+
+    '''
+    Which of the photos in 'Input_Photos' get used: 'ordered' (in the order they are listed in the folder),
+    'fewest_photos' (as few photos as possible) or 'least_pixels' (the photos that are quickest to process).
+    '''
+    COVER_SELECTION = 'ordered'
+
+    '''
+    File used for remembering the reserve bits (headers) of processed photos between runs, so that photos which
+    have not changed since the last extraction don't need to be decoded just to find out what they hold.
+    '''
+    HEADER_CACHE_PATH = script_directory + '/.photo_header_cache.json'
+
+    '''
+    File used for remembering the sizes of input photos between runs, so that planning which photos the data goes
+    into doesn't need to read photos which have not changed since the last run.
+    '''
+    SIZE_CACHE_PATH = script_directory + '/.photo_size_cache.json'
+
     path_to_input_photos = script_directory + '/Input_Photos'
     path_to_processed_photos = script_directory + '/Processed_Photos'
     path_to_paste_data = script_directory + '/Extracted_Data'
 
+    # Any command line arguments run the program without asking for anything
+    if len(sys.argv) > 1:
+        parser = createArgumentParser(PATH_TO_DATA_YOU_WANT_HIDDEN, path_to_input_photos, path_to_processed_photos, path_to_paste_data, NUMBER_OF_WORKERS, COMPRESSION, BITS_PER_CHANNEL, PNG_PROFILE, COVER_SELECTION)
+        args = parser.parse_args()
+
+        if args.command == "hide":
+            runHide(args.data, args.input_photos, args.output, args.workers, args.compression, args.bits_per_channel, None, args.max_size, args.report, args.png_profile, SIZE_CACHE_PATH if args.size_cache else None, args.cover_selection, args.skip_symlinks)
+        elif args.command == "capacity":
+            runCapacity(args.input_photos, args.bits_per_channel, SIZE_CACHE_PATH if args.size_cache else None)
+        elif args.command == "list":
+            runList(args.processed_photos, HEADER_CACHE_PATH if args.header_cache else None)
+        else:
+            runExtract(args.processed_photos, args.output, args.workers, HEADER_CACHE_PATH if args.header_cache else None, args.report, args.only, args.fsync)
+        return
+
     print("Enter 1 to hide data in an image set.")
     print("Enter 2 to extract data from an image set")
     num = input()
     print("***")
 
     if num == '1':
-        ImageDataHiding.hideDataInImages(PATH_TO_DATA_YOU_WANT_HIDDEN, path_to_input_photos, path_to_processed_photos)
+        runHide(PATH_TO_DATA_YOU_WANT_HIDDEN, path_to_input_photos, path_to_processed_photos, NUMBER_OF_WORKERS, COMPRESSION, BITS_PER_CHANNEL, confirmHiding, None, None, PNG_PROFILE, SIZE_CACHE_PATH, COVER_SELECTION)
     elif num == '2':
-        ImageDataExtraction.extractDataFromImages(path_to_processed_photos, path_to_paste_data)
+        runExtract(path_to_processed_photos, path_to_paste_data, NUMBER_OF_WORKERS, HEADER_CACHE_PATH)
     else:
         print("Invalid response.")
 
+
+def createArgumentParser(data, input_photos, processed_photos, paste_data, num_workers, compression, bits_per_channel, png_profile, cover_selection):
+    """
+    Creates the parser for the command line arguments. Every argument defaults to the corresponding setting in main,
+    which is passed in here.
+    :return: The argparse.ArgumentParser with a 'hide', a 'capacity', an 'extract' and a 'list' command.
+    """
+    parser = argparse.ArgumentParser(description="Hide data in png photos, or extract data hidden in them.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    hide_parser = commands.add_parser("hide", help="hide a file or folder in a set of photos")
+    hide_parser.add_argument("--data", default=data, help="file or folder to hide (a trailing '/' hides only the contents of a folder)")
+    hide_parser.add_argument("--input-photos", default=input_photos, help="folder containing the photos used for hiding the data")
+    hide_parser.add_argument("--output", default=processed_photos, help="folder the processed photos are saved in")
+    hide_parser.add_argument("--workers", type=int, default=num_workers, help="number of photos processed at the same time")
+    hide_parser.add_argument("--compression", default=compression, choices=["auto", "none", "zlib", "bz2", "lzma"])
+    hide_parser.add_argument("--bits-per-channel", type=int, default=bits_per_channel, choices=[1, 2, 3, 4])
+    hide_parser.add_argument("--png-profile", default=png_profile, choices=["fast", "balanced", "smallest"], help="speed/size tradeoff for saving the processed photos")
+    hide_parser.add_argument("--cover-selection", default=cover_selection, choices=list(ImageDataHiding.COVER_SELECTIONS), help="which photos get used: in folder order, as few as possible, or the quickest to process")
+    hide_parser.add_argument("--max-size", type=int, default=None, help="refuse to hide more than this many bytes")
+    hide_parser.add_argument("--report", default=None, help="save the time, bytes and peak memory of every stage to this JSON file")
+    hide_parser.add_argument("--no-size-cache", dest="size_cache", action="store_false", help="don't remember photo sizes between runs")
+    hide_parser.add_argument("--skip-symlinks", action="store_true", help="leave out symbolic links inside the data folder instead of following them")
+
+    capacity_parser = commands.add_parser("capacity", help="show how much data a set of photos can hold, without modifying anything")
+    capacity_parser.add_argument("--input-photos", default=input_photos, help="folder containing the photos that would be used for hiding data")
+    capacity_parser.add_argument("--bits-per-channel", type=int, default=bits_per_channel, choices=[1, 2, 3, 4])
+    capacity_parser.add_argument("--no-size-cache", dest="size_cache", action="store_false", help="don't remember photo sizes between runs")
+
+    extract_parser = commands.add_parser("extract", help="extract the data hidden in a set of photos")
+    extract_parser.add_argument("--processed-photos", default=processed_photos, help="folder containing the photos holding the data")
+    extract_parser.add_argument("--output", default=paste_data, help="folder the extracted data is recreated in")
+    extract_parser.add_argument("--workers", type=int, default=num_workers, help="number of photos read at the same time")
+    extract_parser.add_argument("--no-header-cache", dest="header_cache", action="store_false", help="don't remember photo headers between runs")
+    extract_parser.add_argument("--report", default=None, help="save the time, bytes and peak memory of every stage to this JSON file")
+    extract_parser.add_argument("--only", action="append", default=None, metavar="PATTERN", help="extract only the files and folders matching this path or glob (can be given more than once)")
+    extract_parser.add_argument("--fsync", action="store_true", help="flush the extracted files to the disk before finishing")
+
+    list_parser = commands.add_parser("list", help="list the files and folders hidden in a set of photos")
+    list_parser.add_argument("--processed-photos", default=processed_photos, help="folder containing the photos holding the data")
+    list_parser.add_argument("--no-header-cache", dest="header_cache", action="store_false", help="don't remember photo headers between runs")
+
+    return parser
+
+
+def confirmHiding(num_bytes):
+    """
+    Shows the size of the data to be hidden and asks the user whether they still want to continue.
+    :param num_bytes: The size of the data to be hidden in bytes.
+    :return: True if the user wants to continue, otherwise False.
+    """
+    print("Size of data to be hidden: " + ImageDataHiding.getReadableDataSize(num_bytes) + ".")
+    print("Do you wish to continue?")
+    answer = input()
+
+    if answer[:1] != 'y' and answer[:1] != 'Y':
+        return False
+
+    print("***")
+    return True
+
+
+def runHide(data, input_photos, processed_photos, num_workers, compression, bits_per_channel, confirm=None, max_size=None, report_path=None, png_profile="balanced", size_cache_path=None, cover_selection="ordered", skip_symlinks=False):
+    """
+    Hides the data and reports the outcome, exiting with status 1 if anything went wrong.
+    :param confirm: The function asked for confirmation once the size of the data is known, or None to not ask.
+    :param max_size: The largest size of the data (in bytes) that is accepted, or None for no limit.
+    :param report_path: The path of the JSON file every stage gets measured into, or None to not measure anything.
+    (See StegoAPI.hide for all other parameters.)
+    """
+    instrumentation = StegoAPI.Instrumentation(StegoAPI.printEvent, measure=report_path is not None)
+
+    try:
+        result = StegoAPI.hide(data, input_photos, processed_photos, num_workers, compression, bits_per_channel, confirm, max_size, instrumentation, png_profile, size_cache_path, cover_selection, skip_symlinks)
+    except StegoAPI.HidingCancelledError:
+        print("No new images have been modified/saved. Goodbye.")
+        sys.exit(0)
+    except StegoAPI.StegoError as e:
+        print("Error - " + str(e))
+        sys.exit(1)
+
+    if report_path is not None:
+        instrumentation.writeReport(report_path)
+
+    print("Your data has successfully been hidden! (100% complete)")
+
+    print("\nHere are all the photos the data has been hidden in, in order...")
+    for photo in result.processed_photos:
+        print("-> " + os.path.basename(photo))
+
+    # Any potential remaining photos that didn't need to be used for hiding data are listed here.
+    if len(result.unused_photos) > 0:
+        print("\nHere are all the photos that didn't need to (and haven't been) processed...")
+        for photo in result.unused_photos:
+            print("-> " + photo)
+
+
+def runExtract(processed_photos, paste_data, num_workers, header_cache_path, report_path=None, only=None, sync=False):
+    """
+    Extracts the hidden data and reports the outcome, exiting with status 1 if anything went wrong.
+    :param report_path: The path of the JSON file every stage gets measured into, or None to not measure anything.
+    (See StegoAPI.extract for all other parameters.)
+    """
+    instrumentation = StegoAPI.Instrumentation(StegoAPI.printEvent, measure=report_path is not None)
+
+    try:
+        StegoAPI.extract(processed_photos, paste_data, num_workers, header_cache_path, instrumentation, only, sync)
+    except StegoAPI.StegoError as e:
+        print("Error - " + str(e))
+        sys.exit(1)
+
+    if report_path is not None:
+        instrumentation.writeReport(report_path)
+
+    print("Success! The data from the image set has been extracted and can now be viewed. (100% complete)")
+
+
+def runCapacity(input_photos, bits_per_channel, size_cache_path):
+    """
+    Prints how much data every photo in a set (and the whole set) can hold, exiting with status 1 if anything went
+    wrong. Nothing gets modified.
+    (See StegoAPI.capacity for the parameters.)
+    """
+    try:
+        report = StegoAPI.capacity(input_photos, bits_per_channel, size_cache_path)
+    except StegoAPI.StegoError as e:
+        print("Error - " + str(e))
+        sys.exit(1)
+
+    for photo in report.photos:
+        print(photo.name + "  (" + str(photo.width) + "x" + str(photo.height) + ", " + str(photo.channels_per_pixel) + " channels): " + ImageDataHiding.getReadableDataSize(photo.num_bytes))
+
+    print("Total: " + ImageDataHiding.getReadableDataSize(report.num_bytes) + " (" + str(report.num_bytes) + " bytes) in " + str(len(report.photos)) + " photo(s), using " + str(report.bits_per_channel) + " bit(s) per channel value.")
+
+
+def runList(processed_photos, header_cache_path):
+    """
+    Prints every file and folder hidden in a set of photos, exiting with status 1 if anything went wrong.
+    (See StegoAPI.listContents for the parameters.)
+    """
+    try:
+        hidden_entries = StegoAPI.listContents(processed_photos, header_cache_path)
+    except StegoAPI.StegoError as e:
+        print("Error - " + str(e))
+        sys.exit(1)
+
+    for hidden_entry in hidden_entries:
+        if hidden_entry.is_folder:
+            print(hidden_entry.path + "/")
+        else:
+            print(hidden_entry.path + "  (" + ImageDataHiding.getReadableDataSize(hidden_entry.size) + ")")
+
+
 if __name__ == '__main__':
     main()